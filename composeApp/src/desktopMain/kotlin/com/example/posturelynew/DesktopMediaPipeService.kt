@@ -44,6 +44,13 @@ class DesktopMediaPipeService {
     private val responseDir = File("/tmp/posture_responses")
     private val pidFile = File("/tmp/posture_python.pid")
     
+    // Opt-in persistent pose daemon (POSTURE_POSE_DAEMON=1): started with --daemon, kept warm
+    // after close() and attached to by the next app launch instead of spawning a new process
+    private val useDaemon = System.getenv("POSTURE_POSE_DAEMON") == "1"
+    private var daemonProcess: ProcessHandle? = null
+    // The daemon outlives this JVM, so its output goes to a file rather than a pipe to us
+    private val daemonLog = File("/tmp/posture_daemon.log")
+    
     // Posture tracking variables
     private var poseData = "No pose data available"
     private var landmarks = List(33) { Pair(0.5f, 0.5f) }
@@ -187,20 +194,26 @@ class DesktopMediaPipeService {
             // macOS: look for .app bundle or binary
             possiblePaths.addAll(listOf(
                 "pose_server.app/Contents/MacOS/pose_server",
+                "pose_server/pose_server",
                 "pose_server",
                 "dist/pose_server.app/Contents/MacOS/pose_server",
+                "dist/pose_server/pose_server",
                 "dist/pose_server"
             ))
         } else if (osName.contains("windows")) {
             // Windows: look for .exe
             possiblePaths.addAll(listOf(
+                "pose_server/pose_server.exe",
                 "pose_server.exe",
+                "dist/pose_server/pose_server.exe",
                 "dist/pose_server.exe"
             ))
         } else {
             // Linux: look for binary
             possiblePaths.addAll(listOf(
+                "pose_server/pose_server",
                 "pose_server",
+                "dist/pose_server/pose_server",
                 "dist/pose_server"
             ))
         }
@@ -212,7 +225,7 @@ class DesktopMediaPipeService {
         for (path in possiblePaths) {
             val file = File(resourcesDir, path)
             println("DesktopMediaPipeService: Checking path: ${file.absolutePath} (exists: ${file.exists()}, executable: ${file.canExecute()})")
-            if (file.exists() && file.canExecute()) {
+            if (file.isFile && file.canExecute()) {
                 println("DesktopMediaPipeService: Found bundled binary at: ${file.absolutePath}")
                 return file.absolutePath
             }
@@ -225,7 +238,7 @@ class DesktopMediaPipeService {
         for (path in possiblePaths) {
             val file = File(path)
             println("DesktopMediaPipeService: Checking current dir path: ${file.absolutePath} (exists: ${file.exists()}, executable: ${file.canExecute()})")
-            if (file.exists() && file.canExecute()) {
+            if (file.isFile && file.canExecute()) {
                 println("DesktopMediaPipeService: Found bundled binary at current dir: ${file.absolutePath}")
                 return file.absolutePath
             }
@@ -239,7 +252,7 @@ class DesktopMediaPipeService {
             for (path in possiblePaths) {
                 val file = File(projectRoot, path)
                 println("DesktopMediaPipeService: Checking project root path: ${file.absolutePath} (exists: ${file.exists()}, executable: ${file.canExecute()})")
-                if (file.exists() && file.canExecute()) {
+                if (file.isFile && file.canExecute()) {
                     println("DesktopMediaPipeService: Found bundled binary at project root: ${file.absolutePath}")
                     return file.absolutePath
                 }
@@ -338,6 +351,11 @@ class DesktopMediaPipeService {
         try {
             println("DesktopMediaPipeService: ===== PYTHON PROCESS START =====")
             
+            if (useDaemon && attachToRunningDaemon()) {
+                println("DesktopMediaPipeService: ===== ATTACHED TO RUNNING POSE DAEMON =====")
+                return
+            }
+            
             when (serviceType) {
                 ServiceType.BUNDLED_BINARY -> startBundledBinary()
                 ServiceType.PYTHON_SCRIPT -> startPythonScript()
@@ -354,6 +372,39 @@ class DesktopMediaPipeService {
         }
     }
     
+    private fun attachToRunningDaemon(): Boolean {
+        val pid = try {
+            pidFile.takeIf { it.exists() }?.readText()?.trim()?.toLong()
+        } catch (e: Exception) {
+            null
+        } ?: return false
+        val handle = ProcessHandle.of(pid).orElse(null) ?: return false
+        val command = handle.info().command().orElse("")
+        // Guard against a stale PID file whose PID now belongs to another program
+        if (!handle.isAlive || !(command.contains("pose_server") || command.contains("python"))) {
+            return false
+        }
+        println("DesktopMediaPipeService: Reusing pose daemon (PID $pid)")
+        daemonProcess = handle
+        return true
+    }
+    
+    private fun isServiceAlive(): Boolean =
+        pythonProcess?.isAlive == true || daemonProcess?.isAlive == true
+    
+    private fun daemonArgs(): List<String> = if (useDaemon) listOf("--daemon") else emptyList()
+    
+    private fun redirectProcessOutput(processBuilder: ProcessBuilder) {
+        // Redirect error stream to output for debugging
+        processBuilder.redirectErrorStream(true)
+        if (useDaemon) {
+            // A pipe to this JVM breaks when the app exits, and the daemon's next write would fail
+            processBuilder.redirectOutput(ProcessBuilder.Redirect.appendTo(daemonLog))
+            processBuilder.environment()["POSTURE_DAEMON_LOG"] = daemonLog.absolutePath
+            println("DesktopMediaPipeService: Pose daemon output goes to ${daemonLog.absolutePath}")
+        }
+    }
+    
     private fun startBundledBinary() {
         println("DesktopMediaPipeService: Starting bundled binary...")
         
@@ -370,15 +421,14 @@ class DesktopMediaPipeService {
         }
         
         // Start the bundled binary
-        val processBuilder = ProcessBuilder(binaryFile.absolutePath)
+        val processBuilder = ProcessBuilder(listOf(binaryFile.absolutePath) + daemonArgs())
         
         // Set working directory to the binary's directory for better model loading
         val workingDir = binaryFile.parentFile
         processBuilder.directory(workingDir)
         println("DesktopMediaPipeService: Working directory set to: ${workingDir.absolutePath}")
         
-        // Redirect error stream to output for debugging
-        processBuilder.redirectErrorStream(true)
+        redirectProcessOutput(processBuilder)
         
         println("DesktopMediaPipeService: Starting bundled binary...")
         pythonProcess = processBuilder.start()
@@ -424,8 +474,7 @@ class DesktopMediaPipeService {
         
         // Start Python subprocess
         val processBuilder = ProcessBuilder(
-            pythonCommand,
-            scriptPath
+            listOf(pythonCommand, scriptPath) + daemonArgs()
         )
         
         // Set working directory to the resources folder for better model loading
@@ -442,8 +491,7 @@ class DesktopMediaPipeService {
             println("DesktopMediaPipeService: Virtual environment activated: ${venvPath.absolutePath}")
         }
         
-        // Redirect error stream to output for debugging
-        processBuilder.redirectErrorStream(true)
+        redirectProcessOutput(processBuilder)
         
         println("DesktopMediaPipeService: Starting Python subprocess...")
         pythonProcess = processBuilder.start()
@@ -469,6 +517,10 @@ class DesktopMediaPipeService {
             println("DesktopMediaPipeService: Process died during startup")
             println("DesktopMediaPipeService: Exit code: ${pythonProcess?.exitValue()}")
             
+            if (useDaemon) {
+                println("DesktopMediaPipeService: Process output is in ${daemonLog.absolutePath}")
+            }
+            
             // Try to read any output from the process
             try {
                 val reader = BufferedReader(InputStreamReader(pythonProcess?.inputStream ?: System.`in`))
@@ -501,7 +553,7 @@ class DesktopMediaPipeService {
                 println("DesktopMediaPipeService: Starting response watcher...")
                 println("DesktopMediaPipeService: Response watcher - isRunning: $isRunning, pythonProcess alive: ${pythonProcess?.isAlive}")
                 
-                while (isRunning && pythonProcess?.isAlive == true) {
+                while (isRunning && isServiceAlive()) {
                     try {
                         // Look for response files
                         val responseFiles = responseDir.listFiles { file ->
@@ -555,10 +607,10 @@ class DesktopMediaPipeService {
                 println("DesktopMediaPipeService: Starting heartbeat...")
                 println("DesktopMediaPipeService: Heartbeat - isRunning: $isRunning, pythonProcess alive: ${pythonProcess?.isAlive}")
                 
-                while (isRunning && pythonProcess?.isAlive == true) {
+                while (isRunning && isServiceAlive()) {
                     delay(5000) // Send heartbeat every 5 seconds
                     
-                    if (isRunning && pythonProcess?.isAlive == true) {
+                    if (isRunning && isServiceAlive()) {
                         val pingCommand = mapOf("type" to "ping")
                         sendCommandToPython(pingCommand)
                         
@@ -566,7 +618,7 @@ class DesktopMediaPipeService {
                         delay(1000)
                         
                         // If process is dead after ping, handle it
-                        if (pythonProcess?.isAlive != true) {
+                        if (!isServiceAlive()) {
                             println("DesktopMediaPipeService: Python process died during heartbeat")
                             handleProcessDeath()
                             break
@@ -811,7 +863,7 @@ class DesktopMediaPipeService {
             println("DesktopMediaPipeService: Sending command to Python: $commandJson")
             
             // Check if process is still alive
-            if (pythonProcess?.isAlive != true) {
+            if (!isServiceAlive()) {
                 println("DesktopMediaPipeService: ERROR: Python process is not alive when sending command!")
                 handleProcessDeath()
                 return
@@ -830,7 +882,7 @@ class DesktopMediaPipeService {
             Thread.sleep(100)
             
             // Check if process is still alive after sending
-            if (pythonProcess?.isAlive != true) {
+            if (!isServiceAlive()) {
                 println("DesktopMediaPipeService: ERROR: Python process died after sending command!")
                 handleProcessDeath()
             } else {
@@ -988,7 +1040,7 @@ class DesktopMediaPipeService {
             isRunning = false
             
             // Check if Python process is still alive before sending close command
-            if (pythonProcess?.isAlive == true) {
+            if (isServiceAlive()) {
                 // Send close command to Python
                 val closeCommand = mapOf("type" to "close")
                 sendCommandToPython(closeCommand)
@@ -996,14 +1048,17 @@ class DesktopMediaPipeService {
                 // Wait a bit for Python to close gracefully
                 Thread.sleep(1000)
                 
-                // Force close if still running
-                pythonProcess?.destroyForcibly()
+                // Force close if still running; a daemon stays up, warm, for the next launch
+                if (!useDaemon) {
+                    pythonProcess?.destroyForcibly()
+                }
             } else {
                 println("DesktopMediaPipeService: Python process is already dead, skipping close command")
             }
             
             // Clean up resources
             pythonProcess = null
+            daemonProcess = null
             
             // Cancel response watcher job
             responseWatcherJob?.cancel()
@@ -1042,8 +1097,8 @@ class DesktopMediaPipeService {
                 }
             }
             
-            // Remove PID file if it exists
-            if (pidFile.exists()) {
+            // Remove PID file if it exists (the daemon's is how the next launch finds it)
+            if (!useDaemon && pidFile.exists()) {
                 pidFile.delete()
             }
             
@@ -1056,7 +1111,7 @@ class DesktopMediaPipeService {
     fun isInitialized(): Boolean = isInitialized
     
     fun checkServiceStatus() {
-        if (pythonProcess?.isAlive == true) {
+        if (isServiceAlive()) {
             val statusCommand = mapOf("type" to "status")
             sendCommandToPython(statusCommand)
         } else {
@@ -17,21 +17,37 @@ import kotlinx.serialization.json.jsonPrimitive
 import kotlinx.serialization.json.booleanOrNull
 import kotlinx.serialization.json.jsonArray
 import kotlinx.serialization.json.floatOrNull
+import kotlinx.serialization.json.intOrNull
+import kotlinx.serialization.json.longOrNull
+import java.awt.RenderingHints
 import java.awt.image.BufferedImage
 import java.io.ByteArrayOutputStream
+import java.nio.ByteBuffer
+import java.nio.ByteOrder
 import java.util.Base64
+import javax.imageio.IIOImage
 import javax.imageio.ImageIO
+import javax.imageio.ImageWriteParam
 import java.io.File
 import com.mobil80.posturely.PoseMetrics
 
 class DesktopMediaPipeWsService {
     private var isInitialized = false
+    private var binaryFrames = false
+    private var frameSeq = 0
     private var isRunning = false
     private val serviceScope = CoroutineScope(Dispatchers.IO + SupervisorJob())
 
     private val wsHost = "127.0.0.1"
     private val wsPort = 8765
     private val wsPath = "/" // root
+    private val binaryHeaderSize = 14 // see FRAME_HEADER in ws_pose_server.py
+
+    // Latest rate_hint from the server's backpressure loop; 0 = no limit yet
+    @Volatile private var hintIntervalMs = 0L
+    @Volatile private var hintMaxSide = 0
+    @Volatile private var hintJpegQuality = 0
+    private var lastFrameSentAt = 0L
 
     private var client: HttpClient? = null
     private var session: DefaultClientWebSocketSession? = null
@@ -76,7 +92,7 @@ class DesktopMediaPipeWsService {
                                 println("DesktopMediaPipeWsService: WebSocket connected successfully!")
                                 startReceiveLoop()
 
-                                val initJson = "{" + "\"type\":\"init\"" + "}"
+                                val initJson = "{" + "\"type\":\"init\",\"binary\":true,\"rate_hints\":true" + "}"
                                 println("DesktopMediaPipeWsService: Sending init message: $initJson")
                                 send(Frame.Text(initJson))
                                 var attempts = 0
@@ -215,6 +231,7 @@ class DesktopMediaPipeWsService {
                         ?: root["data"]?.jsonObject?.get("success")?.jsonPrimitive?.booleanOrNull
                         ?: false
                     isInitialized = success
+                    binaryFrames = root["binary"]?.jsonPrimitive?.booleanOrNull ?: false
                     println("DesktopMediaPipeWsService: init_response success=$success")
                 }
                 "detection" -> {
@@ -239,6 +256,13 @@ class DesktopMediaPipeWsService {
                         }
                     }
                 }
+                "rate_hint" -> {
+                    hintIntervalMs = root["interval_ms"]?.jsonPrimitive?.longOrNull ?: hintIntervalMs
+                    hintMaxSide = root["max_side"]?.jsonPrimitive?.intOrNull ?: hintMaxSide
+                    hintJpegQuality = root["jpeg_quality"]?.jsonPrimitive?.intOrNull ?: hintJpegQuality
+                    println("DesktopMediaPipeWsService: rate_hint ${root["reason"]?.jsonPrimitive?.content}: " +
+                        "interval=${hintIntervalMs}ms maxSide=$hintMaxSide quality=$hintJpegQuality")
+                }
                 "error" -> {
                     val msg = root["message"]?.jsonPrimitive?.content
                     if (msg != null) listener?.onPoseLandmarkerError(msg)
@@ -252,8 +276,18 @@ class DesktopMediaPipeWsService {
     fun detectAsync(bufferedImage: BufferedImage, timestamp: Long) {
         if (!isInitialized || !isRunning) return
         val s = session ?: return
+        // Skip frames the server asked us not to send yet (rate_hint interval)
+        val now = System.currentTimeMillis()
+        if (hintIntervalMs > 0 && now - lastFrameSentAt < hintIntervalMs) return
+        lastFrameSentAt = now
         try {
-            val b64 = bufferedImageToBase64Jpeg(bufferedImage)
+            val image = scaleToMaxSide(bufferedImage, hintMaxSide)
+            if (binaryFrames) {
+                val frame = Frame.Binary(true, buildBinaryFrame(bufferedImageToJpeg(image), timestamp))
+                serviceScope.launch { s.send(frame) }
+                return
+            }
+            val b64 = bufferedImageToBase64Jpeg(image)
             val json = "{" +
                 "\"type\":\"detect\"," +
                 "\"image\":\"$b64\"," +
@@ -265,11 +299,59 @@ class DesktopMediaPipeWsService {
         }
     }
 
-    private fun bufferedImageToBase64Jpeg(bufferedImage: BufferedImage): String {
+    private fun bufferedImageToJpeg(bufferedImage: BufferedImage): ByteArray {
         val baos = ByteArrayOutputStream()
-        ImageIO.write(bufferedImage, "JPEG", baos)
-        val bytes = baos.toByteArray()
-        return Base64.getEncoder().encodeToString(bytes)
+        val quality = hintJpegQuality
+        if (quality <= 0) {
+            ImageIO.write(bufferedImage, "JPEG", baos)
+            return baos.toByteArray()
+        }
+        val writer = ImageIO.getImageWritersByFormatName("jpeg").next()
+        try {
+            ImageIO.createImageOutputStream(baos).use { out ->
+                writer.output = out
+                val param = writer.defaultWriteParam
+                param.compressionMode = ImageWriteParam.MODE_EXPLICIT
+                param.compressionQuality = quality.coerceIn(1, 100) / 100f
+                writer.write(null, IIOImage(bufferedImage, null, null), param)
+            }
+        } finally {
+            writer.dispose()
+        }
+        return baos.toByteArray()
+    }
+
+    // Downscale so the longest side is at most maxSide (rate_hint); 0 keeps the image as is
+    private fun scaleToMaxSide(image: BufferedImage, maxSide: Int): BufferedImage {
+        val longest = maxOf(image.width, image.height)
+        if (maxSide <= 0 || longest <= maxSide) return image
+        val scale = maxSide.toDouble() / longest
+        val width = (image.width * scale).toInt().coerceAtLeast(1)
+        val height = (image.height * scale).toInt().coerceAtLeast(1)
+        val scaled = BufferedImage(width, height, BufferedImage.TYPE_3BYTE_BGR)
+        val g = scaled.createGraphics()
+        try {
+            g.setRenderingHint(RenderingHints.KEY_INTERPOLATION, RenderingHints.VALUE_INTERPOLATION_BILINEAR)
+            g.drawImage(image, 0, 0, width, height, null)
+        } finally {
+            g.dispose()
+        }
+        return scaled
+    }
+
+    private fun bufferedImageToBase64Jpeg(bufferedImage: BufferedImage): String {
+        return Base64.getEncoder().encodeToString(bufferedImageToJpeg(bufferedImage))
+    }
+
+    // Header layout must match FRAME_HEADER in ws_pose_server.py: type, codec, seq, timestamp
+    private fun buildBinaryFrame(jpeg: ByteArray, timestamp: Long): ByteArray {
+        val buffer = ByteBuffer.allocate(binaryHeaderSize + jpeg.size).order(ByteOrder.LITTLE_ENDIAN)
+        buffer.put(1.toByte())
+        buffer.put(1.toByte())
+        buffer.putInt(frameSeq++)
+        buffer.putLong(timestamp)
+        buffer.put(jpeg)
+        return buffer.array()
     }
 
     fun startTracking() {
@@ -290,6 +372,7 @@ class DesktopMediaPipeWsService {
                 try { client?.close() } catch (_: Exception) {}
             }
             isInitialized = false
+            binaryFrames = false
             try { serverProcess?.destroy() } catch (_: Exception) {}
         } catch (_: Exception) {}
     }
@@ -362,5 +445,3 @@ class DesktopMediaPipeWsService {
         }
     }
 }
-
-
@@ -33,13 +33,13 @@ if exist __pycache__ rmdir /s /q __pycache__
 
 REM Build the binary
 echo Building with PyInstaller...
-pyinstaller --clean --onefile mediapipe_pose_detector.py --name pose_server
+pyinstaller --clean pose_server.spec
 
 echo === Build Complete ===
-echo Binary created at: dist\pose_server.exe
+echo Binary created at: dist\pose_server\pose_server.exe
 echo.
 echo Next steps:
-echo 1. Copy the binary from dist\ to your app's resources
+echo 1. Copy the dist\pose_server folder to your app's resources
 echo 2. Update your KMP code to use the bundled binary
 echo 3. Test the bundled version
 echo.
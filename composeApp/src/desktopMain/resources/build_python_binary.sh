@@ -41,19 +41,19 @@ if [[ "$OSTYPE" == "darwin"* ]]; then
 elif [[ "$OSTYPE" == "msys" ]] || [[ "$OSTYPE" == "cygwin" ]] || [[ "$OSTYPE" == "win32" ]]; then
     # Windows
     echo "Building for Windows..."
-    pyinstaller --clean --onefile mediapipe_pose_detector.py --name pose_server
-    echo "Binary created at: dist/pose_server.exe"
+    pyinstaller --clean pose_server.spec
+    echo "Binary created at: dist/pose_server/pose_server.exe"
 else
     # Linux
     echo "Building for Linux..."
-    pyinstaller --clean --onefile mediapipe_pose_detector.py --name pose_server
-    echo "Binary created at: dist/pose_server"
+    pyinstaller --clean pose_server.spec
+    echo "Binary created at: dist/pose_server/pose_server"
 fi
 
 echo "=== Build Complete ==="
 echo "The binary is ready to be bundled with your KMP app."
 echo ""
 echo "Next steps:"
-echo "1. Copy the binary from dist/ to your app's resources"
+echo "1. Copy the dist/pose_server folder (or pose_server.app on macOS) to your app's resources"
 echo "2. Update your KMP code to use the bundled binary"
 echo "3. Test the bundled version"
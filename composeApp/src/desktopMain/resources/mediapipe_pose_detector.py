@@ -1,48 +1,323 @@
 #!/usr/bin/env python3
 """
 MediaPipe Pose Detection Service for Desktop App
-This script runs as a subprocess and communicates with the Kotlin app via file-based notifications
+This script runs as a subprocess and communicates with the Kotlin app via file-based notifications.
+
+Transports (all feed the same process_command dispatcher):
+- Unix domain socket at SOCKET_PATH: each message is a 4 byte big-endian length
+  followed by a UTF-8 JSON command ({"type": ..., "request_id": ...}); responses
+  come back on the same connection with the same framing.
+- Command files in COMMAND_DIR, picked up via inotify on Linux (no idle wakeups)
+  or by polling everywhere else.
+
+Every frame is timed per stage (queue, decode, convert, inference, encode, serialize);
+the 'stats' command returns rolling p50/p95/p99 per stage (see pose_stats.py) and
+'profile' runs cProfile over the next N detections.
+
+'record' (or POSTURE_RECORD=<path> at startup) appends init commands, incoming
+detect frames and their results to a recording (see pose_record.py) that
+pose_replay.py plays back; shared-memory frames are not recorded. A 'path' given
+to 'record' must name a file directly in POSTURE_RECORD_DIR (default
+/tmp/posture_recordings).
+
+With 'summary': true in init, every detection carries its 'score' and the detector keeps
+rolling aggregates of the session (mean, percentiles, time below summary_threshold,
+slouch events, per-minute buckets; see pose_summary.py). 'session_summary' returns them,
+from 'since' (epoch ms) on, and 'reset': true starts them over after the reply.
+
+'calibrate' derives the calibrated ratio from many frames (see pose_calibration.py):
+with 'images' (base64 list) the burst is decoded in parallel and run through the
+landmarker back to back, and the baseline is the reply. With 'duration_ms' instead the
+reply only acknowledges, and the first detection_result after the window closes carries
+the baseline under 'calibration'. 'apply': true makes the ratio the session's
+calibrated_ratio.
 """
 
 import sys
 import json
 import time
 import base64
-import numpy as np
-import cv2
-import io
-from PIL import Image
 import os
 import signal
 import glob
+import mmap
+import socket
+import struct
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from pose_record import SessionRecorder
+
+# Start of the startup timeline (see StartupTimeline)
+PROCESS_STARTED = time.monotonic()
+
 # Communication directories
 COMMAND_DIR = "/tmp/posture_commands"
 RESPONSE_DIR = "/tmp/posture_responses"
 PID_FILE = "/tmp/posture_python.pid"
+SOCKET_PATH = os.environ.get("POSTURE_SOCKET_PATH", "/tmp/posture_python.sock")
+
+# Socket framing: 4 byte big-endian payload length
+FRAME_LENGTH = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+# Shared-memory frame ring (see SharedFrameRing)
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp"
+# Rings may only live in SHM_DIR under this prefix: shm_open truncates the file and shm_close removes it
+RING_PREFIX = "posture_frames"
+DEFAULT_RING_PATH = os.path.join(SHM_DIR, RING_PREFIX)
+frame_ring = None
+
+# Session recording (see pose_record.py); POSTURE_RECORD=<path> starts it at launch.
+# Paths given to the 'record' command must be files directly in RECORD_DIR
+RECORD_DIR = os.environ.get("POSTURE_RECORD_DIR", "/tmp/posture_recordings")
+recorder = None
+
+# Commands may arrive on several transports at once; the detector is not thread-safe
+command_lock = threading.Lock()
+# Where send_response writes for the command being processed on this thread (None = response file)
+_response_target = threading.local()
+
+# Daemon mode: single instance that outlives its clients (see main)
+DAEMON_MODE = '--daemon' in sys.argv[1:] or os.environ.get("POSTURE_DAEMON") == "1"
+DAEMON_IDLE_S = float(os.environ.get("POSTURE_DAEMON_IDLE_S", "1800"))
+# The daemon outlives the process that started it, so its output goes here instead of to that process
+DAEMON_LOG = os.environ.get("POSTURE_DAEMON_LOG", "/tmp/posture_daemon.log")
+# Model loaded and warmed up in the background at startup ("" disables the warm-up)
+WARM_MODEL_PATH = os.environ.get("POSTURE_WARM_MODEL", "pose_landmarker_full.task")
+WARM_RUNNING_MODE = os.environ.get("POSTURE_WARM_MODE", "video")
 
-# Try to import MediaPipe, but handle gracefully if not available
-try:
-    import mediapipe as mp
-    from mediapipe.tasks import python
-    from mediapipe.tasks.python import vision
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
-    print("Warning: MediaPipe not available. Install with: pip install mediapipe", file=sys.stderr)
+# Heavy modules (numpy, OpenCV, MediaPipe and the pose_* helpers) are imported by
+# load_runtime() off the startup path, so ping/status are answered right away
+np = cv2 = mp = python = vision = None
+MEDIAPIPE_AVAILABLE = False
+runtime_ready = threading.Event()
+_runtime_lock = threading.Lock()
+detector = None
+
+def load_runtime():
+    """Import the heavy modules and create the detector (once; safe from any thread)"""
+    global np, cv2, mp, python, vision, MEDIAPIPE_AVAILABLE, detector
+    global DEFAULT_DECODE_SIDE, FrameDecoder
+    global LANDMARK_FORMATS, encode_landmarks, landmarks_to_array, resolve_subset
+    global compute_metrics, compute_metrics_batch, metrics_batch_to_json
+    global PipelineStats, ProfileCapture, StageTimer, timing_block
+    global LandmarkFilter, MotionGate
+    global SessionSummary, posture_score
+    global CalibrationWindow, check_calibration_options, robust_baseline, DEFAULT_MAX_FRAMES, DEFAULT_MIN_FRAMES, DEFAULT_OUTLIER_Z
+    with _runtime_lock:
+        if runtime_ready.is_set():
+            return
+        import numpy as np
+        import cv2
+        from pose_calibration import (CalibrationWindow, check_calibration_options, robust_baseline,
+                                      DEFAULT_MAX_FRAMES, DEFAULT_MIN_FRAMES, DEFAULT_OUTLIER_Z)
+        from pose_image import DEFAULT_DECODE_SIDE, FrameDecoder
+        from pose_landmarks import LANDMARK_FORMATS, encode_landmarks, landmarks_to_array, resolve_subset
+        from pose_metrics import compute_metrics, compute_metrics_batch, metrics_batch_to_json
+        from pose_stats import PipelineStats, ProfileCapture, StageTimer, timing_block
+        from pose_summary import SessionSummary, posture_score
+        from pose_temporal import LandmarkFilter, MotionGate
+        
+        # Try to import MediaPipe, but handle gracefully if not available
+        try:
+            import mediapipe as mp
+            from mediapipe.tasks import python
+            from mediapipe.tasks.python import vision
+            MEDIAPIPE_AVAILABLE = True
+        except ImportError:
+            MEDIAPIPE_AVAILABLE = False
+            print("Warning: MediaPipe not available. Install with: pip install mediapipe", file=sys.stderr)
+        
+        if detector is None:
+            detector = MediaPipePoseDetector()
+        startup.mark('runtime')
+        runtime_ready.set()
+
+# Running modes accepted by the init command
+RUNNING_MODES = {
+    'image': 'IMAGE',
+    'video': 'VIDEO',
+    'live_stream': 'LIVE_STREAM'
+}
+
+class StartupTimeline:
+    """Milestones in ms since process start: ready, runtime, warm, init, first_landmark"""
+    
+    def __init__(self):
+        self.marks = {}
+        self.init_at = None
+        self.init_to_first_landmark_ms = None
+    
+    def mark(self, name):
+        """Record a milestone the first time it is reached"""
+        if name not in self.marks:
+            self.marks[name] = round((time.monotonic() - PROCESS_STARTED) * 1000.0, 1)
+            print(f"Startup: {name} after {self.marks[name]} ms", file=sys.stderr)
+    
+    def init_received(self):
+        """Start timing init -> first landmark (again for every client session)"""
+        self.mark('init')
+        self.init_at = time.monotonic()
+    
+    def landmark_sent(self):
+        self.mark('first_landmark')
+        if self.init_at is not None:
+            self.init_to_first_landmark_ms = round((time.monotonic() - self.init_at) * 1000.0, 1)
+            print(f"Startup: first landmark {self.init_to_first_landmark_ms} ms after init", file=sys.stderr)
+            self.init_at = None
+    
+    def as_dict(self):
+        timeline = {f'{name}_ms': ms for name, ms in self.marks.items()}
+        if self.init_to_first_landmark_ms is not None:
+            timeline['init_to_first_landmark_ms'] = self.init_to_first_landmark_ms
+        return timeline
+
+startup = StartupTimeline()
+# monotonic() of the last command, for the daemon's idle exit
+last_command_at = time.monotonic()
+
+def check_model_file(model_path):
+    """Check that a model file exists and is not empty"""
+    # Check if model file exists
+    if not os.path.exists(model_path):
+        print(f"Error: Model file {model_path} not found", file=sys.stderr)
+        return False
+    
+    # Check if model file is readable and has content
+    try:
+        if os.path.getsize(model_path) == 0:
+            print(f"Error: Model file {model_path} is empty", file=sys.stderr)
+            return False
+    except OSError as e:
+        print(f"Error checking model file: {str(e)}", file=sys.stderr)
+        return False
+    
+    print(f"Model file found: {os.path.abspath(model_path)}", file=sys.stderr)
+    return True
+
+def model_label(model_path):
+    """Short label reported with each result ('lite', 'full' or 'heavy')"""
+    name = os.path.basename(model_path)
+    for label in ('lite', 'heavy'):
+        if label in name:
+            return label
+    return 'full'
+
+class LatencyModelSelector:
+    """
+    Picks between the full and lite landmarkers to stay inside a per-frame latency budget.
+
+    Rolling averages are kept per model. The full model is dropped when its average exceeds
+    the budget; it comes back when its last known average fits comfortably (upgrade_ratio),
+    or as a periodic probe whose interval doubles every time a probe fails. A model must run
+    min_dwell frames before any switch, which keeps the selection from flapping.
+    """
+    
+    def __init__(self, budget_ms, window=30, min_dwell=15, upgrade_ratio=0.7,
+                 probe_interval_s=30.0, max_probe_interval_s=300.0):
+        self.budget_ms = budget_ms
+        self.min_dwell = min_dwell
+        self.upgrade_ratio = upgrade_ratio
+        self.base_probe_interval_s = probe_interval_s
+        self.probe_interval_s = probe_interval_s
+        self.max_probe_interval_s = max_probe_interval_s
+        self.samples = {'full': deque(maxlen=window), 'lite': deque(maxlen=window)}
+        self.active = 'full'
+        self.frames_on_active = 0
+        self.switched_at = time.monotonic()
+        self.probing = False
+    
+    def average(self, label):
+        samples = self.samples[label]
+        return sum(samples) / len(samples) if samples else float('inf')
+    
+    def record(self, label, elapsed_ms):
+        """Record one inference time; returns the model to switch to, or None"""
+        if label not in self.samples:
+            return None
+        self.samples[label].append(elapsed_ms)
+        if label != self.active:
+            return None
+        self.frames_on_active += 1
+        if self.frames_on_active < self.min_dwell:
+            return None
+        
+        if self.active == 'full':
+            if self.average('full') > self.budget_ms:
+                if self.probing:
+                    self.probe_interval_s = min(self.probe_interval_s * 2, self.max_probe_interval_s)
+                self.probing = False
+                return self._switch('lite')
+            if self.probing:
+                # Probe succeeded: the machine has headroom again
+                self.probing = False
+                self.probe_interval_s = self.base_probe_interval_s
+            return None
+        
+        if self.average('full') < self.budget_ms * self.upgrade_ratio:
+            return self._switch('full')
+        if time.monotonic() - self.switched_at >= self.probe_interval_s:
+            # The full model's average may be stale; measure it again
+            self.samples['full'].clear()
+            self.probing = True
+            return self._switch('full')
+        return None
+    
+    def _switch(self, label):
+        self.active = label
+        self.frames_on_active = 0
+        self.switched_at = time.monotonic()
+        return label
 
 class MediaPipePoseDetector:
     def __init__(self):
+        # Active landmarker; landmarkers holds every loaded model by label ('full', 'lite', ...)
         self.landmarker = None
+        self.landmarkers = {}
+        self.active_model = None
+        self.model_selector = None
+        # Model the selector asked for, switched to by the next detect on the command thread
+        self.pending_model = None
         self.is_initialized = False
         if MEDIAPIPE_AVAILABLE:
             self.running_mode = vision.RunningMode.VIDEO
         else:
             self.running_mode = None
+        # VIDEO / LIVE_STREAM need strictly increasing timestamps
+        self.last_timestamp_ms = -1
+        # Newest LIVE_STREAM result delivered by the landmarker callback
+        self.live_result = None
+        self.live_started = {}
+        self.live_lock = threading.Lock()
+        # Response landmark encoding (see pose_landmarks.py)
+        self.landmark_format = 'json'
+        self.landmark_indices = None
+        # Server-side posture metrics (see pose_metrics.py)
+        self.include_metrics = False
+        self.calibrated_ratio = None
+        # Optional reuse of the last result while the frame is still (see pose_temporal.py)
+        self.motion_gate = None
+        # Optional One Euro smoothing + prediction between inferences (see pose_temporal.py)
+        self.landmark_filter = None
+        # Optional rolling score aggregates for 'session_summary' (see pose_summary.py)
+        self.summary = None
+        # Open 'calibrate' window collecting this session's landmarks (see pose_calibration.py)
+        self.calibration = None
+        self.apply_calibration_ratio = False
+        # Per-stage timings of every frame (see pose_stats.py); timer is set while a frame is processed
+        self.stats = PipelineStats()
+        # Decodes straight to RGB, downscaled in the JPEG decoder when frames are large (see pose_image.py)
+        self.decoder = FrameDecoder()
+        self.timer = None
+        self.include_timing = False
+        self.profile = None
+        # (model paths, running mode, budget) of the loaded landmarkers, so a matching init can reuse them
+        self.loaded_config = None
         
-    def initialize(self, model_path=None):
+    def initialize(self, model_path=None, running_mode='video', lite_model_path=None, latency_budget_ms=None):
         """Initialize MediaPipe Pose Landmarker"""
         try:
             # Check if MediaPipe is available
@@ -56,46 +331,51 @@ class MediaPipePoseDetector:
             
             print(f"Initializing MediaPipe Pose with model: {model_path}", file=sys.stderr)
             
-            # Check if model file exists
-            if not os.path.exists(model_path):
-                print(f"Error: Model file {model_path} not found", file=sys.stderr)
+            if not check_model_file(model_path):
                 return False
             
-            # Check if model file is readable and has content
-            try:
-                if os.path.getsize(model_path) == 0:
-                    print(f"Error: Model file {model_path} is empty", file=sys.stderr)
+            models = {model_label(model_path): model_path}
+            if latency_budget_ms is not None:
+                # Latency budget mode keeps the full and lite landmarkers warm side by side
+                if lite_model_path is None:
+                    lite_model_path = os.path.join(os.path.dirname(model_path), "pose_landmarker_lite.task")
+                if not check_model_file(lite_model_path):
                     return False
-            except OSError as e:
-                print(f"Error checking model file: {str(e)}", file=sys.stderr)
-                return False
+                models = {'full': model_path, 'lite': lite_model_path}
             
-            print(f"Model file found: {os.path.abspath(model_path)}", file=sys.stderr)
+            if running_mode not in RUNNING_MODES:
+                print(f"Error: Unknown running mode {running_mode}", file=sys.stderr)
+                return False
             
-            # Create pose landmarker options
-            base_options = python.BaseOptions(model_asset_path=model_path)
-            options = vision.PoseLandmarkerOptions(
-                base_options=base_options,
-                running_mode=vision.RunningMode.VIDEO,
-                num_poses=1,
-                min_pose_detection_confidence=0.5,
-                min_pose_presence_confidence=0.5,
-                min_tracking_confidence=0.5,
-                output_segmentation_masks=False
-            )
+            config = (tuple(sorted((label, os.path.abspath(path)) for label, path in models.items())),
+                      running_mode, latency_budget_ms)
+            if self.is_initialized and config == self.loaded_config:
+                # Pre-warmed at startup or kept by the daemon from a previous client
+                print("Reusing warm PoseLandmarker", file=sys.stderr)
+                return True
+            self.running_mode = getattr(vision.RunningMode, RUNNING_MODES[running_mode])
+            self.last_timestamp_ms = -1
+            self.live_result = None
+            self.live_started = {}
             
             print("Creating PoseLandmarker...", file=sys.stderr)
             
-            # Create the landmarker
+            # Create the landmarker(s)
             try:
-                self.landmarker = vision.PoseLandmarker.create_from_options(options)
+                self.close_landmarkers()
+                for label, path in models.items():
+                    self.landmarkers[label] = self.create_landmarker(path)
+                self.set_active_model('full' if 'full' in self.landmarkers else next(iter(self.landmarkers)))
+                self.model_selector = LatencyModelSelector(float(latency_budget_ms)) if latency_budget_ms is not None else None
+                self.loaded_config = config
                 self.is_initialized = True
-                print("MediaPipe Pose initialized successfully", file=sys.stderr)
+                print(f"MediaPipe Pose initialized successfully ({', '.join(self.landmarkers)})", file=sys.stderr)
                 return True
             except Exception as e:
                 print(f"Error creating PoseLandmarker: {str(e)}", file=sys.stderr)
                 import traceback
                 traceback.print_exc(file=sys.stderr)
+                self.close_landmarkers()
                 self.is_initialized = False
                 return False
                 
@@ -115,6 +395,62 @@ class MediaPipePoseDetector:
             self.is_initialized = False
             return False
     
+    def create_landmarker(self, model_path):
+        """Create a PoseLandmarker for model_path in the current running mode"""
+        base_options = python.BaseOptions(model_asset_path=model_path)
+        extra_options = {}
+        if self.running_mode == vision.RunningMode.LIVE_STREAM:
+            extra_options['result_callback'] = self._on_live_result
+        options = vision.PoseLandmarkerOptions(
+            base_options=base_options,
+            running_mode=self.running_mode,
+            num_poses=1,
+            min_pose_detection_confidence=0.5,
+            min_pose_presence_confidence=0.5,
+            min_tracking_confidence=0.5,
+            output_segmentation_masks=False,
+            **extra_options
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+    
+    def set_active_model(self, label):
+        """Route inference to one of the loaded landmarkers"""
+        self.active_model = label
+        self.landmarker = self.landmarkers[label]
+    
+    def close_landmarkers(self):
+        """Close every loaded landmarker"""
+        for landmarker in self.landmarkers.values():
+            try:
+                landmarker.close()
+            except Exception as e:
+                print(f"Error closing landmarker: {str(e)}", file=sys.stderr)
+        self.landmarkers = {}
+        self.landmarker = None
+        self.active_model = None
+        self.pending_model = None
+    
+    def record_inference_time(self, label, elapsed_ms):
+        """
+        Feed the latency-budget selector. A switch it asks for only sets pending_model: in
+        LIVE_STREAM mode this runs on a MediaPipe thread, while the command thread may be
+        inside detect_async on the active landmarker.
+        """
+        if self.model_selector is None:
+            return
+        new_model = self.model_selector.record(label, elapsed_ms)
+        if new_model is not None and new_model in self.landmarkers:
+            print(f"Switching pose model {label} -> {new_model} "
+                  f"(avg {self.model_selector.average(label):.1f} ms, budget {self.model_selector.budget_ms:.1f} ms)",
+                  file=sys.stderr)
+            self.pending_model = new_model
+    
+    def apply_pending_model(self):
+        """Switch to the model the selector asked for (command thread, under command_lock)"""
+        new_model, self.pending_model = self.pending_model, None
+        if new_model is not None and new_model in self.landmarkers and new_model != self.active_model:
+            self.set_active_model(new_model)
+    
     def process_frame(self, frame_data, timestamp_ms):
         """Process a frame and return pose landmarks"""
         if not MEDIAPIPE_AVAILABLE:
@@ -129,62 +465,346 @@ class MediaPipePoseDetector:
             return None
         
         try:
-            # Convert base64 frame data to numpy array
+            # Decode base64 frame data straight to RGB, at reduced scale for large JPEGs
             frame_bytes = base64.b64decode(frame_data)
-            frame_array = np.frombuffer(frame_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(frame_array, cv2.IMREAD_COLOR)
+            frame_rgb = self.decoder.decode(frame_bytes)
+            self.lap('decode')
             
-            if frame is None:
+            if frame_rgb is None:
                 print("Error: Failed to decode frame data", file=sys.stderr)
                 return None
             
-            # Convert BGR to RGB
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            # Skip inference while the scene is still (but not for an open calibration window,
+            # which needs every frame's own landmarks)
+            if self.motion_gate is not None and self.calibration is None:
+                cached = self.motion_gate.lookup(frame_rgb, timestamp_ms)
+                self.lap('motion_gate')
+                if cached is not None:
+                    return cached
             
             # Convert to MediaPipe Image
             mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+            self.lap('convert')
             
-            # Detect pose landmarks
+            result = self.detect_image(mp_image, timestamp_ms)
+            if self.motion_gate is not None:
+                self.motion_gate.store(result)
+            return result
+                
+        except ValueError as e:
+            print(f"Value error processing frame: {str(e)}", file=sys.stderr)
+            return {
+                'landmarks': [],
+                'timestamp': timestamp_ms,
+                'success': False,
+                'error': f"Invalid frame data: {str(e)}"
+            }
+        except Exception as e:
+            print(f"Error processing frame: {str(e)}", file=sys.stderr)
+            import traceback
+            traceback.print_exc(file=sys.stderr)
+            return {
+                'landmarks': [],
+                'timestamp': timestamp_ms,
+                'success': False,
+                'error': str(e)
+            }
+    
+    def lap(self, stage):
+        """Charge the time since the last lap to stage, while a frame is being timed"""
+        if self.timer is not None:
+            self.timer.lap(stage)
+    
+    def run_timed(self, process, args, received_at=None):
+        """
+        Run process(*args) for one frame under a StageTimer (and the profiler, if armed).
+        Returns (response, timings); received_at is the perf_counter() time the command arrived.
+        """
+        self.timer = StageTimer(received_at)
+        if received_at is not None:
+            self.timer.lap('queue')
+        try:
+            if self.profile is None:
+                response = process(*args)
+            else:
+                response = self.profile.run(process, *args)
+        finally:
+            timings = self.timer.timings
+            self.timer = None
+        if response is None:
+            return response, timings
+        if self.summary is not None:
+            self.summarize(response)
+        if self.calibration is not None and self.calibration.done:
+            response['calibration'] = self.finish_calibration()
+        if self.include_timing:
+            response['timing'] = timing_block(timings)
+        if self.profile is not None and self.profile.done:
+            response['profile'] = self.profile.finish()
+            self.profile = None
+        return response, timings
+    
+    def start_profile(self, frames):
+        """Arm cProfile for the next frames detections"""
+        self.profile = ProfileCapture(int(frames))
+        return self.profile
+    
+    def configure_output(self, landmark_format='json', landmark_subset=None, metrics=False, calibrated_ratio=None):
+        """Select the landmark encoding, optional landmark subset and metrics for responses"""
+        if landmark_format not in LANDMARK_FORMATS:
+            raise ValueError(f"Unknown landmark format: {landmark_format}")
+        self.landmark_indices = resolve_subset(landmark_subset)
+        self.landmark_format = landmark_format
+        self.include_metrics = bool(metrics)
+        self.calibrated_ratio = None if calibrated_ratio is None else float(calibrated_ratio)
+    
+    def configure_motion_gate(self, enabled=False, threshold=2.0, max_reuse_ms=1000):
+        """Enable or disable motion-gated inference"""
+        self.motion_gate = MotionGate(float(threshold), float(max_reuse_ms)) if enabled else None
+    
+    def configure_filter(self, enabled=False, min_cutoff=1.0, beta=0.5):
+        """Enable or disable landmark smoothing and prediction"""
+        self.landmark_filter = LandmarkFilter(float(min_cutoff), float(beta)) if enabled else None
+    
+    def configure_summary(self, enabled=False, score='ratio_score', threshold=60, slouch_min_s=3.0):
+        """Enable or disable the per-session score aggregates (starts a new summary)"""
+        self.summary = SessionSummary(score, int(threshold), float(slouch_min_s)) if enabled else None
+    
+    def summarize(self, response):
+        """Feed one frame's response to the session summary"""
+        if response.get('success'):
+            self.summary.add(response.get('score'))
+        elif response.get('message') == 'No pose detected':
+            self.summary.add(None)
+    
+    def start_calibration(self, window, apply=False):
+        """Collect the landmarks of the next detections until the window closes"""
+        self.calibration = window
+        self.apply_calibration_ratio = apply
+    
+    def finish_calibration(self):
+        """Close the calibration window and return its baseline"""
+        result = self.calibration.finish()
+        self.calibration = None
+        return self.apply_calibration(result, self.apply_calibration_ratio)
+    
+    def apply_calibration(self, result, apply):
+        """Use a successful calibration's ratio for metrics and scores from now on, if asked to"""
+        if apply and result.get('success'):
+            self.calibrated_ratio = result['calibrated_ratio']
+            result['applied'] = True
+        return result
+    
+    def calibrate_images(self, images, outlier_z, min_frames):
+        """Calibration baseline from a burst of base64 images, decoded in parallel and run back to back"""
+        # imdecode releases the GIL, so the burst is decoded in parallel
+        with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1, 4)) as pool:
+            frames = list(pool.map(self.decode_image, images))
+        landmarks = []
+        no_pose = 0
+        for frame_rgb in frames:
+            if frame_rgb is None:
+                continue
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+            if self.running_mode == vision.RunningMode.IMAGE:
+                result = self.landmarker.detect(mp_image)
+            else:
+                # VIDEO: the burst continues the stream's timeline, 1 ms per frame
+                result = self.landmarker.detect_for_video(mp_image, self.next_timestamp(self.last_timestamp_ms + 1))
+            if result.pose_landmarks:
+                landmarks.append(landmarks_to_array(result.pose_landmarks[0]))
+            else:
+                no_pose += 1
+        stacked = np.stack(landmarks) if landmarks else np.empty((0, 33, 5), dtype=np.float32)
+        response = robust_baseline(stacked, outlier_z, min_frames)
+        response['rejected'].update({'no_pose': no_pose, 'undecodable': sum(frame is None for frame in frames)})
+        response['images'] = len(images)
+        return response
+    
+    def decode_image(self, frame_data):
+        """Decode a base64 image into a fresh RGB array (the session decoder reuses its buffer)"""
+        try:
+            return FrameDecoder(self.decoder.target_side).decode(base64.b64decode(frame_data))
+        except Exception:
+            return None
+    
+    def next_timestamp(self, timestamp_ms):
+        """Return a timestamp strictly greater than the previous one, as VIDEO/LIVE_STREAM require"""
+        if timestamp_ms <= self.last_timestamp_ms:
+            timestamp_ms = self.last_timestamp_ms + 1
+        self.last_timestamp_ms = timestamp_ms
+        return timestamp_ms
+    
+    def _on_live_result(self, result, output_image, timestamp_ms):
+        """LIVE_STREAM result callback, runs on a MediaPipe thread"""
+        with self.live_lock:
+            label, started = self.live_started.pop(timestamp_ms, (self.active_model, None))
+            # Older frames the graph skipped never get a callback
+            for stale in [ts for ts in self.live_started if ts < timestamp_ms]:
+                del self.live_started[stale]
+            self.live_result = (result, timestamp_ms, label)
+        if started is not None:
+            self.record_inference_time(label, (time.perf_counter() - started) * 1000.0)
+    
+    def detect_image(self, mp_image, timestamp_ms):
+        """Run the landmarker on a MediaPipe Image and convert the result"""
+        self.apply_pending_model()
+        label = self.active_model
+        if self.running_mode == vision.RunningMode.IMAGE:
+            started = time.perf_counter()
             result = self.landmarker.detect(mp_image)
+            self.record_inference_time(label, (time.perf_counter() - started) * 1000.0)
+            self.lap('inference')
+            response = self.result_to_response(result, timestamp_ms)
+            response['model'] = label
+            self.lap('encode')
+            return response
+        
+        frame_timestamp = self.next_timestamp(timestamp_ms)
+        if self.running_mode == vision.RunningMode.VIDEO:
+            # Tracks from the previous frame's ROI instead of re-running person detection
+            started = time.perf_counter()
+            result = self.landmarker.detect_for_video(mp_image, frame_timestamp)
+            self.record_inference_time(label, (time.perf_counter() - started) * 1000.0)
+            self.lap('inference')
+            response = self.result_to_response(result, frame_timestamp)
+            response['model'] = label
+            self.lap('encode')
+            return response
+        
+        # LIVE_STREAM: queue this frame and answer with the newest finished result,
+        # so decoding the next frame overlaps with inference on this one
+        with self.live_lock:
+            self.live_started[frame_timestamp] = (label, time.perf_counter())
+        self.landmarker.detect_async(mp_image, frame_timestamp)
+        self.lap('inference')
+        with self.live_lock:
+            live_result = self.live_result
+        if live_result is None:
+            return {
+                'landmarks': [],
+                'timestamp': frame_timestamp,
+                'success': False,
+                'message': 'Waiting for first result'
+            }
+        result, result_timestamp, result_model = live_result
+        response = self.result_to_response(result, result_timestamp)
+        response['frame_timestamp'] = frame_timestamp
+        response['model'] = result_model
+        self.lap('encode')
+        return response
+    
+    def encode_output(self, landmarks):
+        """Encode landmarks (and metrics, if enabled) for a response"""
+        output = encode_landmarks(landmarks, self.landmark_format, self.landmark_indices)
+        if self.include_metrics:
+            output['metrics'] = compute_metrics(landmarks, self.calibrated_ratio)
+        return output
+    
+    def predict(self, timestamp_ms=None):
+        """Filtered landmarks extrapolated to timestamp_ms (now when None)"""
+        if self.landmark_filter is None:
+            return {'success': False, 'timestamp': timestamp_ms, 'message': 'Filter not enabled'}
+        landmarks, ahead_ms = self.landmark_filter.predict(timestamp_ms)
+        if landmarks is None:
+            return {'success': False, 'timestamp': timestamp_ms, 'message': 'No landmarks yet'}
+        if timestamp_ms is None:
+            timestamp_ms = int(round(self.landmark_filter.last_timestamp + ahead_ms))
+        response = {
+            'timestamp': timestamp_ms,
+            'success': True,
+            'predicted_ms': round(ahead_ms, 2)
+        }
+        response.update(self.encode_output(landmarks))
+        return response
+    
+    def result_to_response(self, result, timestamp_ms):
+        """Convert a PoseLandmarkerResult to our response format"""
+        if result.pose_landmarks:
+            # Extract landmarks from the first detected pose
+            landmarks = landmarks_to_array(result.pose_landmarks[0])
+            if self.calibration is not None:
+                self.calibration.add(landmarks, timestamp_ms)
             
-            if result.pose_landmarks:
-                # Extract landmarks from the first detected pose
-                landmarks = result.pose_landmarks[0]
-                
-                # Convert landmarks to our format
-                landmark_data = []
-                for landmark in landmarks:
-                    landmark_data.append({
-                        'x': landmark.x,
-                        'y': landmark.y,
-                        'z': landmark.z,
-                        'visibility': landmark.visibility,
-                        'presence': landmark.presence
-                    })
-                
+            response = {
+                'timestamp': timestamp_ms,
+                'success': True
+            }
+            if self.landmark_filter is not None:
+                if timestamp_ms == self.landmark_filter.last_timestamp:
+                    # LIVE_STREAM hands back the same result until the next callback: a repeat
+                    # at a new time would skew the filter's velocity
+                    landmarks, _ = self.landmark_filter.predict(timestamp_ms)
+                else:
+                    landmarks = self.landmark_filter.update(landmarks, timestamp_ms)
+                response['filtered'] = True
+            response.update(self.encode_output(landmarks))
+            if self.summary is not None:
+                metrics = response.get('metrics')
+                response['score'] = (metrics[self.summary.kind] if metrics is not None
+                                     else posture_score(landmarks, self.calibrated_ratio, self.summary.kind))
+            return response
+        else:
+            if self.calibration is not None:
+                self.calibration.add(None, timestamp_ms)
+            return {
+                'landmarks': [],
+                'timestamp': timestamp_ms,
+                'success': False,
+                'message': 'No pose detected'
+            }
+    
+    def process_shared_frame(self, ring, slot, timestamp_ms):
+        """Process a raw RGB frame straight out of a SharedFrameRing slot"""
+        if not self.is_initialized or self.landmarker is None:
+            return None
+        
+        try:
+            frame_rgb, sequence = ring.read_slot(slot)
+            self.lap('read')
+            if frame_rgb is None:
                 return {
-                    'landmarks': landmark_data,
+                    'landmarks': [],
                     'timestamp': timestamp_ms,
-                    'success': True
+                    'success': False,
+                    'message': 'Slot is being written'
                 }
-            else:
+            
+            if self.motion_gate is not None and self.calibration is None:
+                cached = self.motion_gate.lookup(frame_rgb, timestamp_ms)
+                self.lap('motion_gate')
+                if cached is not None:
+                    cached['sequence'] = sequence
+                    return cached
+            
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+            self.lap('convert')
+            
+            # The writer may have lapped us while the image was being built
+            if ring.slot_sequence(slot) != sequence:
                 return {
                     'landmarks': [],
                     'timestamp': timestamp_ms,
                     'success': False,
-                    'message': 'No pose detected'
+                    'message': 'Frame overwritten before it was read'
                 }
-                
-        except ValueError as e:
-            print(f"Value error processing frame: {str(e)}", file=sys.stderr)
+            
+            result = self.detect_image(mp_image, timestamp_ms)
+            if self.motion_gate is not None:
+                self.motion_gate.store(result)
+            result['sequence'] = sequence
+            return result
+            
+        except (ValueError, IndexError) as e:
+            print(f"Invalid shared frame: {str(e)}", file=sys.stderr)
             return {
                 'landmarks': [],
                 'timestamp': timestamp_ms,
                 'success': False,
-                'error': f"Invalid frame data: {str(e)}"
+                'error': f"Invalid shared frame: {str(e)}"
             }
         except Exception as e:
-            print(f"Error processing frame: {str(e)}", file=sys.stderr)
+            print(f"Error processing shared frame: {str(e)}", file=sys.stderr)
             import traceback
             traceback.print_exc(file=sys.stderr)
             return {
@@ -194,15 +814,147 @@ class MediaPipePoseDetector:
                 'error': str(e)
             }
     
+    def warm_up(self):
+        """Run one dummy inference so the first real frame does not pay for graph setup"""
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+        self.detect_image(mp.Image(image_format=mp.ImageFormat.SRGB, data=blank), 0)
+    
+    def reset_session(self):
+        """Drop per-client state but keep the landmarkers loaded (daemon 'close')"""
+        self.configure_output()
+        self.configure_motion_gate()
+        self.configure_filter()
+        self.configure_summary()
+        self.calibration = None
+        self.include_timing = False
+        self.profile = None
+        self.decoder = FrameDecoder()
+        self.live_result = None
+    
     def close(self):
         """Clean up resources"""
-        if MEDIAPIPE_AVAILABLE and self.landmarker:
-            try:
-                self.landmarker.close()
-            except Exception as e:
-                print(f"Error closing landmarker: {str(e)}", file=sys.stderr)
+        if MEDIAPIPE_AVAILABLE:
+            self.close_landmarkers()
+        self.model_selector = None
+        self.loaded_config = None
         self.is_initialized = False
 
+class SharedFrameRing:
+    """
+    Memory-mapped ring of fixed-size raw RGB frame slots, normally under /dev/shm.
+
+    Layout (little-endian):
+      header  magic "PSFR", version, slot_count, max_width, max_height, channels (uint32 each)
+      slots   slot_count x [sequence uint64, timestamp_ms int64, width uint32, height uint32,
+              padding up to SLOT_ALIGN, max_width * max_height * channels pixel bytes]
+
+    The writer makes a slot's sequence odd while it fills the pixels and even once the frame is
+    complete, so a reader can tell a torn frame from a finished one. Pixel data is wrapped with
+    np.frombuffer and never copied on the Python side.
+    """
+    MAGIC = b"PSFR"
+    VERSION = 2
+    CHANNELS = 3
+    HEADER = struct.Struct("<4sIIIII")
+    SLOT_HEADER = struct.Struct("<QqII")
+    SLOT_ALIGN = 64
+    
+    def __init__(self, path, slot_count, max_width, max_height):
+        self.path = path
+        self.slot_count = slot_count
+        self.max_width = max_width
+        self.max_height = max_height
+        self.pixel_bytes = max_width * max_height * self.CHANNELS
+        self.header_size = self._align(self.HEADER.size)
+        self.pixel_offset = self._align(self.SLOT_HEADER.size)
+        self.slot_size = self._align(self.pixel_offset + self.pixel_bytes)
+        self.size = self.header_size + self.slot_count * self.slot_size
+        
+        # Never follow a symlink planted at the ring path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+        with os.fdopen(fd, 'w+b') as f:
+            f.truncate(self.size)
+            self._mmap = mmap.mmap(f.fileno(), self.size)
+        self.HEADER.pack_into(self._mmap, 0, self.MAGIC, self.VERSION, slot_count,
+                              max_width, max_height, self.CHANNELS)
+        
+        # One preallocated view per slot; frames are sliced out of these without copying
+        self._pixels = [
+            np.frombuffer(self._mmap, dtype=np.uint8, count=self.pixel_bytes,
+                          offset=self.slot_offset(i) + self.pixel_offset)
+            for i in range(slot_count)
+        ]
+    
+    @staticmethod
+    def resolve_path(path):
+        """Check a client-supplied ring path: a RING_PREFIX file directly in SHM_DIR"""
+        if not path:
+            return DEFAULT_RING_PATH
+        if not isinstance(path, str):
+            raise ValueError(f'Invalid ring path type: {type(path)}')
+        resolved = os.path.join(os.path.realpath(os.path.dirname(path) or SHM_DIR), os.path.basename(path))
+        if (os.path.dirname(resolved) != os.path.realpath(SHM_DIR)
+                or not os.path.basename(resolved).startswith(RING_PREFIX)):
+            raise ValueError(f'Ring path must be {os.path.join(SHM_DIR, RING_PREFIX)}*: {path}')
+        return resolved
+    
+    @classmethod
+    def _align(cls, n):
+        return (n + cls.SLOT_ALIGN - 1) // cls.SLOT_ALIGN * cls.SLOT_ALIGN
+    
+    def slot_offset(self, slot):
+        return self.header_size + slot * self.slot_size
+    
+    def slot_sequence(self, slot):
+        return struct.unpack_from("<Q", self._mmap, self.slot_offset(slot))[0]
+    
+    def read_slot(self, slot):
+        """Return (rgb view, sequence) for a slot, or (None, sequence) while it is being written"""
+        if not 0 <= slot < self.slot_count:
+            raise IndexError(f"Slot {slot} out of range (0..{self.slot_count - 1})")
+        sequence, _, width, height = self.SLOT_HEADER.unpack_from(self._mmap, self.slot_offset(slot))
+        if sequence % 2 == 1:
+            return None, sequence
+        if not (0 < width <= self.max_width and 0 < height <= self.max_height):
+            raise ValueError(f"Invalid frame dimensions {width}x{height}")
+        frame = self._pixels[slot][:width * height * self.CHANNELS].reshape(height, width, self.CHANNELS)
+        return frame, sequence
+    
+    def describe(self):
+        """Layout information for the writer"""
+        return {
+            'path': self.path,
+            'size': self.size,
+            'slot_count': self.slot_count,
+            'max_width': self.max_width,
+            'max_height': self.max_height,
+            'channels': self.CHANNELS,
+            'header_size': self.header_size,
+            'slot_size': self.slot_size,
+            'pixel_offset': self.pixel_offset
+        }
+    
+    def close(self, unlink=True):
+        """Release the mapping and optionally remove the backing file"""
+        self._pixels = []
+        try:
+            self._mmap.close()
+        except BufferError as e:
+            print(f"Shared frame ring still in use: {str(e)}", file=sys.stderr)
+        if unlink and os.path.exists(self.path):
+            os.remove(self.path)
+
+def resolve_recording_path(path):
+    """Check a client-supplied recording path: a file directly in RECORD_DIR (default: a new one)"""
+    if not path:
+        return os.path.join(RECORD_DIR, f"posture_{int(time.time())}.poserec")
+    if not isinstance(path, str):
+        raise ValueError(f'Invalid recording path type: {type(path)}')
+    resolved = os.path.join(os.path.realpath(os.path.dirname(path) or RECORD_DIR), os.path.basename(path))
+    if os.path.dirname(resolved) != os.path.realpath(RECORD_DIR) or os.path.basename(resolved) in ('', '.', '..'):
+        raise ValueError(f'Recording path must be a file in {RECORD_DIR}: {path}')
+    return resolved
+
 def setup_communication_dirs():
     """Create communication directories if they don't exist"""
     os.makedirs(COMMAND_DIR, exist_ok=True)
@@ -229,6 +981,9 @@ def cleanup_communication_dirs():
         # Clean up response files
         for file in glob.glob(f"{RESPONSE_DIR}/*.json"):
             os.remove(file)
+
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
             
         print("Communication directories cleaned up", file=sys.stderr)
     except Exception as e:
@@ -243,6 +998,11 @@ def send_response(response_type, data, request_id):
             'timestamp': int(time.time() * 1000),
             'data': data
         }
+
+        sock = getattr(_response_target, 'sock', None)
+        if sock is not None:
+            send_message(sock, response)
+            return
         
         response_file = f"{RESPONSE_DIR}/response_{request_id}.json"
         with open(response_file, 'w') as f:
@@ -253,10 +1013,23 @@ def send_response(response_type, data, request_id):
     except Exception as e:
         print(f"Error sending response: {str(e)}", file=sys.stderr)
 
-def process_command(command_data, request_id):
-    """Process a command from the Kotlin app"""
+def send_timed_response(response_type, data, request_id, timings):
+    """send_response for a frame result; records the frame's timings including serialization"""
+    timer = StageTimer()
+    send_response(response_type, data, request_id)
+    # json encoding plus the write to the socket or response file
+    timer.lap('serialize')
+    timings.update(timer.timings)
+    detector.stats.record(timings)
+    if data is not None and data.get('success'):
+        startup.landmark_sent()
+
+def process_command(command_data, request_id, received_at=None):
+    """Process a command from the Kotlin app (received_at: perf_counter() time it arrived)"""
+    global frame_ring, recorder, last_command_at
     try:
         cmd_type = command_data.get('type')
+        last_command_at = time.monotonic()
         
         if not cmd_type:
             send_response('error', {'message': 'Command missing type field'}, request_id)
@@ -264,7 +1037,22 @@ def process_command(command_data, request_id):
         
         print(f"Processing command: {cmd_type}", file=sys.stderr)
         
+        if cmd_type in ('ping', 'status') and not runtime_ready.is_set():
+            # Answer health checks while MediaPipe is still being imported
+            send_response('pong' if cmd_type == 'ping' else 'status_response', {
+                'alive': True,
+                'loading': True,
+                'initialized': False,
+                'startup': startup.as_dict()
+            }, request_id)
+            return
+        # Everything else waits for the background import (a no-op once it is done)
+        load_runtime()
+        
         if cmd_type == 'init':
+            startup.init_received()
+            if recorder is not None:
+                recorder.init({k: v for k, v in command_data.items() if k != 'request_id'})
             # Initialize MediaPipe
             model_path = command_data.get('model_path')
             print(f"Initializing with model: {model_path}", file=sys.stderr)
@@ -283,9 +1071,54 @@ def process_command(command_data, request_id):
                 }, request_id)
                 return
             
-            success = detector.initialize(model_path)
+            running_mode = command_data.get('running_mode', 'video')
+            if running_mode not in RUNNING_MODES:
+                send_response('init_response', {
+                    'success': False,
+                    'message': f'Invalid running mode: {running_mode} (expected one of {", ".join(RUNNING_MODES)})'
+                }, request_id)
+                return
+            
+            try:
+                detector.configure_output(command_data.get('landmark_format', 'json'),
+                                          command_data.get('landmarks'),
+                                          command_data.get('metrics', False),
+                                          command_data.get('calibrated_ratio'))
+                detector.configure_motion_gate(command_data.get('motion_gate', False),
+                                               command_data.get('motion_threshold', 2.0),
+                                               command_data.get('max_reuse_ms', 1000))
+                detector.configure_filter(command_data.get('filter', False),
+                                          command_data.get('min_cutoff', 1.0),
+                                          command_data.get('beta', 0.5))
+                detector.configure_summary(command_data.get('summary', False),
+                                           command_data.get('summary_score', 'ratio_score'),
+                                           command_data.get('summary_threshold', 60),
+                                           command_data.get('slouch_min_s', 3.0))
+                detector.include_timing = bool(command_data.get('timing', False))
+                detector.decoder = FrameDecoder(int(command_data.get('decode_side', DEFAULT_DECODE_SIDE)))
+            except (ValueError, TypeError) as e:
+                send_response('init_response', {
+                    'success': False,
+                    'message': f'Invalid output options: {str(e)}'
+                }, request_id)
+                return
+            
+            latency_budget_ms = command_data.get('latency_budget_ms')
+            try:
+                latency_budget_ms = None if latency_budget_ms is None else float(latency_budget_ms)
+            except (ValueError, TypeError):
+                send_response('init_response', {
+                    'success': False,
+                    'message': f'Invalid latency budget: {latency_budget_ms}'
+                }, request_id)
+                return
+            
+            success = detector.initialize(model_path, running_mode,
+                                          command_data.get('lite_model_path'), latency_budget_ms)
             send_response('init_response', {
                 'success': success,
+                'running_mode': running_mode,
+                'models': list(detector.landmarkers),
                 'message': 'Initialized successfully' if success else 'Initialization failed'
             }, request_id)
             
@@ -333,28 +1166,303 @@ def process_command(command_data, request_id):
                 }, request_id)
                 return
             
-            result = detector.process_frame(frame_data, timestamp)
-            send_response('detection_result', result, request_id)
+            record_seq = None
+            if recorder is not None:
+                try:
+                    frame_bytes = base64.b64decode(frame_data)
+                except ValueError:
+                    # Not recordable; process_frame answers with the usual invalid frame result
+                    frame_bytes = None
+                if frame_bytes is not None:
+                    record_seq = recorder.frame(frame_bytes, timestamp, base64=True)
+            
+            result, timings = detector.run_timed(detector.process_frame, (frame_data, timestamp), received_at)
+            if record_seq is not None and result is not None:
+                recorder.result(record_seq, result)
+            send_timed_response('detection_result', result, request_id, timings)
+            
+        elif cmd_type == 'predict':
+            # Landmarks between inferences, from the per-session temporal model
+            raw_timestamp = command_data.get('timestamp')
+            try:
+                timestamp = None if raw_timestamp is None else int(raw_timestamp)
+            except (ValueError, TypeError, OverflowError):
+                send_response('prediction', {
+                    'success': False,
+                    'message': f'Invalid timestamp: {raw_timestamp}'
+                }, request_id)
+                return
+            send_response('prediction', detector.predict(timestamp), request_id)
+            
+        elif cmd_type == 'score_batch':
+            # Score many landmark frames at once: frames = [[{x, y, ...} x 33], ...]
+            frames = command_data.get('frames')
+            if not isinstance(frames, list) or not frames:
+                send_response('score_batch_response', {
+                    'success': False,
+                    'message': 'No frames provided'
+                }, request_id)
+                return
+            
+            try:
+                calibrated_ratio = command_data.get('calibrated_ratio')
+                batch = compute_metrics_batch(frames, None if calibrated_ratio is None else float(calibrated_ratio))
+            except (ValueError, TypeError, IndexError) as e:
+                send_response('score_batch_response', {
+                    'success': False,
+                    'message': f'Invalid frames: {str(e)}'
+                }, request_id)
+                return
+            
+            send_response('score_batch_response', {
+                'success': True,
+                'count': len(batch['ratio']),
+                'metrics': metrics_batch_to_json(batch)
+            }, request_id)
+            
+        elif cmd_type == 'shm_open':
+            # Create the shared-memory frame ring; the client writes raw RGB frames into it
+            try:
+                slots = int(command_data.get('slots', 4))
+                width = int(command_data.get('width', 1280))
+                height = int(command_data.get('height', 720))
+            except (ValueError, TypeError):
+                send_response('shm_open_response', {
+                    'success': False,
+                    'message': 'Invalid ring dimensions'
+                }, request_id)
+                return
+            
+            if slots <= 0 or width <= 0 or height <= 0:
+                send_response('shm_open_response', {
+                    'success': False,
+                    'message': f'Invalid ring dimensions: {slots} slots of {width}x{height}'
+                }, request_id)
+                return
+            
+            try:
+                path = SharedFrameRing.resolve_path(command_data.get('path'))
+            except ValueError as e:
+                send_response('shm_open_response', {
+                    'success': False,
+                    'message': str(e)
+                }, request_id)
+                return
+            
+            if frame_ring is not None:
+                frame_ring.close()
+                frame_ring = None
+            try:
+                frame_ring = SharedFrameRing(path, slots, width, height)
+            except OSError as e:
+                send_response('shm_open_response', {
+                    'success': False,
+                    'message': f'Cannot create ring: {str(e)}'
+                }, request_id)
+                return
+            response = frame_ring.describe()
+            response['success'] = True
+            send_response('shm_open_response', response, request_id)
+            
+        elif cmd_type == 'detect_shm':
+            # Process a frame already sitting in the shared-memory ring
+            try:
+                slot = int(command_data.get('slot'))
+            except (ValueError, TypeError):
+                slot = None
+            try:
+                timestamp = int(command_data.get('timestamp') or time.time() * 1000)
+            except (ValueError, TypeError):
+                timestamp = int(time.time() * 1000)
+            
+            if frame_ring is None or slot is None:
+                send_response('detection_result', {
+                    'landmarks': [],
+                    'timestamp': timestamp,
+                    'success': False,
+                    'message': 'Shared frame ring not open' if frame_ring is None else 'No slot provided'
+                }, request_id)
+                return
+            
+            result, timings = detector.run_timed(detector.process_shared_frame, (frame_ring, slot, timestamp), received_at)
+            send_timed_response('detection_result', result, request_id, timings)
+            
+        elif cmd_type == 'shm_close':
+            if frame_ring is not None:
+                frame_ring.close()
+                frame_ring = None
+            send_response('shm_close_response', {'success': True}, request_id)
             
         elif cmd_type == 'ping':
             # Heartbeat/ping command
             send_response('pong', {
                 'alive': True,
                 'mediapipe_available': MEDIAPIPE_AVAILABLE,
-                'initialized': detector.is_initialized
+                'initialized': detector.is_initialized,
+                'daemon': DAEMON_MODE
             }, request_id)
             
         elif cmd_type == 'status':
             # Status command to check service health
-            send_response('status_response', {
+            status = {
                 'mediapipe_available': MEDIAPIPE_AVAILABLE,
-                'initialized': detector.is_initialized
+                'initialized': detector.is_initialized,
+                'active_model': detector.active_model,
+                'daemon': DAEMON_MODE,
+                'startup': startup.as_dict()
+            }
+            if detector.motion_gate is not None:
+                status['frames_inferred'] = detector.motion_gate.inferred
+                status['frames_reused'] = detector.motion_gate.reused
+            if detector.model_selector is not None:
+                status['latency_budget_ms'] = detector.model_selector.budget_ms
+                status['model_avg_ms'] = {
+                    label: round(detector.model_selector.average(label), 2)
+                    for label in detector.model_selector.samples
+                    if detector.model_selector.samples[label]
+                }
+            send_response('status_response', status, request_id)
+            
+        elif cmd_type == 'stats':
+            # Rolling per-stage timings (p50/p95/p99), frame rate and reuse counts
+            stats = detector.stats.snapshot()
+            if detector.motion_gate is not None:
+                stats['frames_reused'] = detector.motion_gate.reused
+            send_response('stats_response', stats, request_id)
+            if command_data.get('reset'):
+                detector.stats.reset()
+            
+        elif cmd_type == 'session_summary':
+            # Rolling score aggregates of this session; the client uploads these instead of per-frame scores
+            if detector.summary is None:
+                send_response('session_summary_response', {
+                    'success': False,
+                    'message': 'Summary not enabled'
+                }, request_id)
+                return
+            since = command_data.get('since')
+            try:
+                since = None if since is None else int(since)
+            except (ValueError, TypeError):
+                send_response('session_summary_response', {
+                    'success': False,
+                    'message': f'Invalid since: {since}'
+                }, request_id)
+                return
+            send_response('session_summary_response', {
+                'success': True,
+                'summary': detector.summary.snapshot(since)
+            }, request_id)
+            if command_data.get('reset'):
+                detector.summary.reset()
+            
+        elif cmd_type == 'calibrate':
+            # Robust calibration baseline from a burst of images, or from the detections of the next duration_ms
+            if not detector.is_initialized:
+                send_response('calibrate_response', {
+                    'success': False,
+                    'message': 'Not initialized'
+                }, request_id)
+                return
+            
+            images = command_data.get('images')
+            try:
+                outlier_z = float(command_data.get('outlier_z', DEFAULT_OUTLIER_Z))
+                min_frames = int(command_data.get('min_frames', DEFAULT_MIN_FRAMES))
+                check_calibration_options(outlier_z, min_frames)
+                window = None
+                if images is None:
+                    window = CalibrationWindow(float(command_data.get('duration_ms', 3000)), outlier_z, min_frames,
+                                               int(command_data.get('max_frames', DEFAULT_MAX_FRAMES)))
+            except (ValueError, TypeError) as e:
+                send_response('calibrate_response', {
+                    'success': False,
+                    'message': f'Invalid calibration options: {str(e)}'
+                }, request_id)
+                return
+            apply = bool(command_data.get('apply', False))
+            
+            if window is not None:
+                # Answered right away; the first detection after the window closes carries the baseline
+                detector.start_calibration(window, apply)
+                send_response('calibrate_response', {
+                    'success': True,
+                    'collecting': True,
+                    'duration_ms': window.duration_ms
+                }, request_id)
+                return
+            
+            if not isinstance(images, list) or not images or not all(isinstance(image, str) for image in images):
+                send_response('calibrate_response', {
+                    'success': False,
+                    'message': 'No images provided'
+                }, request_id)
+                return
+            
+            if detector.running_mode == vision.RunningMode.LIVE_STREAM:
+                send_response('calibrate_response', {
+                    'success': False,
+                    'message': 'Calibration bursts need the image or video running mode (use duration_ms)'
+                }, request_id)
+                return
+            
+            result = detector.calibrate_images(images, outlier_z, min_frames)
+            send_response('calibrate_response', detector.apply_calibration(result, apply), request_id)
+            
+        elif cmd_type == 'profile':
+            # cProfile the next N detections; the last one's response carries the summary
+            try:
+                profile = detector.start_profile(command_data.get('frames', 30))
+            except (ValueError, TypeError) as e:
+                send_response('profile_response', {
+                    'success': False,
+                    'message': f'Invalid frame count: {str(e)}'
+                }, request_id)
+                return
+            send_response('profile_response', {
+                'success': True,
+                'frames': profile.frames,
+                'path': profile.path
             }, request_id)
             
+        elif cmd_type == 'record':
+            # Start or stop recording this session for offline replay
+            response = {}
+            if recorder is not None:
+                recorder.close()
+                print(f"Recording stopped: {recorder.path} ({recorder.frames} frames)", file=sys.stderr)
+                response = recorder.describe()
+                recorder = None
+            if command_data.get('enabled', True):
+                try:
+                    path = resolve_recording_path(command_data.get('path'))
+                except ValueError as e:
+                    send_response('record_response', {
+                        'success': False,
+                        'message': str(e)
+                    }, request_id)
+                    return
+                try:
+                    os.makedirs(RECORD_DIR, mode=0o700, exist_ok=True)
+                    recorder = SessionRecorder(path)
+                except OSError as e:
+                    send_response('record_response', {
+                        'success': False,
+                        'message': f'Cannot open recording: {str(e)}'
+                    }, request_id)
+                    return
+                print(f"Recording to {path}", file=sys.stderr)
+                response = recorder.describe()
+            response.update({'success': True, 'recording': recorder is not None})
+            send_response('record_response', response, request_id)
+            
         elif cmd_type == 'close':
-            # Close service
-            detector.close()
-            send_response('close_response', {'success': True}, request_id)
+            if DAEMON_MODE:
+                # Keep the warm landmarkers for the next client; only its settings are dropped
+                detector.reset_session()
+            else:
+                detector.close()
+            send_response('close_response', {'success': True, 'daemon': DAEMON_MODE}, request_id)
             
         else:
             send_response('error', {
@@ -369,39 +1477,49 @@ def process_command(command_data, request_id):
             'message': f'Processing error: {str(e)}'
         }, request_id)
 
-def watch_for_commands():
-    """Watch for command files and process them"""
-    print("Starting command watcher...", file=sys.stderr)
+def handle_command_file(command_file):
+    """Process a single command file and remove it"""
+    try:
+        # Time spent waiting in the command directory counts as queue time
+        received_at = time.perf_counter() - max(0.0, time.time() - os.path.getmtime(command_file))
+        
+        # Read command
+        with open(command_file, 'r') as f:
+            command_data = json.load(f)
+        
+        # Extract request ID from filename
+        request_id = os.path.basename(command_file).replace('.json', '')
+        
+        print(f"Processing command file: {command_file}", file=sys.stderr)
+        
+        # Process command
+        with command_lock:
+            process_command(command_data, request_id, received_at)
+        
+        # Remove command file
+        os.remove(command_file)
+        
+    except Exception as e:
+        print(f"Error processing command file {command_file}: {str(e)}", file=sys.stderr)
+        # Try to remove the problematic file
+        try:
+            os.remove(command_file)
+        except:
+            pass
+
+def process_pending_command_files():
+    """Process every command file currently in the command directory"""
+    for command_file in sorted(glob.glob(f"{COMMAND_DIR}/*.json")):
+        if os.path.exists(command_file):
+            handle_command_file(command_file)
+
+def poll_for_commands():
+    """Watch for command files by polling (portable fallback)"""
+    print("Starting polling command watcher...", file=sys.stderr)
     
     while True:
         try:
-            # Look for command files
-            command_files = glob.glob(f"{COMMAND_DIR}/*.json")
-            
-            for command_file in command_files:
-                try:
-                    # Read command
-                    with open(command_file, 'r') as f:
-                        command_data = json.load(f)
-                    
-                    # Extract request ID from filename
-                    request_id = os.path.basename(command_file).replace('.json', '')
-                    
-                    print(f"Processing command file: {command_file}", file=sys.stderr)
-                    
-                    # Process command
-                    process_command(command_data, request_id)
-                    
-                    # Remove command file
-                    os.remove(command_file)
-                    
-                except Exception as e:
-                    print(f"Error processing command file {command_file}: {str(e)}", file=sys.stderr)
-                    # Try to remove the problematic file
-                    try:
-                        os.remove(command_file)
-                    except:
-                        pass
+            process_pending_command_files()
             
             # Small delay to prevent excessive CPU usage
             time.sleep(0.1)
@@ -413,17 +1531,222 @@ def watch_for_commands():
             print(f"Error in command watcher: {str(e)}", file=sys.stderr)
             time.sleep(1)  # Wait before retrying
 
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+INOTIFY_EVENT = struct.Struct("iIII")
+
+def open_inotify_watch(path):
+    """Return an inotify fd watching path for finished writes, or None when inotify is unavailable"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, path.encode(), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except Exception as e:
+        print(f"inotify unavailable: {str(e)}", file=sys.stderr)
+        return None
+
+def watch_for_commands():
+    """Watch for command files and process them"""
+    fd = open_inotify_watch(COMMAND_DIR)
+    if fd is None:
+        poll_for_commands()
+        return
+    
+    print("Starting inotify command watcher...", file=sys.stderr)
+    try:
+        # Files written before the watch was registered
+        process_pending_command_files()
+        while True:
+            # Blocks without waking up until a command file is complete
+            buf = os.read(fd, 64 * 1024)
+            offset = 0
+            while offset < len(buf):
+                _, _, _, name_len = INOTIFY_EVENT.unpack_from(buf, offset)
+                offset += INOTIFY_EVENT.size
+                name = buf[offset:offset + name_len].rstrip(b'\0').decode()
+                offset += name_len
+                command_file = os.path.join(COMMAND_DIR, name)
+                if name.endswith('.json') and os.path.exists(command_file):
+                    handle_command_file(command_file)
+    except KeyboardInterrupt:
+        print("Command watcher interrupted", file=sys.stderr)
+    finally:
+        os.close(fd)
+
+def recv_exact(sock, size):
+    """Read exactly size bytes from sock, or None if the peer closed the connection"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            return None
+        received += n
+    return buf
+
+def send_message(sock, message):
+    """Send a length-prefixed JSON message"""
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(FRAME_LENGTH.pack(len(payload)) + payload)
+
+def serve_socket_client(conn):
+    """Process length-prefixed commands from one socket client until it disconnects"""
+    request_counter = 0
+    try:
+        while True:
+            header = recv_exact(conn, FRAME_LENGTH.size)
+            if header is None:
+                break
+            (size,) = FRAME_LENGTH.unpack(header)
+            if size > MAX_MESSAGE_SIZE:
+                print(f"Socket message too large: {size} bytes", file=sys.stderr)
+                break
+            payload = recv_exact(conn, size)
+            if payload is None:
+                break
+            
+            request_counter += 1
+            try:
+                command_data = json.loads(payload)
+            except ValueError as e:
+                send_message(conn, {'type': 'error', 'request_id': f'sock_{request_counter}',
+                                    'timestamp': int(time.time() * 1000),
+                                    'data': {'message': f'Invalid JSON: {str(e)}'}})
+                continue
+            request_id = str(command_data.get('request_id') or f'sock_{request_counter}')
+            received_at = time.perf_counter()
+            
+            with command_lock:
+                _response_target.sock = conn
+                try:
+                    process_command(command_data, request_id, received_at)
+                finally:
+                    _response_target.sock = None
+    except OSError as e:
+        print(f"Socket client error: {str(e)}", file=sys.stderr)
+    finally:
+        conn.close()
+
+def serve_socket():
+    """Accept command connections on the Unix domain socket"""
+    if not hasattr(socket, 'AF_UNIX'):
+        return
+    try:
+        if os.path.exists(SOCKET_PATH):
+            os.remove(SOCKET_PATH)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(SOCKET_PATH)
+        server.listen()
+    except OSError as e:
+        print(f"Could not open command socket {SOCKET_PATH}: {str(e)}", file=sys.stderr)
+        return
+    
+    print(f"Listening for commands on socket: {SOCKET_PATH}", file=sys.stderr)
+    while True:
+        conn, _ = server.accept()
+        threading.Thread(target=serve_socket_client, args=(conn,), daemon=True).start()
+
+def warm_up_in_background():
+    """Import the runtime, then load and warm up the default model before any client asks"""
+    load_runtime()
+    if not WARM_MODEL_PATH or not MEDIAPIPE_AVAILABLE or not os.path.exists(WARM_MODEL_PATH):
+        return
+    with command_lock:
+        # A client's init may have won the race; it then already did the work
+        if detector.is_initialized:
+            return
+        try:
+            if detector.initialize(WARM_MODEL_PATH, WARM_RUNNING_MODE):
+                detector.warm_up()
+                startup.mark('warm')
+        except Exception as e:
+            print(f"Model warm-up failed: {str(e)}", file=sys.stderr)
+
+def running_daemon_pid():
+    """PID of a daemon that already answers on SOCKET_PATH, or None"""
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(SOCKET_PATH):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2.0)
+            sock.connect(SOCKET_PATH)
+            send_message(sock, {'type': 'ping', 'request_id': 'daemon_probe'})
+            header = recv_exact(sock, FRAME_LENGTH.size)
+            if header is None:
+                return None
+            reply = json.loads(recv_exact(sock, FRAME_LENGTH.unpack(header)[0]))
+        if not reply.get('data', {}).get('daemon'):
+            return None
+        with open(PID_FILE) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def detach_output():
+    """
+    Daemon mode: point stdout/stderr at DAEMON_LOG and stdin at /dev/null. A launcher's pipes
+    break when it exits, and the next write to them would raise BrokenPipeError mid-command.
+    The file descriptors themselves are replaced, so MediaPipe's native logging moves too.
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    log_fd = os.open(DAEMON_LOG, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    null_fd = os.open(os.devnull, os.O_RDONLY)
+    try:
+        os.dup2(null_fd, 0)
+        os.dup2(log_fd, 1)
+        os.dup2(log_fd, 2)
+    finally:
+        os.close(null_fd)
+        os.close(log_fd)
+
+def exit_when_idle():
+    """Daemon mode: shut down after DAEMON_IDLE_S without any command"""
+    while True:
+        time.sleep(min(60.0, DAEMON_IDLE_S))
+        if time.monotonic() - last_command_at > DAEMON_IDLE_S:
+            print(f"Idle for {DAEMON_IDLE_S:.0f}s, exiting", file=sys.stderr)
+            os.kill(os.getpid(), signal.SIGTERM)
+            return
+
 def main():
     """Main function to handle communication with Kotlin app"""
-    global detector
-    detector = MediaPipePoseDetector()
+    global recorder
+    if DAEMON_MODE:
+        pid = running_daemon_pid()
+        if pid is not None:
+            # Launchers can start the daemon unconditionally; the warm one keeps serving
+            print(f"Pose daemon already running (PID {pid})", file=sys.stderr)
+            return
+        print(f"Pose daemon logging to {DAEMON_LOG}", file=sys.stderr)
+        detach_output()
     
-    print("MediaPipe Pose Detector Service Started", file=sys.stderr)
+    print("MediaPipe Pose Detector Service Started" + (" (daemon)" if DAEMON_MODE else ""), file=sys.stderr)
+    
+    if os.environ.get("POSTURE_RECORD"):
+        recorder = SessionRecorder(os.environ["POSTURE_RECORD"])
+        print(f"Recording to {recorder.path}", file=sys.stderr)
     
     # Set up signal handlers for graceful shutdown
     def signal_handler(signum, frame):
         print("Received signal, shutting down gracefully...", file=sys.stderr)
-        detector.close()
+        if detector is not None:
+            detector.close()
+        if frame_ring is not None:
+            frame_ring.close()
+        if recorder is not None:
+            recorder.close()
         cleanup_communication_dirs()
         sys.exit(0)
     
@@ -436,6 +1759,15 @@ def main():
     print("Ready to receive commands via file notifications", file=sys.stderr)
     print("Watching for commands in:", COMMAND_DIR, file=sys.stderr)
     
+    # Socket transport runs alongside the file watcher so existing clients keep working
+    threading.Thread(target=serve_socket, daemon=True).start()
+    
+    # Ready for commands now; MediaPipe is imported and the model warmed up meanwhile
+    startup.mark('ready')
+    threading.Thread(target=warm_up_in_background, daemon=True).start()
+    if DAEMON_MODE:
+        threading.Thread(target=exit_when_idle, daemon=True).start()
+    
     try:
         # Start watching for commands
         watch_for_commands()
@@ -451,7 +1783,12 @@ def main():
         traceback.print_exc(file=sys.stderr)
     finally:
         try:
-            detector.close()
+            if detector is not None:
+                detector.close()
+            if frame_ring is not None:
+                frame_ring.close()
+            if recorder is not None:
+                recorder.close()
             cleanup_communication_dirs()
             print("Service stopped", file=sys.stderr)
         except Exception as e:
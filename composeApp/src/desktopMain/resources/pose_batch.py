@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Offline batch pose extraction
+
+Runs the pose landmarker over recorded videos and image directories at full machine
+throughput and writes landmarks plus posture metrics to one columnar file:
+
+    python pose_batch.py session1.mp4 session2.mp4 frames_dir/ -o poses.npz --workers 4
+
+Inputs are split into chunks that are processed by a pool of worker processes, each with
+its own landmarker. Videos are read with a streaming reader (never fully in memory) and
+every video chunk runs in VIDEO mode on a fresh landmarker, so tracking works inside a
+chunk; --chunk-frames bounds the chunk length to spread one long video over several
+workers (tracking restarts at each chunk boundary). Image directories are processed in
+IMAGE mode, sorted by file name.
+
+Output columns (one row per frame, in input order):
+- source (index into "sources"), frame_index, timestamp_ms, detected
+- landmarks: (F, 33, 5) float32 x, y, z, visibility, presence (NaN when not detected)
+- one column per posture metric from pose_metrics (NaN / -1 / "" when not detected)
+.npz is written with numpy; .parquet needs pyarrow (landmarks as 165 float columns).
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from pose_landmarks import FIELDS, LANDMARK_NAMES, NUM_LANDMARKS, landmarks_to_array
+from pose_metrics import compute_metrics_batch
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+DEFAULT_MODEL = "pose_landmarker_full.task"
+# Wide enough for every ratio_status / metric_status label
+STATUS_DTYPE = "<U32"
+
+# Per-worker state (set by _init_worker)
+_worker_model_path: Optional[str] = None
+_worker_image_landmarker = None
+
+
+def list_images(directory: str) -> List[str]:
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+    return [os.path.join(directory, n) for n in names]
+
+
+def video_info(path: str):
+    """Return (frame_count, fps) of a video; frame_count is 0 when the container does not say."""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"cannot open video: {path}")
+    try:
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+    finally:
+        cap.release()
+    return max(count, 0), fps if fps > 0 else 30.0
+
+
+def plan_chunks(inputs: List[str], chunk_frames: int) -> Tuple[List[str], List[tuple]]:
+    """Split the inputs into work items: ("video", source, path, start, count, fps) or ("images", source, paths, start)."""
+    sources, chunks = [], []
+    for path in inputs:
+        source = len(sources)
+        sources.append(os.path.abspath(path))
+        if os.path.isdir(path):
+            images = list_images(path)
+            step = chunk_frames or 256
+            for start in range(0, len(images), step):
+                chunks.append(("images", source, images[start:start + step], start))
+            continue
+        count, fps = video_info(path)
+        if chunk_frames <= 0 or count <= 0:
+            # Unknown length (or no splitting): the whole video is one chunk
+            chunks.append(("video", source, path, 0, -1, fps))
+            continue
+        for start in range(0, count, chunk_frames):
+            chunks.append(("video", source, path, start, min(chunk_frames, count - start), fps))
+    return sources, chunks
+
+
+def _init_worker(model_path: str):
+    global _worker_model_path
+    _worker_model_path = model_path
+    # One inference thread per process; parallelism comes from the pool
+    cv2.setNumThreads(1)
+
+
+def _create_landmarker(mode: str):
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+    options = vision.PoseLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_path=_worker_model_path),
+        running_mode=getattr(vision.RunningMode, mode),
+        num_poses=1,
+        min_pose_detection_confidence=0.5,
+        min_pose_presence_confidence=0.5,
+        min_tracking_confidence=0.5,
+        output_segmentation_masks=False,
+    )
+    return vision.PoseLandmarker.create_from_options(options)
+
+
+def _empty_landmarks() -> np.ndarray:
+    return np.full((NUM_LANDMARKS, len(FIELDS)), np.nan, dtype=np.float32)
+
+
+def _to_array(result) -> np.ndarray:
+    if not result.pose_landmarks:
+        return _empty_landmarks()
+    return landmarks_to_array(result.pose_landmarks[0])
+
+
+def _mp_image(frame_bgr: np.ndarray):
+    import mediapipe as mp
+    return mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+
+
+def process_video_chunk(source: int, path: str, start: int, count: int, fps: float) -> dict:
+    """Run a fresh VIDEO-mode landmarker over frames [start, start + count) of a video."""
+    cap = cv2.VideoCapture(path)
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    landmarker = _create_landmarker("VIDEO")
+    rows, indices, timestamps = [], [], []
+    try:
+        index = start
+        while count < 0 or index < start + count:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            # Frame-index based timestamps are strictly increasing even when the container's are not
+            timestamp_ms = int(round(index * 1000.0 / fps))
+            rows.append(_to_array(landmarker.detect_for_video(_mp_image(frame), timestamp_ms)))
+            indices.append(index)
+            timestamps.append(timestamp_ms)
+            index += 1
+    finally:
+        landmarker.close()
+        cap.release()
+    return _chunk_result(source, rows, indices, timestamps)
+
+
+def process_image_chunk(source: int, paths: List[str], start: int) -> dict:
+    """Run the worker's IMAGE-mode landmarker over a run of image files."""
+    global _worker_image_landmarker
+    if _worker_image_landmarker is None:
+        _worker_image_landmarker = _create_landmarker("IMAGE")
+    rows, indices, timestamps = [], [], []
+    for offset, path in enumerate(paths):
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            print(f"Skipping unreadable image: {path}", file=sys.stderr)
+            rows.append(_empty_landmarks())
+        else:
+            rows.append(_to_array(_worker_image_landmarker.detect(_mp_image(frame))))
+        indices.append(start + offset)
+        timestamps.append(-1)
+    return _chunk_result(source, rows, indices, timestamps)
+
+
+def _chunk_result(source: int, rows: list, indices: list, timestamps: list) -> dict:
+    landmarks = np.stack(rows) if rows else np.zeros((0, NUM_LANDMARKS, len(FIELDS)), dtype=np.float32)
+    return {
+        "source": np.full(len(rows), source, dtype=np.int32),
+        "frame_index": np.asarray(indices, dtype=np.int64),
+        "timestamp_ms": np.asarray(timestamps, dtype=np.int64),
+        "landmarks": landmarks,
+    }
+
+
+def run_chunk(chunk: tuple) -> dict:
+    if chunk[0] == "video":
+        return process_video_chunk(*chunk[1:])
+    return process_image_chunk(*chunk[1:])
+
+
+def metrics_columns(landmarks: np.ndarray, detected: np.ndarray, calibrated_ratio: Optional[float]) -> dict:
+    """Posture metrics for every frame; frames without a pose get NaN / -1 / ""."""
+    columns = {}
+    batch = compute_metrics_batch(landmarks[detected], calibrated_ratio) if detected.any() else None
+    template = compute_metrics_batch(np.zeros((1, NUM_LANDMARKS, 2)), calibrated_ratio)
+    for name, sample in template.items():
+        if sample.dtype.kind == "U":
+            column = np.full(len(detected), "", dtype=STATUS_DTYPE)
+        elif sample.dtype.kind == "f":
+            column = np.full(len(detected), np.nan, dtype=np.float32)
+        else:
+            column = np.full(len(detected), -1, dtype=np.int16)
+        if batch is not None:
+            column[detected] = batch[name]
+        columns[name] = column
+    return columns
+
+
+def write_npz(path: str, sources: List[str], columns: dict):
+    np.savez_compressed(path, sources=np.asarray(sources), **columns)
+
+
+def write_parquet(path: str, sources: List[str], columns: dict):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Please install pyarrow for Parquet output: pip install pyarrow")
+    table = {"source_path": np.asarray(sources)[columns["source"]]}
+    for name, values in columns.items():
+        if name != "landmarks":
+            table[name] = values
+    flat = columns["landmarks"].reshape(len(columns["source"]), -1)
+    for i, name in enumerate(LANDMARK_NAMES):
+        for j, field in enumerate(FIELDS):
+            table[f"{name}_{field}"] = flat[:, i * len(FIELDS) + j]
+    pq.write_table(pa.table(table), path, compression="zstd")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Extract pose landmarks and posture metrics from videos and image directories")
+    parser.add_argument("inputs", nargs="+", help="video files and/or directories of images")
+    parser.add_argument("-o", "--output", required=True, help="output file (.npz or .parquet)")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="PoseLandmarker .task model")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--chunk-frames", type=int, default=0,
+                        help="split videos into chunks of this many frames (0 = one chunk per video)")
+    parser.add_argument("--calibrated-ratio", type=float, default=None, help="calibrated face-to-shoulder ratio for scoring")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.model) or os.path.getsize(args.model) == 0:
+        print(f"Error: Model file {args.model} not found", file=sys.stderr)
+        return 1
+    for path in args.inputs:
+        if not os.path.exists(path):
+            print(f"Error: input not found: {path}", file=sys.stderr)
+            return 1
+    if not args.output.endswith((".npz", ".parquet")):
+        print("Error: output must end in .npz or .parquet", file=sys.stderr)
+        return 1
+
+    sources, chunks = plan_chunks(args.inputs, args.chunk_frames)
+    workers = max(1, min(args.workers, len(chunks) or 1))
+    print(f"Processing {len(sources)} input(s) as {len(chunks)} chunk(s) on {workers} worker(s)", file=sys.stderr)
+
+    started = time.perf_counter()
+    parts = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(os.path.abspath(args.model),)) as pool:
+        # map() keeps chunk order, so rows come out in input order
+        for done, part in enumerate(pool.map(run_chunk, chunks), 1):
+            parts.append(part)
+            print(f"  chunk {done}/{len(chunks)}: {len(part['frame_index'])} frames", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    columns = {name: np.concatenate([p[name] for p in parts]) for name in ("source", "frame_index", "timestamp_ms", "landmarks")} \
+        if parts else _chunk_result(0, [], [], [])
+    detected = ~np.isnan(columns["landmarks"][:, 0, 0])
+    columns["detected"] = detected
+    columns.update(metrics_columns(columns["landmarks"], detected, args.calibrated_ratio))
+
+    if args.output.endswith(".parquet"):
+        write_parquet(args.output, sources, columns)
+    else:
+        write_npz(args.output, sources, columns)
+
+    frames = len(detected)
+    print(f"Wrote {frames} frames ({int(detected.sum())} with a pose) to {args.output} "
+          f"in {elapsed:.1f}s ({frames / elapsed if elapsed > 0 else 0:.1f} fps)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
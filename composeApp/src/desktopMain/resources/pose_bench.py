@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pose pipeline
+
+Times every stage of the hot path separately on a deterministic input, and writes the
+results to a JSON file so runs on different commits can be compared:
+
+    python pose_bench.py -o bench.json
+    python pose_bench.py -o bench_new.json --compare bench.json   # exit 1 on a regression
+
+Stages:
+- b64decode, imdecode, bgr2rgb: the per-frame decode steps, one by one
+- decode_rgb: pose_image.FrameDecoder, the decode path both servers use
+- infer_lite / infer_full: PoseLandmarker (IMAGE mode) with pose_landmarker_{lite,full}.task
+- serialize_{json,float32,int16}: encode_landmarks + json.dumps of a detection reply
+- detector_socket / detector_file: mediapipe_pose_detector.process_command round trips over
+  the Unix socket framing and over the command/response file transport
+- ws_detect_json / ws_detect_binary: ws_pose_server.handler round trip over a local WebSocket
+
+The default input is a synthetic 640x480 figure drawn with a fixed seed; --image uses a real
+photo instead (recommended for inference numbers). Stages whose dependencies or model files are
+missing are recorded as skipped with the reason.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import cv2
+
+from pose_image import FrameDecoder
+from pose_landmarks import encode_landmarks
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODELS = {"lite": "pose_landmarker_lite.task", "full": "pose_landmarker_full.task"}
+# A stage counts as regressed when its median is this much slower than the baseline
+DEFAULT_REGRESSION_RATIO = 1.15
+
+
+class Skip(Exception):
+    """Raised by a stage whose dependencies are not available."""
+
+
+def synthetic_frame(width: int = 640, height: int = 480, seed: int = 1234) -> np.ndarray:
+    """A seated stick figure over seeded noise, so every run encodes the same bytes."""
+    rng = np.random.RandomState(seed)
+    frame = rng.randint(90, 140, size=(height, width, 3), dtype=np.uint8)
+    cx, skin, shirt = width // 2, (150, 180, 220), (160, 80, 40)
+    cv2.circle(frame, (cx, 150), 48, skin, -1)
+    cv2.ellipse(frame, (cx, 330), (110, 130), 0, 180, 360, shirt, -1)
+    cv2.rectangle(frame, (cx - 110, 330), (cx + 110, height), shirt, -1)
+    for side in (-1, 1):
+        cv2.line(frame, (cx + side * 100, 230), (cx + side * 150, 380), shirt, 36)
+    return frame
+
+
+def sample_landmarks(seed: int = 1234) -> np.ndarray:
+    rng = np.random.RandomState(seed)
+    return rng.rand(33, 5).astype(np.float32)
+
+
+def time_stage(fn: Callable[[], object], iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+        "stdev_ms": round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0,
+    }
+
+
+def model_path(label: str, model_dir: str) -> str:
+    path = os.path.join(model_dir, MODELS[label])
+    if not os.path.isfile(path) or os.path.getsize(path) == 0:
+        raise Skip(f"model not found: {path}")
+    return path
+
+
+# --- stages -----------------------------------------------------------------
+
+
+def decode_stages(jpeg: bytes):
+    b64 = base64.b64encode(jpeg).decode("ascii")
+    buf = np.frombuffer(jpeg, dtype=np.uint8)
+    frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+    decoder = FrameDecoder()
+    return {
+        "b64decode": lambda: base64.b64decode(b64),
+        "imdecode": lambda: cv2.imdecode(buf, cv2.IMREAD_COLOR),
+        "bgr2rgb": lambda: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+        "decode_rgb": lambda: decoder.decode(jpeg),
+    }
+
+
+def inference_stage(label: str, frame: np.ndarray, model_dir: str):
+    try:
+        import mediapipe as mp
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+    except ImportError as e:
+        raise Skip(f"mediapipe not available: {e}")
+    options = vision.PoseLandmarkerOptions(
+        base_options=python.BaseOptions(model_asset_path=model_path(label, model_dir)),
+        running_mode=vision.RunningMode.IMAGE,
+        num_poses=1,
+    )
+    landmarker = vision.PoseLandmarker.create_from_options(options)
+    image = mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    return lambda: landmarker.detect(image), landmarker.close
+
+
+def serialize_stage(fmt: str):
+    landmarks = sample_landmarks()
+
+    def run():
+        reply = {"type": "detection_result", "timestamp": 0, "success": True}
+        reply.update(encode_landmarks(landmarks, fmt))
+        return json.dumps(reply)
+    return run
+
+
+def _import_detector():
+    try:
+        import mediapipe_pose_detector as detector_module
+    except Exception as e:
+        raise Skip(f"cannot import mediapipe_pose_detector: {e}")
+    detector_module.load_runtime()
+    if not detector_module.MEDIAPIPE_AVAILABLE:
+        raise Skip("mediapipe not available")
+    return detector_module
+
+
+def _init_detector(detector_module, model_dir: str):
+    detector_module.detector = detector_module.MediaPipePoseDetector()
+    if not detector_module.detector.initialize(model_path("full", model_dir), "image"):
+        raise Skip("detector initialization failed")
+
+
+def detector_socket_stage(b64: str, model_dir: str):
+    dm = _import_detector()
+    _init_detector(dm, model_dir)
+    client, server = socket.socketpair()
+    threading.Thread(target=dm.serve_socket_client, args=(server,), daemon=True).start()
+    payload = json.dumps({"type": "detect", "frame_data": b64, "timestamp": 1}).encode("utf-8")
+    request = dm.FRAME_LENGTH.pack(len(payload)) + payload
+
+    def run():
+        client.sendall(request)
+        (size,) = dm.FRAME_LENGTH.unpack(dm.recv_exact(client, dm.FRAME_LENGTH.size))
+        return dm.recv_exact(client, size)
+    return run, client.close
+
+
+def detector_file_stage(b64: str, model_dir: str):
+    dm = _import_detector()
+    _init_detector(dm, model_dir)
+    workdir = tempfile.mkdtemp(prefix="pose_bench_")
+    dm.COMMAND_DIR = os.path.join(workdir, "commands")
+    dm.RESPONSE_DIR = os.path.join(workdir, "responses")
+    os.makedirs(dm.COMMAND_DIR)
+    os.makedirs(dm.RESPONSE_DIR)
+    command = json.dumps({"type": "detect", "frame_data": b64, "timestamp": 1})
+    command_file = os.path.join(dm.COMMAND_DIR, "bench.json")
+    response_file = os.path.join(dm.RESPONSE_DIR, "response_bench.json")
+
+    def run():
+        # Same steps as a real round trip: client writes, service reads/handles/writes, client reads
+        with open(command_file, "w") as f:
+            f.write(command)
+        dm.handle_command_file(command_file)
+        with open(response_file) as f:
+            json.load(f)
+        os.remove(response_file)
+
+    def cleanup():
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+    return run, cleanup
+
+
+def ws_stage(jpeg: bytes, binary: bool):
+    try:
+        import websockets
+        import ws_pose_server
+    except Exception as e:
+        raise Skip(f"cannot import ws_pose_server: {e}")
+    if not ws_pose_server.MEDIAPIPE_AVAILABLE:
+        raise Skip("mediapipe not available")
+    loop = asyncio.new_event_loop()
+
+    async def start():
+        server = await websockets.serve(ws_pose_server.handler, "127.0.0.1", 0, max_size=8 * 1024 * 1024)
+        port = server.sockets[0].getsockname()[1]
+        ws = await websockets.connect(f"ws://127.0.0.1:{port}", max_size=8 * 1024 * 1024)
+        await ws.send(json.dumps({"type": "init", "binary": binary}))
+        reply = json.loads(await ws.recv())
+        if not reply.get("success"):
+            raise Skip(f"pose init failed: {reply}")
+        return server, ws
+
+    server, ws = loop.run_until_complete(start())
+    seq = iter(range(1, 1 << 31))
+    b64 = base64.b64encode(jpeg).decode("ascii")
+
+    async def round_trip():
+        n = next(seq)
+        if binary:
+            await ws.send(ws_pose_server.FRAME_HEADER.pack(ws_pose_server.MSG_DETECT, ws_pose_server.CODEC_JPEG, n, n) + jpeg)
+        else:
+            await ws.send(json.dumps({"type": "detect", "image": b64, "ts": n}))
+        # One reply per frame since the next frame is only sent after this one returns
+        while True:
+            reply = json.loads(await ws.recv())
+            if reply.get("type") == "detection":
+                return reply
+
+    async def stop():
+        await ws.close()
+        server.close()
+        await server.wait_closed()
+
+    def cleanup():
+        loop.run_until_complete(stop())
+        loop.close()
+    return (lambda: loop.run_until_complete(round_trip())), cleanup
+
+
+# --- driver -----------------------------------------------------------------
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=HERE, stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except Exception:
+        return None
+
+
+def environment() -> dict:
+    env = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    try:
+        import mediapipe
+        env["mediapipe"] = mediapipe.__version__
+    except Exception:
+        env["mediapipe"] = None
+    return env
+
+
+def run_benchmarks(frame: np.ndarray, iterations: int, warmup: int, model_dir: str, only=None) -> dict:
+    ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    jpeg = encoded.tobytes()
+    b64 = base64.b64encode(jpeg).decode("ascii")
+
+    stages = {name: (lambda fn=fn: (fn, None)) for name, fn in decode_stages(jpeg).items()}
+    for label in MODELS:
+        stages[f"infer_{label}"] = lambda label=label: inference_stage(label, frame, model_dir)
+    for fmt in ("json", "float32", "int16"):
+        stages[f"serialize_{fmt}"] = lambda fmt=fmt: (serialize_stage(fmt), None)
+    stages["detector_socket"] = lambda: detector_socket_stage(b64, model_dir)
+    stages["detector_file"] = lambda: detector_file_stage(b64, model_dir)
+    stages["ws_detect_json"] = lambda: ws_stage(jpeg, binary=False)
+    stages["ws_detect_binary"] = lambda: ws_stage(jpeg, binary=True)
+
+    results = {}
+    for name, setup in stages.items():
+        if only and name not in only:
+            continue
+        cleanup = None
+        try:
+            fn, cleanup = setup()
+            # Inference and round trips are orders of magnitude slower than the decode stages
+            n = iterations if not name.startswith(("infer_", "detector_", "ws_")) else max(iterations // 10, 10)
+            results[name] = time_stage(fn, n, warmup)
+            print(f"  {name:18s} median {results[name]['median_ms']:9.3f} ms  p95 {results[name]['p95_ms']:9.3f} ms",
+                  file=sys.stderr)
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+            print(f"  {name:18s} skipped: {e}", file=sys.stderr)
+        finally:
+            if cleanup is not None:
+                cleanup()
+    return results
+
+
+def compare(current: dict, baseline: dict, ratio: float) -> list:
+    """Return [(stage, baseline_ms, current_ms)] for every stage whose median regressed."""
+    regressions = []
+    for name, result in current.get("stages", {}).items():
+        base = baseline.get("stages", {}).get(name, {})
+        if "median_ms" not in result or "median_ms" not in base:
+            continue
+        change = result["median_ms"] / base["median_ms"] if base["median_ms"] > 0 else 1.0
+        print(f"  {name:18s} {base['median_ms']:9.3f} -> {result['median_ms']:9.3f} ms ({change:5.2f}x)", file=sys.stderr)
+        if change > ratio:
+            regressions.append((name, base["median_ms"], result["median_ms"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pose pipeline stages")
+    parser.add_argument("-o", "--output", default="pose_bench.json", help="where to write the JSON results")
+    parser.add_argument("--image", help="use this image instead of the synthetic frame")
+    parser.add_argument("--model-dir", default=HERE, help="directory with the pose_landmarker_*.task models")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--stage", action="append", help="only run this stage (repeatable)")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--regression-ratio", type=float, default=DEFAULT_REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    if args.image:
+        frame = cv2.imread(args.image, cv2.IMREAD_COLOR)
+        if frame is None:
+            print(f"Error: cannot read image {args.image}", file=sys.stderr)
+            return 1
+    else:
+        frame = synthetic_frame()
+
+    print(f"Benchmarking {frame.shape[1]}x{frame.shape[0]} frame", file=sys.stderr)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "environment": environment(),
+        "input": {"image": os.path.abspath(args.image) if args.image else "synthetic",
+                  "width": int(frame.shape[1]), "height": int(frame.shape[0])},
+        "stages": run_benchmarks(frame, args.iterations, args.warmup, args.model_dir, args.stage),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.regression_ratio)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before:.3f} -> {after:.3f} ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Robust posture calibration shared by the pose servers
+
+The calibrated ratio the client scores against (calculateRatioScore) is the face-to-shoulder
+ratio of the user sitting upright. robust_baseline() derives it from many landmark frames
+instead of a single snapshot:
+- frames whose face or shoulder landmarks are barely visible are dropped
+- the metrics of all frames are computed in one vectorized pass (see pose_metrics.py)
+- a frame is an outlier when its ratio, torso tilt, neck flex or shoulder tilt lies more
+  than outlier_z robust z-scores (distance from the median in scaled MADs) away
+- the baseline is the mean ratio of the remaining frames, plus the median of every metric
+
+CalibrationWindow collects the landmark frames of a live stream for a while and then
+turns them into a baseline.
+
+The servers' "calibrate" command uses both: with "images" the burst is decoded in
+parallel and run through the session's graph back to back (its tracking state is reset
+afterwards); without, the landmarks of the next detections are collected for duration_ms.
+With "apply":true the ratio becomes the session's calibrated_ratio for metrics and the
+summary score.
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+
+from pose_metrics import LEFT_EYE, LEFT_SHOULDER, NOSE, RIGHT_EYE, RIGHT_SHOULDER, compute_metrics_batch
+
+# Landmarks the ratio is computed from, and the visibility each must have
+KEY_LANDMARKS = [NOSE, LEFT_EYE, RIGHT_EYE, LEFT_SHOULDER, RIGHT_SHOULDER]
+MIN_VISIBILITY = 0.5
+# Robust z-score beyond which a frame is an outlier (Iglewicz and Hoaglin's 3.5)
+DEFAULT_OUTLIER_Z = 3.5
+DEFAULT_MIN_FRAMES = 5
+DEFAULT_MAX_FRAMES = 300
+# Metrics checked for outliers, with a floor on their spread so that a burst of nearly
+# identical frames does not turn every tiny deviation into an outlier
+OUTLIER_METRICS = {"ratio": 0.005, "torso_tilt": 0.5, "neck_flex": 0.5, "shoulder_tilt": 0.2}
+BASELINE_METRICS = ("ratio", "face_to_shoulder_distance", "shoulder_width", "torso_tilt",
+                    "shoulder_tilt", "neck_flex", "head_z_delta", "shoulder_asym_y")
+# MAD to standard deviation for normally distributed values
+MAD_SCALE = 1.4826
+# Spread (std / mean) of the inlier ratios up to which a calibration counts as stable
+MAX_STABLE_SPREAD = 0.05
+
+
+def check_calibration_options(outlier_z: float, min_frames: int):
+    """Raise ValueError for calibration options no baseline can come from."""
+    if not outlier_z > 0:
+        raise ValueError("outlier_z must be positive")
+    if min_frames < 1:
+        raise ValueError("min_frames must be at least 1")
+
+
+def robust_baseline(frames: np.ndarray, outlier_z: float = DEFAULT_OUTLIER_Z,
+                    min_frames: int = DEFAULT_MIN_FRAMES) -> dict:
+    """Calibration baseline from landmark frames shaped (F, 33, C)."""
+    check_calibration_options(outlier_z, min_frames)
+    frames = np.asarray(frames, dtype=np.float64)
+    total = len(frames)
+    result = {"frames": total, "inliers": 0, "rejected": {"low_visibility": 0, "outlier": 0}}
+    inliers = {}
+    if total:
+        visible = np.ones(total, dtype=bool)
+        if frames.shape[2] > 3:
+            visible = (frames[:, KEY_LANDMARKS, 3] >= MIN_VISIBILITY).all(axis=1)
+        batch = compute_metrics_batch(frames[visible]) if visible.any() else {}
+        usable = np.isfinite(batch["ratio"]) & (batch["ratio"] > 0) if batch else np.zeros(0, dtype=bool)
+        result["rejected"]["low_visibility"] = int(total - usable.sum())
+        if usable.sum() >= min_frames:
+            values = np.stack([batch[name][usable] for name in OUTLIER_METRICS])
+            median = np.median(values, axis=1, keepdims=True)
+            deviation = np.abs(values - median)
+            scale = np.maximum(MAD_SCALE * np.median(deviation, axis=1, keepdims=True),
+                               np.array(list(OUTLIER_METRICS.values()))[:, np.newaxis])
+            inlier = (deviation / scale <= outlier_z).all(axis=0)
+            inliers = {name: batch[name][usable][inlier] for name in BASELINE_METRICS}
+            result["inliers"] = int(inlier.sum())
+            result["rejected"]["outlier"] = int((~inlier).sum())
+    # min_frames >= 1, so a success always has inlier ratios to average
+    if result["inliers"] < min_frames:
+        result.update({"success": False,
+                       "message": f"not enough usable frames ({result['inliers']}, need {min_frames})"})
+        return result
+
+    ratio = inliers["ratio"]
+    mean = float(ratio.mean())
+    spread = float(ratio.std()) / mean
+    result.update({
+        "success": True,
+        "calibrated_ratio": round(mean, 4),
+        "ratio_std": round(float(ratio.std()), 4),
+        "spread": round(spread, 4),
+        "stable": spread <= MAX_STABLE_SPREAD,
+        "baseline": {name: round(float(np.median(values)), 4) for name, values in inliers.items()},
+    })
+    return result
+
+
+class CalibrationWindow:
+    """Landmark frames of a live stream collected for duration_ms (at most max_frames)."""
+
+    def __init__(self, duration_ms: float, outlier_z: float = DEFAULT_OUTLIER_Z,
+                 min_frames: int = DEFAULT_MIN_FRAMES, max_frames: int = DEFAULT_MAX_FRAMES):
+        if not duration_ms > 0:
+            raise ValueError("duration_ms must be positive")
+        if max_frames < 1:
+            raise ValueError("max_frames must be at least 1")
+        check_calibration_options(outlier_z, min_frames)
+        self.duration_ms = duration_ms
+        self.outlier_z = outlier_z
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.started = time.monotonic()
+        self.no_pose = 0
+        self._frames = []
+        self._last_timestamp = None
+
+    @property
+    def done(self) -> bool:
+        return (time.monotonic() - self.started) * 1000.0 >= self.duration_ms or len(self._frames) >= self.max_frames
+
+    def add(self, landmarks: Optional[np.ndarray], timestamp: Optional[int] = None):
+        """Collect one result's landmarks (None = no pose); a repeated timestamp is the same result."""
+        if self.done or (timestamp is not None and timestamp == self._last_timestamp):
+            return
+        self._last_timestamp = timestamp
+        if landmarks is None:
+            self.no_pose += 1
+        else:
+            self._frames.append(landmarks)
+
+    def finish(self) -> dict:
+        frames = np.stack(self._frames) if self._frames else np.empty((0, 33, 5))
+        result = robust_baseline(frames, self.outlier_z, self.min_frames)
+        result["rejected"]["no_pose"] = self.no_pose
+        result["duration_ms"] = round((time.monotonic() - self.started) * 1000.0)
+        return result
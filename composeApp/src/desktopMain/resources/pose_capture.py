@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+In-process frame capture for the pose servers
+
+FrameCapture opens a camera (cv2.VideoCapture device index) or a video file and reads it on
+its own thread, handing each frame to a callback as an RGB array with a timestamp in ms.
+This lets a server run capture -> inference itself and send back only landmarks, instead
+of receiving every frame JPEG-encoded from the client.
+
+- cameras: frames are read as fast as the device delivers them (so its buffer never goes
+  stale); max_fps only limits how many are handed on. width/height request a capture size.
+- files: frames are paced at the file's frame rate (realtime=False reads as fast as
+  possible) and repeat=True loops the file.
+Timestamps are ms since the capture started, so they keep increasing across file loops.
+
+The WebSocket server's "capture_start" puts captured frames into the connection's
+latest-frame slot, so a slow inference drops camera frames rather than lagging behind.
+Their detections are marked "capture":true, carry landmarks and metrics only and are not
+recorded by "record".
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Optional, Union
+
+import numpy as np
+import cv2
+
+
+def parse_source(source: Union[int, str]) -> Union[int, str]:
+    """A device index (int or digit string) or an existing video file path; raises ValueError."""
+    if isinstance(source, bool):
+        raise ValueError(f"invalid capture source: {source!r}")
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return int(source)
+    if isinstance(source, str) and os.path.isfile(source):
+        return source
+    raise ValueError(f"invalid capture source: {source!r}")
+
+
+class FrameCapture:
+    """Reads frames on a background thread and calls on_frame(rgb, timestamp_ms) for each."""
+
+    def __init__(self, source: Union[int, str], on_frame: Callable[[np.ndarray, int], None],
+                 on_end: Optional[Callable[[], None]] = None, max_fps: Optional[float] = None,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 repeat: bool = False, realtime: bool = True):
+        self.source = parse_source(source)
+        self.is_file = isinstance(self.source, str)
+        self.on_frame = on_frame
+        self.on_end = on_end
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.width = width
+        self.height = height
+        self.repeat = repeat
+        self.realtime = realtime
+        self.frames_read = 0
+        self.frames_delivered = 0
+        self.fps = 0.0
+        self._cap = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def open(self) -> dict:
+        """Open the source (blocking, cameras can take a while); raises ValueError on failure."""
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            raise ValueError(f"cannot open capture source: {self.source!r}")
+        if not self.is_file:
+            if self.width:
+                cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            if self.height:
+                cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self._cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        return {"source": self.source, "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), "fps": round(self.fps, 2)}
+
+    def start(self):
+        if self._cap is None:
+            self.open()
+        self._thread = threading.Thread(target=self._run, name="pose-capture", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread, which releases the source after its current read."""
+        self._stop.set()
+        if self._thread is None:
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+        elif self._thread is not threading.current_thread():
+            self._thread.join(timeout=5.0)
+
+    def describe(self) -> dict:
+        return {"source": self.source, "frames_read": self.frames_read, "frames_delivered": self.frames_delivered}
+
+    def _run(self):
+        cap = self._cap
+        frame_interval = 1.0 / self.fps if self.is_file and self.realtime and self.fps > 0 else 0.0
+        started = time.monotonic()
+        file_origin = started
+        last_delivered = None
+        try:
+            while not self._stop.is_set():
+                ok, frame_bgr = cap.read()
+                if not ok:
+                    if self.is_file and self.repeat and self.frames_read:
+                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                        file_origin = time.monotonic()
+                        continue
+                    break
+                self.frames_read += 1
+                now = time.monotonic()
+                if frame_interval:
+                    delay = file_origin + cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0 - now
+                    if delay > 0 and self._stop.wait(delay):
+                        break
+                    now = time.monotonic()
+                if last_delivered is not None and now - last_delivered < self.min_interval:
+                    continue
+                last_delivered = now
+                timestamp = int((now - started) * 1000.0)
+                self.frames_delivered += 1
+                self.on_frame(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB), timestamp)
+        finally:
+            cap.release()
+            self._cap = None
+            if self.on_end is not None and not self._stop.is_set():
+                self.on_end()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Frame decoding shared by the pose servers
+
+FrameDecoder turns encoded JPEG/PNG bytes straight into the RGB array the pose graphs
+want, instead of decoding to BGR and converting into a second array:
+- decodes with IMREAD_COLOR_RGB where OpenCV has it (4.10+), otherwise converts the BGR
+  image in place
+- for JPEGs larger than needed, decodes at 1/2, 1/4 or 1/8 scale in the DCT domain
+  (IMREAD_REDUCED_*), which is both faster and smaller; the factor is picked per frame
+  from the size in the JPEG header, so nothing is decoded twice
+- other formats that need shrinking are resized into a buffer reused across frames
+
+Landmarks are normalized to the image, so a reduced decode does not change their meaning.
+"""
+
+import struct
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2
+
+# Longest side the pose graphs need; larger frames are decoded at reduced scale
+DEFAULT_DECODE_SIDE = 640
+
+_IMREAD_RGB = getattr(cv2, "IMREAD_COLOR_RGB", None)
+# IMREAD_REDUCED_COLOR_N without the BGR bit, so it can be combined with IMREAD_COLOR_RGB
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2 & ~cv2.IMREAD_COLOR,
+    4: cv2.IMREAD_REDUCED_COLOR_4 & ~cv2.IMREAD_COLOR,
+    8: cv2.IMREAD_REDUCED_COLOR_8 & ~cv2.IMREAD_COLOR,
+}
+# Start-of-frame markers that carry the image size (everything in C0-CF except DHT, JPG, DAC)
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_BE16 = struct.Struct(">H")
+
+
+def jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """Read (width, height) from a JPEG header without decoding; None if not a JPEG."""
+    n = len(data)
+    if n < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    i = 2
+    while i + 4 <= n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in _JPEG_SOF:
+            if i + 9 > n:
+                return None
+            height = _BE16.unpack_from(data, i + 5)[0]
+            width = _BE16.unpack_from(data, i + 7)[0]
+            return width, height
+        if marker == 0xD8 or 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            i += 2  # no length field
+            continue
+        i += 2 + _BE16.unpack_from(data, i + 2)[0]
+    return None
+
+
+def reduction_factor(width: int, height: int, target_side: int) -> int:
+    """Largest of 8, 4, 2 that keeps the longest side at or above target_side (1 = full size)."""
+    if not target_side:
+        return 1
+    longest = max(width, height)
+    for factor in (8, 4, 2):
+        if longest // factor >= target_side:
+            return factor
+    return 1
+
+
+class FrameDecoder:
+    """Per-session decoder from encoded bytes to an RGB frame no larger than needed."""
+
+    def __init__(self, target_side: Optional[int] = DEFAULT_DECODE_SIDE):
+        self.target_side = target_side or 0
+        self.factor = 1
+        self._resized: Optional[np.ndarray] = None
+
+    def decode(self, data) -> Optional[np.ndarray]:
+        """Decode any bytes-like object (bytes, memoryview) to RGB; None if it is not an image.
+
+        The returned array may be a buffer that the next decode() overwrites.
+        """
+        buf = np.frombuffer(data, dtype=np.uint8)
+        size = jpeg_size(buf)
+        self.factor = reduction_factor(*size, self.target_side) if size is not None else 1
+        if self.factor > 1:
+            if _IMREAD_RGB is not None:
+                return cv2.imdecode(buf, _REDUCED_FLAGS[self.factor] | _IMREAD_RGB)
+            frame = cv2.imdecode(buf, _REDUCED_FLAGS[self.factor] | cv2.IMREAD_COLOR)
+            return None if frame is None else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+
+        if _IMREAD_RGB is not None:
+            frame = cv2.imdecode(buf, _IMREAD_RGB)
+        else:
+            frame = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+            if frame is not None:
+                cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        if frame is None or size is not None:
+            return frame
+        return self._shrink(frame)
+
+    def _shrink(self, frame: np.ndarray) -> np.ndarray:
+        """Resize a non-JPEG frame that is larger than needed into the reusable buffer."""
+        h, w = frame.shape[:2]
+        factor = reduction_factor(w, h, self.target_side)
+        if factor == 1:
+            return frame
+        self.factor = factor
+        shape = (h // factor, w // factor, 3)
+        if self._resized is None or self._resized.shape != shape:
+            self._resized = np.empty(shape, dtype=np.uint8)
+        return cv2.resize(frame, (shape[1], shape[0]), dst=self._resized, interpolation=cv2.INTER_AREA)
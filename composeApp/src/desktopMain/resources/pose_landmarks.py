@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Landmark array helpers shared by the pose servers
+
+Landmarks are handled as an (N, 5) float32 array with columns x, y, z, visibility, presence.
+Responses can carry them in one of these formats:
+- "json":    list of {x,y,z,visibility,presence} dicts (the original format)
+- "float32": base64 of the packed little-endian float32 array
+- "int16":   base64 of the array quantized to int16 (value = int / INT16_SCALE_INV)
+- "none":    no landmarks at all (for clients that only want metrics)
+Clients may also ask for a subset of landmarks by name or index.
+"""
+
+import base64
+from typing import Iterable, Optional
+
+import numpy as np
+
+LANDMARK_NAMES = [
+    "nose", "left_eye_inner", "left_eye", "left_eye_outer",
+    "right_eye_inner", "right_eye", "right_eye_outer",
+    "left_ear", "right_ear", "mouth_left", "mouth_right",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow",
+    "left_wrist", "right_wrist", "left_pinky", "right_pinky",
+    "left_index", "right_index", "left_thumb", "right_thumb",
+    "left_hip", "right_hip", "left_knee", "right_knee",
+    "left_ankle", "right_ankle", "left_heel", "right_heel",
+    "left_foot_index", "right_foot_index",
+]
+LANDMARK_INDEX = {name: i for i, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+FIELDS = ("x", "y", "z", "visibility", "presence")
+
+LANDMARK_FORMATS = ("json", "float32", "int16", "none")
+# int16 quantization: 1e-4 resolution, range +-3.2767 (normalized coords and z stay well inside)
+INT16_SCALE_INV = 10000.0
+
+
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """Convert a sequence of MediaPipe landmarks to an (N, 5) float32 array."""
+    return np.array(
+        [(lm.x, lm.y, lm.z, getattr(lm, "visibility", 0.0) or 0.0, getattr(lm, "presence", 0.0) or 0.0)
+         for lm in landmarks],
+        dtype=np.float32,
+    ).reshape(-1, len(FIELDS))
+
+
+def resolve_subset(spec: Optional[Iterable]) -> Optional[np.ndarray]:
+    """Turn a list of landmark names/indices into an index array; None means all landmarks."""
+    if spec is None:
+        return None
+    indices = []
+    for item in spec:
+        if isinstance(item, str):
+            if item not in LANDMARK_INDEX:
+                raise ValueError(f"unknown landmark: {item}")
+            indices.append(LANDMARK_INDEX[item])
+        elif isinstance(item, int) and not isinstance(item, bool) and 0 <= item < NUM_LANDMARKS:
+            indices.append(item)
+        else:
+            raise ValueError(f"invalid landmark: {item!r}")
+    if not indices:
+        raise ValueError("empty landmark subset")
+    return np.asarray(indices, dtype=np.intp)
+
+
+def encode_landmarks(arr: np.ndarray, fmt: str = "json", indices: Optional[np.ndarray] = None) -> dict:
+    """Build the landmark part of a response from an (N, 5) array."""
+    if indices is not None:
+        arr = arr[indices]
+    out = {}
+    if fmt == "none":
+        return out
+    if fmt == "json":
+        out["landmarks"] = [dict(zip(FIELDS, row)) for row in arr.tolist()]
+    elif fmt == "float32":
+        out["landmarks_packed"] = base64.b64encode(arr.astype("<f4", copy=False).tobytes()).decode("ascii")
+    elif fmt == "int16":
+        quantized = np.clip(np.rint(arr * INT16_SCALE_INV), -32768, 32767).astype("<i2")
+        out["landmarks_packed"] = base64.b64encode(quantized.tobytes()).decode("ascii")
+        out["landmark_scale"] = 1.0 / INT16_SCALE_INV
+    else:
+        raise ValueError(f"unknown landmark format: {fmt}")
+    if fmt != "json":
+        out["landmark_format"] = fmt
+        out["landmark_shape"] = [int(arr.shape[0]), len(FIELDS)]
+    if indices is not None:
+        out["landmark_indices"] = indices.tolist()
+    return out
+
+
+def decode_landmarks(response: dict) -> np.ndarray:
+    """Inverse of encode_landmarks (used by tools that read server responses)."""
+    fmt = response.get("landmark_format", "json")
+    if "landmarks_packed" not in response:
+        return np.array([[lm.get(f, 0.0) for f in FIELDS] for lm in response.get("landmarks", [])],
+                        dtype=np.float32).reshape(-1, len(FIELDS))
+    raw = base64.b64decode(response["landmarks_packed"])
+    if fmt == "float32":
+        arr = np.frombuffer(raw, dtype="<f4")
+    elif fmt == "int16":
+        arr = np.frombuffer(raw, dtype="<i2").astype(np.float32) * np.float32(response.get("landmark_scale", 1.0 / INT16_SCALE_INV))
+    else:
+        raise ValueError(f"unknown landmark format: {fmt}")
+    return arr.reshape(-1, len(FIELDS))
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Load generator for ws_pose_server
+
+Opens N simulated clients that each send "init" and then a stream of detect frames at a
+fixed rate, and measures what the server sustains:
+
+    python pose_load.py --clients 1,2,4,8 --fps 15 --duration 20 -o load.json
+    python pose_load.py --url ws://127.0.0.1:8765 --server-pid 1234 --clients 4
+    python pose_load.py --clients 1,2,4 -o load_new.json --compare load.json   # exit 1 on a regression
+
+Every client count in --clients is one step, run for --duration seconds after --warmup.
+Without --url a server is started from this directory for the run (POSE_WS_* variables
+are passed through, e.g. POSE_WS_WORKERS).
+
+Frames are synthetic (a seeded figure at --width x --height, a few variants cycled so the
+motion gate does not short-circuit them), images given with --images, or the frames of a
+recording (--recording, see pose_record.py). They are sent as binary frames, or as
+base64 JSON with --json, on an open loop: a client does not wait for replies, so a slow
+server shows up as growing latency and as frames dropped by its latest-frame slot.
+With --honor-hints clients enable the server's rate_hint loop and slow down to the
+hinted frame interval (frames are pre-encoded, so resolution and quality hints are not
+applied).
+
+Per step the report has:
+- latency_ms: round trip from send to reply (mean, p50, p95, p99, max)
+- fps: replies per second over all clients, and per client; sent_fps is the rate actually
+  offered, below clients x --fps when the generator itself cannot keep up
+- drop_rate: frames without a reply; error_rate: error replies and failed detections
+  other than "no pose"
+- server: CPU % and RSS of the server process (needs psutil and a known pid)
+- slo_ok: p95 latency within --slo-p95-ms and drop rate within --slo-drop-rate
+"max_clients_within_slo" is the largest client count of a step that met the SLO.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from pose_bench import environment, git_commit, synthetic_frame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MAX_MESSAGE_SIZE = 8 * 1024 * 1024
+# Replies still in flight when a step ends are waited for this long
+DRAIN_S = 2.0
+DEFAULT_SLO_P95_MS = 150.0
+DEFAULT_SLO_DROP_RATE = 0.05
+# A step counts as regressed when its p95 latency is this much worse than the baseline
+DEFAULT_REGRESSION_RATIO = 1.25
+SYNTHETIC_VARIANTS = 8
+
+
+def synthetic_frames(width: int, height: int, quality: int) -> List[bytes]:
+    frames = []
+    for seed in range(SYNTHETIC_VARIANTS):
+        frame = synthetic_frame(seed=1234 + seed)
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+
+def image_frames(paths: List[str], width: int, height: int, quality: int) -> List[bytes]:
+    frames = []
+    for path in paths:
+        frame = cv2.imread(path, cv2.IMREAD_COLOR)
+        if frame is None:
+            raise SystemExit(f"cannot read image {path}")
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes())
+    return frames
+
+
+def recorded_frames(path: str) -> List[bytes]:
+    from pose_record import load_sessions
+    frames = [frame.image for session in load_sessions(path) for frame in session.frames]
+    if not frames:
+        raise SystemExit(f"no frames in {path}")
+    return frames
+
+
+def latency_summary(samples: List[float]) -> dict:
+    if not samples:
+        return {}
+    values = np.asarray(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {"mean": round(float(values.mean()), 3), "p50": round(float(p50), 3), "p95": round(float(p95), 3),
+            "p99": round(float(p99), 3), "max": round(float(values.max()), 3)}
+
+
+class LoadClient:
+    """One simulated stream: init, then frames at a fixed rate without waiting for replies."""
+
+    def __init__(self, index: int, url: str, frames: List[bytes], fps: float, binary: bool, init: dict,
+                 honor_hints: bool = False):
+        self.index = index
+        self.url = url
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.binary = binary
+        self.init = init
+        self.honor_hints = honor_hints
+        self.min_interval = self.interval
+        self.sent = 0
+        self.replies = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+        self.connect_error: Optional[str] = None
+        self.measuring = False
+        self._sent_at = {}  # seq -> perf_counter() when sent
+
+    async def run(self, stop: asyncio.Event):
+        import websockets
+        import ws_pose_server as wps
+        try:
+            ws = await websockets.connect(self.url, max_size=MAX_MESSAGE_SIZE)
+        except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as e:
+            self.connect_error = str(e)
+            return
+        try:
+            init = dict(self.init, type="init", binary=self.binary)
+            if self.honor_hints:
+                init.update(rate_hints=True, max_fps=1.0 / self.min_interval)
+            await ws.send(json.dumps(init))
+            reply = json.loads(await ws.recv())
+            if not reply.get("success"):
+                self.connect_error = f"init failed: {reply.get('message', reply)}"
+                return
+            reader = asyncio.create_task(self._read(ws))
+            loop = asyncio.get_running_loop()
+            # Stagger the clients over one interval so their frames do not arrive in bursts
+            next_at = loop.time() + self.interval * (self.index % 10) / 10.0
+            seq = 0
+            while not stop.is_set():
+                delay = next_at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # A client that fell behind does not burst to catch up; sent_fps shows the shortfall
+                next_at = max(next_at + self.interval, loop.time())
+                seq += 1
+                image = self.frames[seq % len(self.frames)]
+                if self.measuring:
+                    self.sent += 1
+                    self._sent_at[seq] = time.perf_counter()
+                if self.binary:
+                    codec = wps.CODEC_PNG if image[:4] == b"\x89PNG" else wps.CODEC_JPEG
+                    await ws.send(wps.FRAME_HEADER.pack(wps.MSG_DETECT, codec, seq, seq) + image)
+                else:
+                    # The timestamp doubles as the sequence number for matching replies
+                    await ws.send(json.dumps({"type": "detect", "image": base64.b64encode(image).decode("ascii"),
+                                              "ts": seq}))
+            await asyncio.sleep(DRAIN_S)
+            reader.cancel()
+        except websockets.ConnectionClosed as e:
+            self.connect_error = f"connection closed: {e}"
+        finally:
+            await ws.close()
+
+    async def _read(self, ws):
+        import websockets
+        try:
+            async for message in ws:
+                self._handle(json.loads(message))
+        except websockets.ConnectionClosed as e:
+            self.connect_error = f"connection closed: {e}"
+
+    def _handle(self, reply: dict):
+        kind = reply.get("type")
+        if kind == "rate_hint":
+            if self.honor_hints:
+                self.interval = max(self.min_interval, reply["interval_ms"] / 1000.0)
+            return
+        if kind == "error":
+            if self.measuring:
+                self.errors += 1
+            return
+        if kind != "detection":
+            return
+        seq = reply.get("seq", reply.get("timestamp"))
+        sent_at = self._sent_at.pop(seq, None)
+        if sent_at is None:
+            return  # sent during warm-up
+        self.replies += 1
+        self.latencies.append((time.perf_counter() - sent_at) * 1000.0)
+        if not reply.get("success") and reply.get("message") != "no_pose":
+            self.errors += 1
+
+
+class ResourceSampler:
+    """Samples CPU % and RSS of the server process (psutil) while a step runs."""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.interval = interval
+        self.cpu: List[float] = []
+        self.rss: List[int] = []
+        self.unavailable: Optional[str] = None
+        self._process = None
+        if pid is None:
+            self.unavailable = "server pid unknown (use --server-pid)"
+            return
+        try:
+            import psutil
+        except ImportError:
+            self.unavailable = "psutil not installed (pip install psutil)"
+            return
+        try:
+            self._process = psutil.Process(pid)
+        except psutil.Error as e:
+            self.unavailable = str(e)
+
+    async def run(self, stop: asyncio.Event):
+        if self._process is None:
+            return
+        # Worker processes (POSE_WS_WORKERS) count towards the server
+        procs = [self._process] + self._process.children(recursive=True)
+        for proc in procs:
+            proc.cpu_percent(None)
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.cpu.append(sum(proc.cpu_percent(None) for proc in procs))
+                self.rss.append(sum(proc.memory_info().rss for proc in procs))
+            except Exception as e:
+                self.unavailable = str(e)
+                return
+
+    def summary(self) -> dict:
+        if self.unavailable or not self.cpu:
+            return {"unavailable": self.unavailable or "no samples"}
+        return {"cpu_percent_mean": round(float(np.mean(self.cpu)), 1),
+                "cpu_percent_max": round(float(np.max(self.cpu)), 1),
+                "rss_mb_max": round(max(self.rss) / (1024 * 1024), 1)}
+
+
+async def run_step(url: str, clients: int, frames: List[bytes], args, init: dict, server_pid: Optional[int]) -> dict:
+    stop = asyncio.Event()
+    load = [LoadClient(i, url, frames, args.fps, not args.json, init, args.honor_hints) for i in range(clients)]
+    tasks = [asyncio.create_task(client.run(stop)) for client in load]
+    await asyncio.sleep(args.warmup)
+    for client in load:
+        client.measuring = True
+    sampler = ResourceSampler(server_pid)
+    sampling = asyncio.create_task(sampler.run(stop))
+    started = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    await asyncio.gather(*tasks, sampling)
+
+    sent = sum(c.sent for c in load)
+    replies = sum(c.replies for c in load)
+    errors = sum(c.errors for c in load)
+    latency = latency_summary([ms for c in load for ms in c.latencies])
+    drop_rate = round((sent - replies) / sent, 4) if sent else 0.0
+    failed = [c.connect_error for c in load if c.connect_error]
+    step = {
+        "clients": clients,
+        "target_fps_per_client": args.fps,
+        "sent": sent,
+        "replies": replies,
+        "sent_fps": round(sent / elapsed, 2),
+        "fps": round(replies / elapsed, 2),
+        "fps_per_client": round(replies / elapsed / clients, 2),
+        "drop_rate": drop_rate,
+        "error_rate": round(errors / sent, 4) if sent else 0.0,
+        "latency_ms": latency,
+        "server": sampler.summary(),
+        "failed_clients": len(failed),
+    }
+    if failed:
+        step["client_errors"] = sorted(set(failed))[:5]
+    step["slo_ok"] = (not failed and bool(latency) and latency["p95"] <= args.slo_p95_ms
+                      and drop_rate <= args.slo_drop_rate)
+    return step
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server() -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = dict(os.environ, POSE_WS_PORT=str(port))
+    proc = subprocess.Popen([sys.executable, os.path.join(HERE, "ws_pose_server.py")], env=env)
+    deadline = time.monotonic() + 60.0
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"ws_pose_server exited with {proc.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"ws://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit("ws_pose_server did not start listening within 60 s")
+
+
+def compare(current: dict, baseline: dict, ratio: float) -> list:
+    """Return [(clients, baseline_p95, current_p95)] for every step whose p95 latency regressed."""
+    regressions = []
+    before = {step["clients"]: step for step in baseline.get("steps", [])}
+    for step in current.get("steps", []):
+        base = before.get(step["clients"])
+        if not base or "p95" not in step["latency_ms"] or "p95" not in base["latency_ms"]:
+            continue
+        old, new = base["latency_ms"]["p95"], step["latency_ms"]["p95"]
+        change = new / old if old > 0 else 1.0
+        print(f"  {step['clients']:3d} clients  p95 {old:9.3f} -> {new:9.3f} ms ({change:5.2f}x)", file=sys.stderr)
+        if change > ratio or (base.get("slo_ok") and not step.get("slo_ok")):
+            regressions.append((step["clients"], old, new))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test ws_pose_server with simulated clients")
+    parser.add_argument("--url", help="server to test (default: start ws_pose_server.py for the run)")
+    parser.add_argument("--server-pid", type=int, help="pid of the server at --url, for CPU/RSS sampling")
+    parser.add_argument("--clients", default="1,2,4", help="comma-separated client counts, one step each")
+    parser.add_argument("--fps", type=float, default=15.0, help="frames per second sent by each client")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per step")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each step")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality of generated frames")
+    parser.add_argument("--images", nargs="+", help="send these images (resized to --width x --height)")
+    parser.add_argument("--recording", help="send the frames of this recording as is")
+    parser.add_argument("--json", action="store_true", help="send base64 JSON detects instead of binary frames")
+    parser.add_argument("--honor-hints", action="store_true",
+                        help="ask for rate_hint messages and follow their frame interval")
+    parser.add_argument("--init", default="{}", help="extra init options as JSON, e.g. '{\"roi\": true}'")
+    parser.add_argument("--slo-p95-ms", type=float, default=DEFAULT_SLO_P95_MS)
+    parser.add_argument("--slo-drop-rate", type=float, default=DEFAULT_SLO_DROP_RATE)
+    parser.add_argument("-o", "--output", default="pose_load.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="baseline report from an earlier run")
+    parser.add_argument("--regression-ratio", type=float, default=DEFAULT_REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+    steps = [int(n) for n in args.clients.split(",") if n.strip()]
+    if not steps or min(steps) <= 0 or args.fps <= 0:
+        parser.error("--clients and --fps must be positive")
+    init = json.loads(args.init)
+
+    if args.recording:
+        frames, source = recorded_frames(args.recording), os.path.abspath(args.recording)
+    elif args.images:
+        frames, source = image_frames(args.images, args.width, args.height, args.quality), "images"
+    else:
+        frames, source = synthetic_frames(args.width, args.height, args.quality), "synthetic"
+
+    server, server_pid, url = None, args.server_pid, args.url
+    if url is None:
+        server, url = start_server()
+        server_pid = server.pid
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": git_commit(),
+        "environment": environment(),
+        "config": {"url": args.url or "local", "fps": args.fps, "duration_s": args.duration,
+                   "warmup_s": args.warmup, "binary": not args.json, "honor_hints": args.honor_hints, "init": init, "source": source,
+                   "width": args.width, "height": args.height, "frame_bytes_mean": int(np.mean([len(f) for f in frames])),
+                   "slo_p95_ms": args.slo_p95_ms, "slo_drop_rate": args.slo_drop_rate},
+        "steps": [],
+    }
+    try:
+        for clients in steps:
+            step = asyncio.run(run_step(url, clients, frames, args, init, server_pid))
+            report["steps"].append(step)
+            latency = step["latency_ms"]
+            print(f"  {clients:3d} clients  {step['fps']:7.1f} fps  p50 {latency.get('p50', float('nan')):8.1f} "
+                  f"p95 {latency.get('p95', float('nan')):8.1f} ms  drop {step['drop_rate']:.1%}  "
+                  f"err {step['error_rate']:.1%}  {'ok' if step['slo_ok'] else 'SLO MISSED'}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+    passing = [step["clients"] for step in report["steps"] if step["slo_ok"]]
+    report["max_clients_within_slo"] = max(passing) if passing else 0
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Max clients within SLO: {report['max_clients_within_slo']}; report written to {args.output}",
+          file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.regression_ratio)
+        for clients, before, after in regressions:
+            print(f"REGRESSION {clients} clients: p95 {before:.3f} -> {after:.3f} ms", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Vectorized posture metrics shared by the pose servers
+
+Mirrors the Kotlin client math so thin clients can subscribe to metrics instead of raw landmarks:
+- ratio / ratio_score: calculatePostureRatio / calculateRatioScore (DesktopLiveTrackingScreen.kt)
+- torso_tilt, shoulder_tilt, neck_flex, head_z_delta, shoulder_asym_y: PoseMetrics as computed by
+  calculateRealMetrics, and metric_score / metric_status as in DesktopMediaPipeWsService.updatePostureStatus
+
+Every function works on a batch of frames shaped (F, 33, C) with x, y in the first two columns.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+NOSE, LEFT_EYE, RIGHT_EYE = 0, 2, 5
+LEFT_SHOULDER, RIGHT_SHOULDER = 11, 12
+LEFT_HIP, RIGHT_HIP = 23, 24
+
+# Ratio above which an uncalibrated user counts as sitting upright (same as the client)
+UNCALIBRATED_GOOD_RATIO = 0.98
+
+METRIC_STATUSES = np.array(["VERY POOR", "POOR", "FAIR", "GOOD", "EXCELLENT"])
+RATIO_STATUSES = np.array(["Poor Posture", "Fair Posture", "Good Posture"])
+
+
+def as_frames(landmarks) -> np.ndarray:
+    """Coerce landmarks to a float array shaped (F, 33, C); a single frame becomes F == 1."""
+    if isinstance(landmarks, np.ndarray):
+        arr = landmarks
+    else:
+        frames = list(landmarks)
+        # Allow a single frame given as a list of landmarks
+        if frames and (isinstance(frames[0], dict) or np.ndim(frames[0]) == 1):
+            frames = [frames]
+        arr = np.array(
+            [[[lm.get("x", 0.0), lm.get("y", 0.0)] if isinstance(lm, dict) else lm[:2] for lm in frame]
+             for frame in frames],
+            dtype=np.float64,
+        )
+    arr = np.asarray(arr, dtype=np.float64)
+    if arr.ndim == 2:
+        arr = arr[np.newaxis]
+    if arr.ndim != 3 or arr.shape[1] < 33 or arr.shape[2] < 2:
+        raise ValueError(f"expected frames of 33 landmarks with x, y; got shape {arr.shape}")
+    return arr
+
+
+def _angle_from_vertical(x1, y1, x2, y2):
+    return np.abs(np.degrees(np.arctan2(x2 - x1, y2 - y1)))
+
+
+def ratio_score(ratio: np.ndarray, calibrated_ratio: Optional[float]) -> np.ndarray:
+    """Score 0-100 from the face-to-shoulder ratio, calibrated or not."""
+    ratio = np.asarray(ratio, dtype=np.float64)
+    if calibrated_ratio is None or not calibrated_ratio > 0:
+        return np.where(ratio >= UNCALIBRATED_GOOD_RATIO, 85, 30).astype(np.int32)
+    drop = calibrated_ratio - ratio
+    score = np.clip(np.trunc(100.0 - drop * 200.0), 0, 100)
+    score = np.where(drop <= 0, 100, score)
+    score = np.where(np.isnan(ratio) | (ratio <= 0), 50, score)
+    return score.astype(np.int32)
+
+
+def compute_metrics_batch(frames, calibrated_ratio: Optional[float] = None) -> dict:
+    """Compute every posture metric for a batch of frames; values are arrays of length F."""
+    arr = as_frames(frames)
+    x = arr[:, :, 0]
+    y = arr[:, :, 1]
+
+    shoulder_cx = (x[:, LEFT_SHOULDER] + x[:, RIGHT_SHOULDER]) / 2.0
+    shoulder_cy = (y[:, LEFT_SHOULDER] + y[:, RIGHT_SHOULDER]) / 2.0
+    hip_cx = (x[:, LEFT_HIP] + x[:, RIGHT_HIP]) / 2.0
+    hip_cy = (y[:, LEFT_HIP] + y[:, RIGHT_HIP]) / 2.0
+    face_cy = (y[:, LEFT_EYE] + y[:, RIGHT_EYE] + y[:, NOSE]) / 3.0
+
+    shoulder_width = np.hypot(x[:, LEFT_SHOULDER] - x[:, RIGHT_SHOULDER], y[:, LEFT_SHOULDER] - y[:, RIGHT_SHOULDER])
+    face_to_shoulder = np.abs(face_cy - shoulder_cy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(shoulder_width > 0, face_to_shoulder / shoulder_width, np.nan)
+
+    shoulder_dy = y[:, LEFT_SHOULDER] - y[:, RIGHT_SHOULDER]
+    torso_tilt = _angle_from_vertical(shoulder_cx, shoulder_cy, hip_cx, hip_cy)
+    shoulder_tilt = np.abs(shoulder_dy) * 100.0
+    neck_flex = _angle_from_vertical(x[:, NOSE], y[:, NOSE], shoulder_cx, shoulder_cy)
+    head_z_delta = y[:, NOSE] - shoulder_cy
+    shoulder_asym_y = np.abs(shoulder_dy)
+
+    metric_score = (100
+                    - 20 * (torso_tilt > 15.0)
+                    - 15 * (shoulder_tilt > 0.1)
+                    - 25 * (neck_flex > 20.0)
+                    - 10 * (shoulder_asym_y > 0.05)).astype(np.int32)
+    metric_status = METRIC_STATUSES[np.searchsorted([20, 40, 60, 80], metric_score, side="right")]
+
+    r_score = ratio_score(ratio, calibrated_ratio)
+    if calibrated_ratio is not None and calibrated_ratio > 0:
+        r_status = RATIO_STATUSES[np.searchsorted([60, 80], r_score, side="right")]
+    else:
+        r_status = np.where(ratio >= UNCALIBRATED_GOOD_RATIO, "Good Posture", "Bad Posture - Slouching!")
+
+    return {
+        "ratio": ratio,
+        "face_to_shoulder_distance": face_to_shoulder,
+        "shoulder_width": shoulder_width,
+        "ratio_score": r_score,
+        "ratio_status": r_status,
+        "torso_tilt": torso_tilt,
+        "shoulder_tilt": shoulder_tilt,
+        "neck_flex": neck_flex,
+        "head_z_delta": head_z_delta,
+        "shoulder_asym_y": shoulder_asym_y,
+        "metric_score": metric_score,
+        "metric_status": metric_status,
+    }
+
+
+def _to_json_value(value):
+    value = value.item() if hasattr(value, "item") else value
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def compute_metrics(landmarks, calibrated_ratio: Optional[float] = None) -> dict:
+    """Metrics for a single frame as a JSON-ready dict."""
+    batch = compute_metrics_batch(landmarks, calibrated_ratio)
+    return {name: _to_json_value(values[0]) for name, values in batch.items()}
+
+
+def metrics_batch_to_json(batch: dict) -> dict:
+    """Turn compute_metrics_batch output into JSON-ready lists."""
+    return {name: [_to_json_value(v) for v in values] for name, values in batch.items()}
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Session recording shared by the pose servers
+
+A recording is an append-only binary log of what a client sent and what the server
+answered, so a field session can be replayed offline (see pose_replay.py):
+
+    file   := MAGIC record*
+    record := kind:uint8 seq:uint32 t:float64 length:uint32 payload   (little-endian)
+
+- t is seconds since the recorder was opened (perf_counter), the arrival time of the message
+- INIT:   payload is the client's init message as UTF-8 JSON; starts a new session, so
+          several sessions can be appended to one file
+- FRAME:  payload is FRAME_META (client timestamp in ms, flags) followed by the encoded
+          image bytes (JPEG/PNG, already base64-decoded); seq numbers the frame
+- RESULT: payload is the server's reply as UTF-8 JSON; seq is the frame it answers
+
+Frames are written as they arrive, including ones the server later drops, so replay
+sees the original arrival pattern. Writes happen on a background thread.
+"""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Iterator, List, NamedTuple, Optional, Union
+
+MAGIC = b"POSEREC1"
+RECORD = struct.Struct("<BIdI")
+FRAME_META = struct.Struct("<qB")
+
+KIND_INIT = 1
+KIND_FRAME = 2
+KIND_RESULT = 3
+
+# FRAME_META flags
+FLAG_BASE64 = 1  # arrived base64-encoded in a JSON detect message (vs. a binary frame)
+
+
+class Record(NamedTuple):
+    kind: int
+    seq: int
+    t: float
+    payload: bytes
+
+
+class RecordedFrame(NamedTuple):
+    seq: int
+    t: float
+    timestamp: int
+    base64: bool
+    image: bytes
+
+
+class RecordedSession:
+    """One init message plus the frames and results that followed it."""
+
+    def __init__(self, init: dict):
+        self.init = init
+        self.frames: List[RecordedFrame] = []
+        self.results = {}  # frame seq -> reply dict
+
+
+class SessionRecorder:
+    """Appends one session's messages to a recording file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = 0
+        self._started = time.perf_counter()
+        self._seq = 0
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if new:
+            self._file.write(MAGIC)
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="pose-recorder", daemon=True)
+        self._writer.start()
+
+    def init(self, message: dict):
+        self._put(KIND_INIT, 0, json.dumps(message).encode("utf-8"))
+
+    def frame(self, image, timestamp: int, base64: bool = False) -> int:
+        """Record an incoming encoded frame (any bytes-like object); returns its seq."""
+        self._seq += 1
+        self.frames += 1
+        flags = FLAG_BASE64 if base64 else 0
+        self._put(KIND_FRAME, self._seq, FRAME_META.pack(int(timestamp), flags) + bytes(image))
+        return self._seq
+
+    def result(self, seq: int, reply: Union[str, dict]):
+        """Record the reply to frame seq (the JSON text as sent, or the reply dict)."""
+        text = reply if isinstance(reply, str) else json.dumps(reply)
+        self._put(KIND_RESULT, seq, text.encode("utf-8"))
+
+    def close(self):
+        """Flush everything recorded so far and close the file."""
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def describe(self) -> dict:
+        return {"path": self.path, "frames": self.frames}
+
+    def _put(self, kind: int, seq: int, payload: bytes):
+        self._queue.put(RECORD.pack(kind, seq, time.perf_counter() - self._started, len(payload)) + payload)
+
+    def _write_loop(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                self._file.flush()
+                return
+            self._file.write(chunk)
+
+
+def read_records(path: str) -> Iterator[Record]:
+    """Iterate over a recording; a record cut short by a crash ends the iteration."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"not a pose recording: {path}")
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            kind, seq, t, length = RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield Record(kind, seq, t, payload)
+
+
+def load_sessions(path: str) -> List[RecordedSession]:
+    """Group a recording into sessions; frames before the first init get an empty one."""
+    sessions: List[RecordedSession] = []
+    current: Optional[RecordedSession] = None
+    for record in read_records(path):
+        if record.kind == KIND_INIT:
+            current = RecordedSession(json.loads(record.payload))
+            sessions.append(current)
+            continue
+        if current is None:
+            current = RecordedSession({})
+            sessions.append(current)
+        if record.kind == KIND_FRAME:
+            timestamp, flags = FRAME_META.unpack_from(record.payload)
+            current.frames.append(RecordedFrame(record.seq, record.t, timestamp, bool(flags & FLAG_BASE64),
+                                                record.payload[FRAME_META.size:]))
+        elif record.kind == KIND_RESULT:
+            current.results[record.seq] = json.loads(record.payload)
+    return sessions
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Replay recorded pose sessions
+
+Plays a recording made with the servers' record mode (see pose_record.py) back through
+one of the pose servers and reports throughput, latency and how far the landmarks drift
+from the recorded ones:
+
+    python pose_replay.py session.poserec --target detector
+    python pose_replay.py session.poserec --target ws --realtime -o replay.json
+
+Targets:
+- detector: mediapipe_pose_detector.process_command in this process, over the Unix socket
+  framing; the recorded init is sent as is, with --model replacing its model_path
+- ws: ws_pose_server.handler started in this process on a local port, or the server at
+  --url; frames go out as they came in (binary or base64 JSON)
+
+By default each frame is sent once the previous reply is back (as fast as possible,
+nothing is dropped). --realtime sends frames at their recorded arrival times (scaled by
+--speed) without waiting, so the server queues and drops them the way it did live;
+frames the server dropped have no reply and are counted in "dropped".
+
+Landmark drift compares the x/y of every frame answered both in the recording and in
+the replay (same landmark format and subset); "success_mismatch" counts frames where
+only one of the two found a pose.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from pose_landmarks import decode_landmarks
+from pose_record import RecordedSession, load_sessions
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL = os.path.join(HERE, "pose_landmarker_full.task")
+# How long to wait for the reply to the last frame before giving up
+REPLY_TIMEOUT_S = 30.0
+
+
+class ReplayRun:
+    """Send/reply bookkeeping for one replayed session."""
+
+    def __init__(self, session: RecordedSession):
+        self.session = session
+        self.sent_at = {}  # frame seq -> perf_counter() when sent
+        self.replies = {}  # frame seq -> reply dict
+        self.latency_ms = {}
+        self.started = None
+        self.finished = None
+
+    def sent(self, seq: int):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        self.sent_at[seq] = now
+
+    def replied(self, seq: int, reply: dict):
+        now = time.perf_counter()
+        self.replies[seq] = reply
+        self.latency_ms[seq] = (now - self.sent_at[seq]) * 1000.0
+        self.finished = now
+
+    def report(self) -> dict:
+        wall = (self.finished - self.started) if self.replies else 0.0
+        latencies = np.fromiter(self.latency_ms.values(), dtype=np.float64, count=len(self.latency_ms))
+        report = {
+            "frames": len(self.session.frames),
+            "sent": len(self.sent_at),
+            "replies": len(self.replies),
+            "dropped": len(self.sent_at) - len(self.replies),
+            "success": sum(1 for r in self.replies.values() if r.get("success")),
+            "wall_s": round(wall, 3),
+            "throughput_fps": round(len(self.replies) / wall, 2) if wall > 0 else 0.0,
+        }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+            report["latency_ms"] = {
+                "mean": round(float(latencies.mean()), 3),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(latencies.max()), 3),
+            }
+        report["drift"] = landmark_drift(self.session.results, self.replies)
+        return report
+
+
+def landmark_drift(recorded: dict, replayed: dict) -> dict:
+    """x/y differences between recorded and replayed landmarks, over frames answered in both."""
+    diffs = []
+    mismatch = 0
+    for seq, reply in replayed.items():
+        before = recorded.get(seq)
+        if before is None:
+            continue
+        if bool(before.get("success")) != bool(reply.get("success")):
+            mismatch += 1
+            continue
+        if not reply.get("success"):
+            continue
+        try:
+            a, b = decode_landmarks(before), decode_landmarks(reply)
+        except ValueError:
+            continue
+        if a.shape != b.shape or not len(a):
+            continue
+        diffs.append(np.abs(a[:, :2] - b[:, :2]).max(axis=1))
+    drift = {"compared": len(diffs), "success_mismatch": mismatch}
+    if diffs:
+        per_landmark = np.concatenate(diffs)
+        drift["mean_abs_xy"] = round(float(per_landmark.mean()), 6)
+        drift["p95_abs_xy"] = round(float(np.percentile(per_landmark, 95)), 6)
+        drift["max_abs_xy"] = round(float(per_landmark.max()), 6)
+    return drift
+
+
+def pace(session: RecordedSession, realtime: bool, speed: float):
+    """Yield each frame, sleeping until its recorded arrival time when realtime."""
+    if not session.frames:
+        return
+    origin_t = session.frames[0].t
+    origin = time.perf_counter()
+    for frame in session.frames:
+        if realtime:
+            delay = (frame.t - origin_t) / speed - (time.perf_counter() - origin)
+            if delay > 0:
+                time.sleep(delay)
+        yield frame
+
+
+# --- detector target ------------------------------------------------------
+
+
+def replay_detector(sessions: List[RecordedSession], model: Optional[str], realtime: bool, speed: float) -> List[dict]:
+    import mediapipe_pose_detector as dm
+    dm.load_runtime()
+    if not dm.MEDIAPIPE_AVAILABLE:
+        raise SystemExit("mediapipe not available")
+    client, server = socket.socketpair()
+    threading.Thread(target=dm.serve_socket_client, args=(server,), daemon=True).start()
+
+    def send(message: dict):
+        payload = json.dumps(message).encode("utf-8")
+        client.sendall(dm.FRAME_LENGTH.pack(len(payload)) + payload)
+
+    def receive() -> Optional[dict]:
+        header = dm.recv_exact(client, dm.FRAME_LENGTH.size)
+        if header is None:
+            return None
+        return json.loads(dm.recv_exact(client, dm.FRAME_LENGTH.unpack(header)[0]))
+
+    reports = []
+    try:
+        for session in sessions:
+            init = dict(session.init, type="init", request_id="replay_init")
+            init["model_path"] = model or init.get("model_path") or DEFAULT_MODEL
+            send(init)
+            reply = receive()
+            if not reply or not reply["data"].get("success"):
+                raise SystemExit(f"init failed: {reply}")
+
+            run = ReplayRun(session)
+            replied = threading.Event()
+            done = threading.Event()
+
+            def read_replies():
+                while len(run.replies) < len(session.frames):
+                    reply = receive()
+                    if reply is None:
+                        break
+                    request_id = reply.get("request_id", "")
+                    if request_id.startswith("replay_") and request_id[7:].isdigit():
+                        run.replied(int(request_id[7:]), reply.get("data") or {})
+                        replied.set()
+                done.set()
+                replied.set()
+
+            reader = threading.Thread(target=read_replies, daemon=True)
+            reader.start()
+            for frame in pace(session, realtime, speed):
+                run.sent(frame.seq)
+                send({"type": "detect", "request_id": f"replay_{frame.seq}",
+                      "frame_data": base64.b64encode(frame.image).decode("ascii"), "timestamp": frame.timestamp})
+                while not realtime:
+                    replied.clear()
+                    if frame.seq in run.replies or done.is_set():
+                        break
+                    replied.wait(REPLY_TIMEOUT_S)
+            done.wait(REPLY_TIMEOUT_S)
+            reports.append(run.report())
+    finally:
+        client.close()
+    return reports
+
+
+# --- ws target ------------------------------------------------------------
+
+
+async def _replay_ws_session(ws, session: RecordedSession, realtime: bool, speed: float) -> dict:
+    import ws_pose_server as wps
+    init = dict(session.init, type="init")
+    # Binary frames need the binary protocol, whatever the recorded client negotiated
+    init["binary"] = bool(init.get("binary")) or any(not f.base64 for f in session.frames)
+    await ws.send(json.dumps(init))
+    while True:
+        reply = json.loads(await ws.recv())
+        if reply.get("type") == "init_response":
+            break
+    if not reply.get("success"):
+        raise SystemExit(f"init failed: {reply}")
+
+    run = ReplayRun(session)
+    by_timestamp = {}  # base64 frames are matched on their timestamp (no seq in JSON detects)
+    replied = asyncio.Event()
+    last_seq = session.frames[-1].seq if session.frames else None
+
+    async def read_replies():
+        try:
+            async for message in ws:
+                reply = json.loads(message)
+                if reply.get("type") != "detection":
+                    continue
+                seq = reply.get("seq")
+                if seq is None:
+                    pending = by_timestamp.get(reply.get("timestamp"))
+                    seq = pending.pop(0) if pending else None
+                if seq is not None and seq in run.sent_at:
+                    run.replied(seq, reply)
+                    replied.set()
+                    if seq == last_seq:
+                        return
+        finally:
+            replied.set()
+
+    reader = asyncio.create_task(read_replies())
+    loop = asyncio.get_running_loop()
+    origin_t = session.frames[0].t if session.frames else 0.0
+    origin = loop.time()
+    for frame in session.frames:
+        if realtime:
+            delay = (frame.t - origin_t) / speed - (loop.time() - origin)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        run.sent(frame.seq)
+        if frame.base64:
+            by_timestamp.setdefault(frame.timestamp, []).append(frame.seq)
+            await ws.send(json.dumps({"type": "detect", "image": base64.b64encode(frame.image).decode("ascii"),
+                                      "ts": frame.timestamp}))
+        else:
+            codec = wps.CODEC_PNG if frame.image[:4] == b"\x89PNG" else wps.CODEC_JPEG
+            await ws.send(wps.FRAME_HEADER.pack(wps.MSG_DETECT, codec, frame.seq, frame.timestamp) + frame.image)
+        if not realtime:
+            while frame.seq not in run.replies and not reader.done():
+                replied.clear()
+                await replied.wait()
+    try:
+        await asyncio.wait_for(reader, REPLY_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        pass
+    return run.report()
+
+
+async def replay_ws(sessions: List[RecordedSession], url: Optional[str], realtime: bool, speed: float) -> List[dict]:
+    import websockets
+    server = None
+    if url is None:
+        import ws_pose_server as wps
+        if not wps.MEDIAPIPE_AVAILABLE:
+            raise SystemExit("mediapipe not available")
+        server = await websockets.serve(wps.handler, "127.0.0.1", 0, max_size=8 * 1024 * 1024)
+        url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    reports = []
+    try:
+        for session in sessions:
+            # One connection per session, like the recorded client
+            async with websockets.connect(url, max_size=8 * 1024 * 1024) as ws:
+                reports.append(await _replay_ws_session(ws, session, realtime, speed))
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+    return reports
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded pose sessions through a pose server")
+    parser.add_argument("recording", help="file written by the servers' record mode")
+    parser.add_argument("--target", choices=("detector", "ws"), default="detector")
+    parser.add_argument("--url", help="ws target: replay against this running server instead of a local one")
+    parser.add_argument("--model", help="detector target: model to initialize with instead of the recorded one")
+    parser.add_argument("--realtime", action="store_true", help="send frames at their recorded arrival times")
+    parser.add_argument("--speed", type=float, default=1.0, help="realtime playback speed factor")
+    parser.add_argument("--session", type=int, action="append", help="only replay this session index (repeatable)")
+    parser.add_argument("-o", "--output", help="write the report as JSON")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    sessions = load_sessions(args.recording)
+    if args.session:
+        sessions = [sessions[i] for i in args.session]
+    frames = sum(len(s.frames) for s in sessions)
+    print(f"Replaying {len(sessions)} session(s), {frames} frames, "
+          f"{'realtime x' + str(args.speed) if args.realtime else 'as fast as possible'}", file=sys.stderr)
+
+    if args.target == "detector":
+        reports = replay_detector(sessions, args.model, args.realtime, args.speed)
+    else:
+        reports = asyncio.run(replay_ws(sessions, args.url, args.realtime, args.speed))
+
+    for i, report in enumerate(reports):
+        latency = report.get("latency_ms", {})
+        drift = report["drift"]
+        print(f"session {i}: {report['replies']}/{report['sent']} replies ({report['dropped']} dropped), "
+              f"{report['throughput_fps']} fps, latency p50 {latency.get('p50')} p95 {latency.get('p95')} ms, "
+              f"drift mean {drift.get('mean_abs_xy')} max {drift.get('max_abs_xy')} "
+              f"over {drift['compared']} frames, {drift['success_mismatch']} success mismatches")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"recording": os.path.abspath(args.recording), "target": args.target,
+                       "realtime": args.realtime, "speed": args.speed, "sessions": reports}, f, indent=2)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
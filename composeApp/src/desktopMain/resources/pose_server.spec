@@ -15,13 +15,18 @@ a = Analysis(
         'mediapipe.tasks',
         'mediapipe.tasks.python',
         'mediapipe.tasks.python.vision',
+        'pose_landmarks',
+        'pose_calibration',
+        'pose_metrics',
+        'pose_temporal',
+        'pose_stats',
+        'pose_image',
+        'pose_record',
+        'pose_summary',
         'cv2',
         'numpy',
-        'PIL',
-        'PIL.Image',
         'json',
         'base64',
-        'io',
         'os',
         'signal',
         'threading',
@@ -32,7 +37,8 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Nothing in the service uses Pillow
+    excludes=['PIL'],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
@@ -41,13 +47,13 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# One-folder build: a one-file binary unpacks itself to a temp dir on every launch,
+# which dominated cold start. The executable is dist/pose_server/pose_server.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='pose_server',
     debug=False,
     bootloader_ignore_signals=False,
@@ -63,9 +69,20 @@ exe = EXE(
     entitlements_file=None,
 )
 
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='pose_server',
+)
+
 # macOS specific
 app = BUNDLE(
-    exe,
+    coll,
     name='pose_server.app',
     icon=None,
     bundle_identifier=None,
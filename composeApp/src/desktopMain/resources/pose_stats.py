@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing shared by the pose servers
+
+StageTimer: lap timer carried through one frame; each lap adds the time since the previous
+lap to a named stage (decode, convert, inference, encode, serialize, queue, ...).
+PipelineStats: rolling window of per-stage timings with p50/p95/p99, frame rate and drop
+rate, returned by the servers' "stats" command.
+ProfileCapture: cProfile over the next N frames, written to a .prof file and summarized.
+
+With "timing":true each detection also carries a "timing" object of <stage>_ms values;
+serialize is only in the stats, as it is measured after the reply is built. "profile"
+starts a ProfileCapture and the reply to its last frame carries the summary.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+
+# Frames kept per stage for the percentiles
+DEFAULT_WINDOW = 1000
+# Frame rate is measured over this many seconds of completions
+RATE_WINDOW_S = 10.0
+
+
+class StageTimer:
+    """Accumulates wall time per stage with one perf_counter() call per lap."""
+
+    __slots__ = ("timings", "_last")
+
+    def __init__(self, started: Optional[float] = None):
+        self.timings = {}
+        self._last = time.perf_counter() if started is None else started
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last) * 1000.0
+        self._last = now
+
+
+def timing_block(timings: dict) -> dict:
+    """Per-response "timing" object: {"<stage>_ms": ...}."""
+    return {f"{stage}_ms": round(ms, 3) for stage, ms in timings.items()}
+
+
+class PipelineStats:
+    """Rolling per-stage timing windows plus frame and drop counters."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self.window = window
+        self.frames = 0
+        self.dropped = 0
+        self._stages = {}
+        self._completed = deque()
+        self.started = time.monotonic()
+
+    def record(self, timings: dict):
+        """Record one finished frame."""
+        self.frames += 1
+        for stage, ms in timings.items():
+            samples = self._stages.get(stage)
+            if samples is None:
+                samples = self._stages[stage] = deque(maxlen=self.window)
+            samples.append(ms)
+        now = time.monotonic()
+        self._completed.append(now)
+        while self._completed and now - self._completed[0] > RATE_WINDOW_S:
+            self._completed.popleft()
+
+    def count_dropped(self, n: int = 1):
+        self.dropped += n
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        recent = [t for t in self._completed if now - t <= RATE_WINDOW_S]
+        span = min(RATE_WINDOW_S, max(now - self.started, 1.0))
+        stages = {}
+        for stage, samples in self._stages.items():
+            values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+            p50, p95, p99 = np.percentile(values, (50, 95, 99))
+            stages[stage] = {
+                "count": len(values),
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        offered = self.frames + self.dropped
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "drop_rate": round(self.dropped / offered, 4) if offered else 0.0,
+            "fps": round(len(recent) / span, 2) if span > 0 else 0.0,
+            "uptime_s": round(now - self.started, 1),
+            "window": self.window,
+            "stages": stages,
+        }
+
+    def reset(self):
+        self.frames = 0
+        self.dropped = 0
+        self._stages.clear()
+        self._completed.clear()
+        self.started = time.monotonic()
+
+
+class ProfileCapture:
+    """cProfile over the next `frames` calls to run(); only the calling thread is profiled."""
+
+    def __init__(self, frames: int, path: Optional[str] = None, top: int = 15):
+        if frames <= 0:
+            raise ValueError("frames must be positive")
+        self.frames = frames
+        self.remaining = frames
+        self.top = top
+        self.path = path or os.path.join(tempfile.gettempdir(),
+                                         f"posture_profile_{os.getpid()}_{int(time.time())}.prof")
+        self._profile = cProfile.Profile()
+
+    @property
+    def done(self) -> bool:
+        return self.remaining <= 0
+
+    def run(self, fn, *args):
+        self._profile.enable()
+        try:
+            return fn(*args)
+        finally:
+            self._profile.disable()
+            self.remaining -= 1
+
+    def finish(self) -> dict:
+        """Write the .prof file and return the top functions by cumulative time."""
+        self._profile.dump_stats(self.path)
+        stats = pstats.Stats(self._profile, stream=io.StringIO())
+        stats.sort_stats("cumulative")
+        top = []
+        for func in stats.fcn_list[:self.top]:
+            calls, _, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            top.append({
+                "function": f"{os.path.basename(filename)}:{line}({name})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000.0, 3),
+                "cumtime_ms": round(cumtime * 1000.0, 3),
+            })
+        return {"frames": self.frames - max(self.remaining, 0), "path": self.path,
+                "total_ms": round(stats.total_tt * 1000.0, 3), "top": top}
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Per-session posture aggregates shared by the pose servers
+
+SessionSummary takes one score per detection (None when no pose was found) and keeps, in
+fixed memory however long the session runs:
+- a histogram of the integer scores (0-100), for the exact session mean and percentiles
+- time spent below the threshold, and slouch events: the score staying below the
+  threshold for at least slouch_min_s
+- a ring of per-minute buckets keyed by wall-clock minute, shaped like the PostureRecord
+  rows the app uploads (average score and sample count per minute)
+
+Each sample's state lasts until the next one, at most max_gap_s, so a paused stream does
+not count as time spent slouching. The servers' "session_summary" command returns
+snapshot(), so a client uploads a compact summary instead of keeping every frame's score;
+with "since" only the later minutes are returned, and "reset":true starts over after the
+reply, so a client can upload and clear periodically. An init starts a new summary.
+"""
+
+import time
+from typing import Optional
+
+import numpy as np
+
+from pose_metrics import compute_metrics_batch
+
+# Score a summary can aggregate (see pose_metrics.py)
+SCORE_KINDS = ("ratio_score", "metric_score")
+# Below this the app counts a minute as bad (SupabaseClient's badMinutes)
+DEFAULT_THRESHOLD = 60
+DEFAULT_SLOUCH_MIN_S = 3.0
+DEFAULT_MAX_GAP_S = 2.0
+# Per-minute buckets kept (12 hours)
+DEFAULT_MINUTES = 720
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def posture_score(landmarks, calibrated_ratio: Optional[float] = None, kind: str = "ratio_score") -> int:
+    """Score 0-100 of a single frame of landmarks."""
+    return int(compute_metrics_batch(landmarks, calibrated_ratio)[kind][0])
+
+
+class SessionSummary:
+    """Rolling score aggregates for one session, updated in O(1) per result."""
+
+    def __init__(self, kind: str = "ratio_score", threshold: int = DEFAULT_THRESHOLD,
+                 slouch_min_s: float = DEFAULT_SLOUCH_MIN_S, max_gap_s: float = DEFAULT_MAX_GAP_S,
+                 minutes: int = DEFAULT_MINUTES):
+        if kind not in SCORE_KINDS:
+            raise ValueError(f"unknown score: {kind} (expected one of {', '.join(SCORE_KINDS)})")
+        if minutes <= 0:
+            raise ValueError("minutes must be positive")
+        if not 0 <= int(threshold) <= 100:
+            raise ValueError("threshold must be between 0 and 100")
+        self.kind = kind
+        self.threshold = int(threshold)
+        self.slouch_min_s = float(slouch_min_s)
+        self.max_gap_s = float(max_gap_s)
+        self.minutes = int(minutes)
+        self._histogram = np.zeros(101, dtype=np.int64)
+        # Ring of per-minute buckets; slot i holds minute _minute[i] (-1 = unused)
+        self._minute = np.full(self.minutes, -1, dtype=np.int64)
+        self._samples = np.zeros(self.minutes, dtype=np.int64)
+        self._score_sum = np.zeros(self.minutes, dtype=np.int64)
+        self._no_pose = np.zeros(self.minutes, dtype=np.int64)
+        self._below_s = np.zeros(self.minutes, dtype=np.float64)
+        self._slouches = np.zeros(self.minutes, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self._histogram[:] = 0
+        self._minute[:] = -1
+        self.score_sum = 0
+        self.no_pose = 0
+        self.tracked_s = 0.0
+        self.below_s = 0.0
+        self.no_pose_s = 0.0
+        self.slouch_events = 0
+        self.started_at: Optional[float] = None
+        self._last_at: Optional[float] = None
+        self._last_state: Optional[str] = None
+        self._below_since: Optional[float] = None
+        self._slouch_counted = False
+
+    @property
+    def samples(self) -> int:
+        return int(self._histogram.sum())
+
+    def add(self, score: Optional[int], at: Optional[float] = None):
+        """Account one result at wall-clock time `at` (now by default); None means no pose."""
+        at = time.time() if at is None else at
+        if self.started_at is None:
+            self.started_at = at
+        i = self._bucket(at)
+
+        # The previous result's state lasted until now
+        if self._last_at is not None:
+            dt = min(max(at - self._last_at, 0.0), self.max_gap_s)
+            self.tracked_s += dt
+            if self._last_state == "below":
+                self.below_s += dt
+                self._below_s[i] += dt
+            elif self._last_state == "no_pose":
+                self.no_pose_s += dt
+        self._last_at = at
+
+        if score is None:
+            self.no_pose += 1
+            self._no_pose[i] += 1
+            self._last_state = "no_pose"
+            self._below_since = None
+            self._slouch_counted = False
+            return
+
+        score = min(max(int(score), 0), 100)
+        self._histogram[score] += 1
+        self.score_sum += score
+        self._samples[i] += 1
+        self._score_sum[i] += score
+        if score < self.threshold:
+            self._last_state = "below"
+            if self._below_since is None:
+                self._below_since = at
+            if not self._slouch_counted and at - self._below_since >= self.slouch_min_s:
+                self._slouch_counted = True
+                self.slouch_events += 1
+                self._slouches[i] += 1
+        else:
+            self._last_state = "above"
+            self._below_since = None
+            self._slouch_counted = False
+
+    def _bucket(self, at: float) -> int:
+        minute = int(at // 60)
+        i = minute % self.minutes
+        if self._minute[i] != minute:
+            self._minute[i] = minute
+            self._samples[i] = 0
+            self._score_sum[i] = 0
+            self._no_pose[i] = 0
+            self._below_s[i] = 0.0
+            self._slouches[i] = 0
+        return i
+
+    def snapshot(self, since_ms: Optional[int] = None, now: Optional[float] = None) -> dict:
+        """The session aggregates plus the per-minute buckets starting at or after since_ms."""
+        now = time.time() if now is None else now
+        samples = self.samples
+        summary = {
+            "score": self.kind,
+            "threshold": self.threshold,
+            "samples": samples,
+            "no_pose": self.no_pose,
+            "started_at": None if self.started_at is None else int(self.started_at * 1000),
+            "tracked_s": round(self.tracked_s, 2),
+            "below_threshold_s": round(self.below_s, 2),
+            "no_pose_s": round(self.no_pose_s, 2),
+            "slouch_events": self.slouch_events,
+        }
+        if samples:
+            cumulative = np.cumsum(self._histogram)
+            ranks = np.maximum(np.ceil(np.array(PERCENTILES) / 100.0 * samples), 1)
+            values = np.searchsorted(cumulative, ranks)
+            scored = np.flatnonzero(self._histogram)
+            summary.update({
+                "mean_score": round(self.score_sum / samples, 2),
+                "min_score": int(scored[0]),
+                "max_score": int(scored[-1]),
+                "percentiles": {f"p{q}": int(v) for q, v in zip(PERCENTILES, values)},
+                "below_threshold_ratio": round(int(cumulative[self.threshold - 1]) / samples, 4)
+                if self.threshold > 0 else 0.0,
+            })
+        summary["minutes"] = self._minute_buckets(since_ms, now)
+        return summary
+
+    def _minute_buckets(self, since_ms: Optional[int], now: float) -> list:
+        used = np.flatnonzero(self._minute >= 0)
+        if since_ms is not None:
+            used = used[self._minute[used] * 60000 >= since_ms]
+        used = used[np.argsort(self._minute[used])]
+        current = int(now // 60)
+        buckets = []
+        for i in used:
+            samples = int(self._samples[i])
+            buckets.append({
+                "minute": int(self._minute[i]) * 60000,
+                "samples": samples,
+                # Truncated like the app's scores.average().toInt()
+                "average_score": int(self._score_sum[i] // samples) if samples else None,
+                "no_pose": int(self._no_pose[i]),
+                "below_threshold_s": round(float(self._below_s[i]), 2),
+                "slouch_events": int(self._slouches[i]),
+                "partial": bool(self._minute[i] >= current),
+            })
+        return buckets
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Frame-to-frame helpers shared by the pose servers
+
+MotionGate: skips inference while the camera image is (nearly) unchanged and hands back the
+last result instead, flagged "reused".
+LandmarkFilter: One Euro smoothing of the landmarks and constant-velocity prediction between
+real inferences.
+"""
+
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """Reuse the previous result while a small grayscale thumbnail of the frame barely changes.
+
+    Frames are compared with the last frame that actually went through inference (not the
+    previous frame), so slow drift still adds up and triggers a refresh. A result is never
+    reused for longer than max_reuse_ms.
+    """
+
+    def __init__(self, threshold: float = 2.0, max_reuse_ms: float = 1000.0, thumb_size=(32, 24)):
+        # Mean absolute difference in gray levels (0-255) below which a frame counts as still
+        self.threshold = threshold
+        self.max_reuse_ms = max_reuse_ms
+        self.thumb_size = thumb_size
+        self.inferred = 0
+        self.reused = 0
+        self._thumb: Optional[np.ndarray] = None
+        self._pending: Optional[np.ndarray] = None
+        self._result: Optional[dict] = None
+        self._stored_at = 0.0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_AREA)
+        # Channel mean as grayscale: works the same for BGR and RGB frames
+        return small.mean(axis=2, dtype=np.float32) if small.ndim == 3 else small.astype(np.float32)
+
+    def lookup(self, frame: np.ndarray, timestamp: int) -> Optional[dict]:
+        """Return a copy of the cached result if the frame is still enough, else None."""
+        thumb = self._thumbnail(frame)
+        self._pending = thumb
+        if self._result is None or self._thumb is None:
+            return None
+        age_ms = (time.monotonic() - self._stored_at) * 1000.0
+        if age_ms > self.max_reuse_ms:
+            return None
+        motion = float(np.abs(thumb - self._thumb).mean())
+        if motion >= self.threshold:
+            return None
+        self.reused += 1
+        result = dict(self._result)
+        result.update({"timestamp": timestamp, "reused": True, "reuse_age_ms": round(age_ms), "motion": round(motion, 2)})
+        return result
+
+    def store(self, result: dict):
+        """Remember the result inferred for the frame passed to the last lookup()."""
+        self.inferred += 1
+        if self._pending is None:
+            return
+        self._thumb = self._pending
+        self._result = dict(result)
+        self._stored_at = time.monotonic()
+
+    def reset(self):
+        self._thumb = None
+        self._pending = None
+        self._result = None
+
+
+class LandmarkFilter:
+    """One Euro filter over every landmark coordinate at once, plus constant-velocity prediction.
+
+    update() feeds a real inference result and returns the filtered landmarks; predict()
+    extrapolates the filtered landmarks to any time after the last update (up to
+    max_predict_ms, then they are held), so clients can render at display rate while
+    inference runs at a few Hz. Timestamps are the client's frame timestamps in ms; when
+    predict() gets no timestamp, the offset between that clock and ours is used.
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.5, d_cutoff: float = 1.0,
+                 max_predict_ms: float = 250.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.max_predict_ms = max_predict_ms
+        self.reset()
+
+    def reset(self):
+        self._position: Optional[np.ndarray] = None  # (N, 3) filtered x, y, z
+        self._velocity: Optional[np.ndarray] = None  # (N, 3) filtered units per second
+        self._raw: Optional[np.ndarray] = None       # (N, 3) last unfiltered x, y, z
+        self._extra: Optional[np.ndarray] = None     # (N, 2) visibility, presence (not filtered)
+        self.last_timestamp: Optional[float] = None
+        self._clock_offset = 0.0
+
+    @staticmethod
+    def _alpha(cutoff, dt: float):
+        tau = 1.0 / (2.0 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    @staticmethod
+    def _now_ms() -> float:
+        return time.monotonic() * 1000.0
+
+    def update(self, landmarks: np.ndarray, timestamp_ms: float) -> np.ndarray:
+        if not timestamp_ms or timestamp_ms <= 0:
+            timestamp_ms = self._now_ms()
+        self._clock_offset = self._now_ms() - timestamp_ms
+        position = landmarks[:, :3].astype(np.float64)
+        self._extra = landmarks[:, 3:].copy()
+        if self._position is None or self._position.shape != position.shape:
+            self._position = position.copy()
+            self._velocity = np.zeros_like(position)
+        else:
+            # Out-of-order or duplicate timestamps still count as a (very short) step
+            dt = max((timestamp_ms - self.last_timestamp) / 1000.0, 1e-3)
+            # From the raw positions: the filtered ones lag, which would inflate the velocity
+            raw_velocity = (position - self._raw) / dt
+            self._velocity += self._alpha(self.d_cutoff, dt) * (raw_velocity - self._velocity)
+            cutoff = self.min_cutoff + self.beta * np.abs(self._velocity)
+            self._position += self._alpha(cutoff, dt) * (position - self._position)
+        self._raw = position
+        self.last_timestamp = max(timestamp_ms, self.last_timestamp or timestamp_ms)
+        return self._compose(self._position)
+
+    def predict(self, timestamp_ms: Optional[float] = None):
+        """Return (landmarks at timestamp_ms, ms extrapolated), or (None, 0) before the first update."""
+        if self._position is None:
+            return None, 0.0
+        if timestamp_ms is None:
+            timestamp_ms = self._now_ms() - self._clock_offset
+        ahead_ms = min(max(timestamp_ms - self.last_timestamp, 0.0), self.max_predict_ms)
+        return self._compose(self._position + self._velocity * (ahead_ms / 1000.0)), ahead_ms
+
+    def _compose(self, position: np.ndarray) -> np.ndarray:
+        return np.concatenate([position.astype(np.float32), self._extra], axis=1)
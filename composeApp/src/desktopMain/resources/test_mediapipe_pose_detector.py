@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Tests for the detector service helpers (mediapipe_pose_detector.py)
+
+No model file is needed: the landmarkers are replaced by fakes.
+"""
+
+import base64
+import json
+import mmap
+import os
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+import mediapipe_pose_detector
+from mediapipe_pose_detector import (FRAME_LENGTH, RING_PREFIX, SHM_DIR, LatencyModelSelector, SharedFrameRing,
+                                     recv_exact, resolve_recording_path, send_message)
+from pose_calibration import CalibrationWindow
+from pose_metrics import LEFT_EYE, LEFT_HIP, LEFT_SHOULDER, NOSE, RIGHT_EYE, RIGHT_HIP, RIGHT_SHOULDER
+from pose_record import load_sessions
+
+
+@pytest.fixture(scope="module", autouse=True)
+def runtime():
+    # numpy, OpenCV and the pose_* helpers are imported lazily by the service
+    mediapipe_pose_detector.load_runtime()
+
+
+@pytest.fixture
+def ring_path():
+    path = os.path.join(SHM_DIR, f"{RING_PREFIX}_test_{os.getpid()}")
+    yield path
+    if os.path.lexists(path):
+        os.remove(path)
+
+
+@pytest.fixture
+def ring(ring_path):
+    ring = SharedFrameRing(ring_path, 2, 8, 4)
+    yield ring
+    ring.close()
+
+
+class RingWriter:
+    """The client side of a ring: its own mapping of the file, as another process would have."""
+
+    def __init__(self, ring):
+        self.ring = ring
+        with open(ring.path, "r+b") as f:
+            self.mmap = mmap.mmap(f.fileno(), ring.size)
+
+    def begin(self, slot, sequence):
+        """Odd sequence: the slot is being written."""
+        SharedFrameRing.SLOT_HEADER.pack_into(self.mmap, self.ring.slot_offset(slot), sequence, 0, 0, 0)
+
+    def write(self, slot, sequence, pixels, timestamp_ms=0):
+        height, width, _ = pixels.shape
+        start = self.ring.slot_offset(slot) + self.ring.pixel_offset
+        self.mmap[start:start + pixels.size] = pixels.tobytes()
+        SharedFrameRing.SLOT_HEADER.pack_into(self.mmap, self.ring.slot_offset(slot), sequence, timestamp_ms,
+                                              width, height)
+
+    def close(self):
+        self.mmap.close()
+
+
+def test_resolve_path_defaults_to_the_shm_ring():
+    assert SharedFrameRing.resolve_path(None) == os.path.join(SHM_DIR, RING_PREFIX)
+    assert SharedFrameRing.resolve_path("") == os.path.join(SHM_DIR, RING_PREFIX)
+
+
+@pytest.mark.parametrize("name", [RING_PREFIX, f"{RING_PREFIX}_cam1"])
+def test_resolve_path_accepts_prefixed_files_in_shm_dir(name):
+    assert SharedFrameRing.resolve_path(os.path.join(SHM_DIR, name)) == os.path.join(os.path.realpath(SHM_DIR),
+                                                                                       name)
+    # A bare name is taken to be in SHM_DIR
+    assert SharedFrameRing.resolve_path(name) == os.path.join(os.path.realpath(SHM_DIR), name)
+
+
+@pytest.mark.parametrize("path", [
+    "/etc/passwd",
+    f"/home/{RING_PREFIX}",
+    os.path.join(SHM_DIR, "other_frames"),
+    os.path.join(SHM_DIR, "sub", RING_PREFIX),
+    os.path.join(SHM_DIR, "..", RING_PREFIX),
+    f"{SHM_DIR}/../etc/{RING_PREFIX}",
+])
+def test_resolve_path_rejects_paths_outside_shm_dir(path):
+    with pytest.raises(ValueError):
+        SharedFrameRing.resolve_path(path)
+
+
+def test_resolve_path_rejects_other_types():
+    with pytest.raises(ValueError):
+        SharedFrameRing.resolve_path(["/dev/shm/posture_frames"])
+
+
+def test_resolve_path_follows_symlinked_directories(tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (tmp_path / "to_outside").symlink_to(outside)
+    (tmp_path / "to_shm").symlink_to(SHM_DIR)
+    with pytest.raises(ValueError):
+        SharedFrameRing.resolve_path(str(tmp_path / "to_outside" / RING_PREFIX))
+    # A link into SHM_DIR is judged (and returned) by where it points
+    assert SharedFrameRing.resolve_path(str(tmp_path / "to_shm" / RING_PREFIX)) == os.path.join(
+        os.path.realpath(SHM_DIR), RING_PREFIX)
+
+
+def test_ring_does_not_follow_a_symlink_at_the_ring_path(tmp_path, ring_path):
+    target = tmp_path / "victim"
+    target.write_bytes(b"keep me")
+    os.symlink(target, ring_path)
+    # The name itself passes the check; opening it must not truncate the target
+    assert SharedFrameRing.resolve_path(ring_path) == os.path.join(os.path.realpath(SHM_DIR),
+                                                                   os.path.basename(ring_path))
+    with pytest.raises(OSError):
+        SharedFrameRing(ring_path, 2, 8, 4)
+    assert target.read_bytes() == b"keep me"
+
+
+def test_ring_layout(ring):
+    layout = ring.describe()
+    assert layout["header_size"] % SharedFrameRing.SLOT_ALIGN == 0
+    assert layout["slot_size"] % SharedFrameRing.SLOT_ALIGN == 0
+    assert layout["size"] == os.path.getsize(ring.path) == layout["header_size"] + 2 * layout["slot_size"]
+    with open(ring.path, "rb") as f:
+        magic, version, slots, width, height, channels = SharedFrameRing.HEADER.unpack(
+            f.read(SharedFrameRing.HEADER.size))
+    assert (magic, version, slots, width, height, channels) == (b"PSFR", SharedFrameRing.VERSION, 2, 8, 4, 3)
+
+
+def test_read_slot_returns_a_view_of_a_finished_frame(ring):
+    writer = RingWriter(ring)
+    pixels = np.arange(4 * 6 * 3, dtype=np.uint8).reshape(4, 6, 3)
+    writer.write(1, 2, pixels)
+    frame, sequence = ring.read_slot(1)
+    assert sequence == 2
+    assert frame.shape == (4, 6, 3) and np.array_equal(frame, pixels)
+    # Zero-copy: a later write shows through the same view
+    writer.write(1, 4, pixels + 1)
+    assert np.array_equal(frame, pixels + 1)
+    del frame
+    writer.close()
+
+
+def test_read_slot_skips_a_slot_being_written(ring):
+    writer = RingWriter(ring)
+    writer.begin(0, 3)
+    assert ring.read_slot(0) == (None, 3)
+    writer.close()
+
+
+@pytest.mark.parametrize("width, height", [(0, 4), (9, 4), (8, 5)])
+def test_read_slot_rejects_bad_dimensions(ring, width, height):
+    writer = RingWriter(ring)
+    SharedFrameRing.SLOT_HEADER.pack_into(writer.mmap, ring.slot_offset(0), 2, 0, width, height)
+    with pytest.raises(ValueError):
+        ring.read_slot(0)
+    writer.close()
+
+
+@pytest.mark.parametrize("slot", [-1, 2])
+def test_read_slot_rejects_unknown_slots(ring, slot):
+    with pytest.raises(IndexError):
+        ring.read_slot(slot)
+
+
+def sitting_pose():
+    """33 landmarks of a user sitting straight in front of the camera."""
+    points = {LEFT_SHOULDER: (0.4, 0.6), RIGHT_SHOULDER: (0.6, 0.6), LEFT_HIP: (0.42, 0.9), RIGHT_HIP: (0.58, 0.9),
+              NOSE: (0.5, 0.4), LEFT_EYE: (0.47, 0.4), RIGHT_EYE: (0.53, 0.4)}
+    return [SimpleNamespace(x=points.get(i, (0.5, 0.5))[0], y=points.get(i, (0.5, 0.5))[1], z=0.0,
+                            visibility=1.0, presence=1.0) for i in range(33)]
+
+
+class FakeLandmarker:
+    """Stands in for a PoseLandmarker; finds no pose, or the same one in every frame with posed=True."""
+
+    def __init__(self, posed=False):
+        self.calls = 0
+        self.poses = [sitting_pose()] if posed else []
+
+    def detect_for_video(self, image, timestamp_ms):
+        self.calls += 1
+        return SimpleNamespace(pose_landmarks=self.poses)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def detector():
+    detector = mediapipe_pose_detector.MediaPipePoseDetector()
+    detector.landmarkers = {"full": FakeLandmarker(), "lite": FakeLandmarker()}
+    detector.set_active_model("full")
+    detector.is_initialized = True
+    return detector
+
+
+def test_torn_shared_frame_is_not_detected(ring, detector, monkeypatch):
+    writer = RingWriter(ring)
+    writer.write(0, 2, np.zeros((4, 8, 3), dtype=np.uint8))
+    real_mp = mediapipe_pose_detector.mp
+
+    def image_while_the_writer_laps(**kwargs):
+        # The writer starts on the slot again while the frame is being wrapped
+        writer.begin(0, 5)
+        return real_mp.Image(**kwargs)
+
+    monkeypatch.setattr(mediapipe_pose_detector, "mp",
+                        SimpleNamespace(Image=image_while_the_writer_laps, ImageFormat=real_mp.ImageFormat))
+    result = detector.process_shared_frame(ring, 0, 1000)
+    assert result["success"] is False and result["message"] == "Frame overwritten before it was read"
+    assert detector.landmarker.calls == 0
+    # Once the writer has finished the slot it is read normally
+    writer.write(0, 6, np.zeros((4, 8, 3), dtype=np.uint8))
+    monkeypatch.setattr(mediapipe_pose_detector, "mp", real_mp)
+    result = detector.process_shared_frame(ring, 0, 1033)
+    assert result["message"] == "No pose detected" and result["sequence"] == 6
+    assert detector.landmarker.calls == 1
+    writer.close()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(mediapipe_pose_detector.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def selector(**kwargs):
+    options = {"budget_ms": 30.0, "window": 4, "min_dwell": 3, "probe_interval_s": 30.0,
+               "max_probe_interval_s": 100.0}
+    options.update(kwargs)
+    return LatencyModelSelector(**options)
+
+
+def feed(selector, label, latencies):
+    """Switches asked for while the latencies are recorded, one entry per sample."""
+    return [selector.record(label, elapsed_ms) for elapsed_ms in latencies]
+
+
+def test_full_model_stays_inside_the_budget(clock):
+    models = selector()
+    assert feed(models, "full", [25.0] * 20) == [None] * 20
+    assert models.active == "full"
+
+
+def test_slow_full_model_switches_to_lite_after_the_dwell(clock):
+    models = selector()
+    # Over budget from the first frame, but no switch before min_dwell frames have run
+    assert feed(models, "full", [50.0, 50.0, 50.0]) == [None, None, "lite"]
+    assert models.active == "lite" and models.frames_on_active == 0
+
+
+def test_a_short_spike_does_not_switch(clock):
+    models = selector()
+    # The rolling average (window 4) stays inside the budget
+    assert feed(models, "full", [20.0, 20.0, 20.0, 50.0, 20.0, 20.0]) == [None] * 6
+
+
+def test_full_model_comes_back_only_with_headroom(clock):
+    models = selector()
+    feed(models, "full", [50.0] * 3)
+    # Late full-model results (LIVE_STREAM) bring its average down, but inside the
+    # hysteresis band (budget * upgrade_ratio = 21 ms .. 30 ms) lite is kept
+    feed(models, "full", [25.0] * 4)
+    assert feed(models, "lite", [10.0] * 5) == [None] * 5
+    feed(models, "full", [15.0] * 4)
+    assert feed(models, "lite", [10.0]) == ["full"]
+    assert models.active == "full"
+
+
+def test_failed_probes_back_off_and_a_good_probe_resets(clock):
+    models = selector()
+    feed(models, "full", [50.0] * 3)
+    clock.now += 29.0
+    assert feed(models, "lite", [10.0] * 3) == [None] * 3
+
+    clock.now += 1.0
+    assert feed(models, "lite", [10.0]) == ["full"]
+    assert models.probing and len(models.samples["full"]) == 0
+    # The probe is still too slow: back to lite, and the next probe waits twice as long
+    assert feed(models, "full", [45.0] * 3) == [None, None, "lite"]
+    assert models.probe_interval_s == 60.0
+    clock.now += 59.0
+    assert feed(models, "lite", [10.0] * 3) == [None] * 3
+    clock.now += 1.0
+    assert feed(models, "lite", [10.0]) == ["full"]
+    assert feed(models, "full", [45.0] * 3)[-1] == "lite"
+    # Capped at max_probe_interval_s
+    assert models.probe_interval_s == 100.0
+
+    clock.now += 100.0
+    assert feed(models, "lite", [10.0] * 3) == [None, None, "full"]
+    # This probe fits the budget: stay on full and probe at the base interval again
+    assert feed(models, "full", [20.0] * 3) == [None] * 3
+    assert not models.probing and models.probe_interval_s == 30.0
+
+
+def test_samples_of_unknown_or_inactive_models_do_not_switch(clock):
+    models = selector()
+    assert feed(models, "heavy", [500.0] * 5) == [None] * 5
+    assert feed(models, "lite", [500.0] * 5) == [None] * 5
+    assert models.active == "full" and models.frames_on_active == 0
+
+
+def test_detector_switches_model_on_the_next_detect(detector, clock):
+    detector.model_selector = selector()
+    for _ in range(3):
+        detector.record_inference_time("full", 50.0)
+    # The switch waits for the command thread
+    assert detector.pending_model == "lite" and detector.active_model == "full"
+    response = detector.detect_image(None, 1000)
+    assert response["model"] == "lite" and detector.pending_model is None
+    assert (detector.landmarkers["full"].calls, detector.landmarkers["lite"].calls) == (0, 1)
+
+
+@pytest.fixture
+def responses(detector, monkeypatch):
+    """Run commands through process_command against the fake detector; collects (type, data) replies."""
+    sent = []
+    monkeypatch.setattr(mediapipe_pose_detector, "detector", detector)
+    monkeypatch.setattr(mediapipe_pose_detector, "send_response",
+                        lambda response_type, data, request_id: sent.append((response_type, data)))
+    return sent
+
+
+def command(message):
+    mediapipe_pose_detector.process_command(message, "req-1")
+
+
+@pytest.mark.parametrize("timestamp", ["soon", [1000], float("inf"), float("nan")])
+def test_predict_rejects_invalid_timestamp(responses, detector, timestamp):
+    detector.configure_filter(True)
+    command({"type": "predict", "timestamp": timestamp})
+    [(response_type, data)] = responses
+    assert response_type == "prediction"
+    assert data["success"] is False and data["message"].startswith("Invalid timestamp")
+
+
+def test_predict_without_timestamp_is_still_now(responses, detector):
+    detector.configure_filter(True)
+    command({"type": "predict"})
+    assert responses == [("prediction", {"success": False, "timestamp": None, "message": "No landmarks yet"})]
+
+
+@pytest.fixture
+def record_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "recordings"
+    monkeypatch.setattr(mediapipe_pose_detector, "RECORD_DIR", str(directory))
+    yield directory
+    if mediapipe_pose_detector.recorder is not None:
+        mediapipe_pose_detector.recorder.close()
+        mediapipe_pose_detector.recorder = None
+
+
+def test_recording_path_defaults_to_a_new_file_in_record_dir(record_dir):
+    path = resolve_recording_path(None)
+    assert os.path.dirname(path) == str(record_dir) and path.endswith(".poserec")
+
+
+@pytest.mark.parametrize("name", ["session.poserec", "{dir}/session.poserec", "{dir}/../recordings/session.poserec"])
+def test_recording_path_accepts_files_in_record_dir(record_dir, name):
+    path = resolve_recording_path(name.format(dir=record_dir))
+    assert path == os.path.join(os.path.realpath(record_dir), "session.poserec")
+
+
+@pytest.mark.parametrize("name", ["/etc/cron.d/job", "../session.poserec", "{dir}/../session.poserec",
+                                  "{dir}/sub/session.poserec", "{dir}/..", "{dir}/", ["session.poserec"]])
+def test_recording_path_rejects_files_elsewhere(record_dir, name):
+    with pytest.raises(ValueError):
+        resolve_recording_path(name.format(dir=record_dir) if isinstance(name, str) else name)
+
+
+def test_record_command_refuses_a_path_outside_record_dir(responses, record_dir, tmp_path):
+    command({"type": "record", "path": str(tmp_path / "elsewhere.poserec")})
+    [(response_type, data)] = responses
+    assert response_type == "record_response" and data["success"] is False
+    assert mediapipe_pose_detector.recorder is None
+    assert not (tmp_path / "elsewhere.poserec").exists()
+
+
+def test_malformed_frame_is_answered_while_recording(responses, record_dir):
+    command({"type": "record", "path": "session.poserec"})
+    assert responses.pop() == ("record_response", {"path": str(record_dir / "session.poserec"), "frames": 0,
+                                                   "success": True, "recording": True})
+    frame = base64.b64encode(b"not an image").decode()
+    command({"type": "detect", "frame_data": "abc", "timestamp": 1000})
+    command({"type": "detect", "frame_data": frame, "timestamp": 1033})
+    command({"type": "record", "enabled": False})
+    (bad_type, bad), (good_type, good), _ = responses
+    # The bad base64 gets the normal failed detection instead of a processing error, and is not recorded
+    assert bad_type == "detection_result" and bad["success"] is False and "Invalid frame data" in bad["error"]
+    assert good_type == "detection_result"
+    [session] = load_sessions(str(record_dir / "session.poserec"))
+    assert [(f.timestamp, f.image) for f in session.frames] == [(1033, b"not an image")]
+
+
+def test_motion_gate_is_bypassed_while_calibrating(detector):
+    landmarker = FakeLandmarker(posed=True)
+    detector.landmarkers["full"] = landmarker
+    detector.set_active_model("full")
+    detector.configure_motion_gate(True)
+    ok, jpeg = cv2.imencode(".jpg", np.full((48, 64, 3), 128, dtype=np.uint8))
+    still = base64.b64encode(jpeg.tobytes()).decode()
+    detector.process_frame(still, 1)
+    assert detector.process_frame(still, 2).get("reused") is True
+
+    window = CalibrationWindow(60_000, min_frames=3)
+    detector.start_calibration(window)
+    results = [detector.process_frame(still, ts) for ts in (3, 4, 5)]
+    assert not any(result.get("reused") for result in results)
+    assert landmarker.calls == 4
+    result = detector.finish_calibration()
+    assert result["success"] is True and result["frames"] == 3
+
+    assert detector.process_frame(still, 6).get("reused") is True
+
+
+DAEMON_SCRIPT = """
+import sys
+import mediapipe_pose_detector as service
+service.COMMAND_DIR, service.RESPONSE_DIR, service.PID_FILE = sys.argv[1:4]
+service.main()
+"""
+
+
+def socket_request(path, message):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(10.0)
+        sock.connect(path)
+        send_message(sock, message)
+        header = recv_exact(sock, FRAME_LENGTH.size)
+        assert header is not None, f"no reply to {message['type']}"
+        return json.loads(recv_exact(sock, FRAME_LENGTH.unpack(header)[0]))
+
+
+@pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets")
+def test_daemon_keeps_serving_after_its_launcher_goes_away(tmp_path):
+    sock_path, log_path = str(tmp_path / "pose.sock"), tmp_path / "daemon.log"
+    env = dict(os.environ, POSTURE_SOCKET_PATH=sock_path, POSTURE_DAEMON="1", POSTURE_DAEMON_LOG=str(log_path),
+               POSTURE_WARM_MODEL="")
+    args = [str(tmp_path / "commands"), str(tmp_path / "responses"), str(tmp_path / "pose.pid")]
+    # The launcher holds the daemon's output pipes, like the desktop app's ProcessBuilder
+    daemon = subprocess.Popen([sys.executable, "-c", DAEMON_SCRIPT] + args, env=env,
+                              cwd=os.path.dirname(os.path.abspath(mediapipe_pose_detector.__file__)),
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        deadline = time.monotonic() + 30.0
+        while not os.path.exists(sock_path):
+            assert daemon.poll() is None and time.monotonic() < deadline, "daemon did not start"
+            time.sleep(0.05)
+        assert socket_request(sock_path, {"type": "ping", "request_id": "1"})["type"] == "pong"
+
+        # The launcher exits: its ends of the pipes are closed
+        for pipe in (daemon.stdin, daemon.stdout, daemon.stderr):
+            pipe.close()
+        for request_id in ("2", "3"):
+            reply = socket_request(sock_path, {"type": "ping", "request_id": request_id})
+            assert reply["type"] == "pong" and reply["request_id"] == request_id
+        assert daemon.poll() is None
+        assert "Processing command: ping" in log_path.read_text()
+    finally:
+        daemon.terminate()
+        daemon.wait(10)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the robust calibration baseline (pose_calibration.py)
+"""
+
+import numpy as np
+import pytest
+
+from pose_calibration import MIN_VISIBILITY, CalibrationWindow, robust_baseline
+from pose_metrics import LEFT_EYE, LEFT_HIP, LEFT_SHOULDER, NOSE, RIGHT_EYE, RIGHT_HIP, RIGHT_SHOULDER
+
+
+def frames(count, ratio=1.0, noise=0.002, seed=0):
+    """Landmark frames of a user sitting straight, with ratio `ratio` and a little jitter."""
+    rng = np.random.default_rng(seed)
+    batch = np.zeros((count, 33, 5))
+    batch[:, :, 3:] = 1.0
+    face_y = 0.6 - 0.2 * ratio
+    for index, xy in ((LEFT_SHOULDER, (0.4, 0.6)), (RIGHT_SHOULDER, (0.6, 0.6)), (LEFT_HIP, (0.42, 0.9)),
+                      (RIGHT_HIP, (0.58, 0.9)), (NOSE, (0.5, face_y)), (LEFT_EYE, (0.47, face_y)),
+                      (RIGHT_EYE, (0.53, face_y))):
+        batch[:, index, :2] = xy
+    batch[:, :, :2] += rng.normal(0.0, noise, (count, 33, 2))
+    return batch
+
+
+def test_baseline_of_steady_frames():
+    result = robust_baseline(frames(30, ratio=0.9))
+    assert result["success"] is True
+    assert (result["frames"], result["inliers"]) == (30, 30)
+    assert result["calibrated_ratio"] == pytest.approx(0.9, abs=0.01)
+    assert result["stable"] is True
+    assert result["baseline"]["ratio"] == pytest.approx(0.9, abs=0.01)
+    assert result["baseline"]["shoulder_width"] == pytest.approx(0.2, abs=0.01)
+
+
+def test_outliers_are_rejected():
+    batch = frames(30, ratio=0.9)
+    # Two frames slouched, one leaning sideways
+    batch[:2] = frames(2, ratio=0.5, seed=1)
+    batch[2, [LEFT_HIP, RIGHT_HIP], 0] -= 0.3
+    result = robust_baseline(batch)
+    assert result["inliers"] == 27
+    assert result["rejected"] == {"low_visibility": 0, "outlier": 3}
+    assert result["calibrated_ratio"] == pytest.approx(0.9, abs=0.01)
+    # Without rejection the slouched frames would drag the mean down
+    assert robust_baseline(batch, outlier_z=1e9)["calibrated_ratio"] < 0.88
+
+
+def test_hidden_landmarks_are_dropped():
+    batch = frames(10)
+    batch[:4, LEFT_SHOULDER, 3] = MIN_VISIBILITY / 2
+    result = robust_baseline(batch)
+    assert result["rejected"]["low_visibility"] == 4
+    assert result["inliers"] == 6
+
+
+def test_not_enough_frames():
+    result = robust_baseline(frames(3), min_frames=5)
+    assert result["success"] is False
+    # Too few usable frames to look for outliers at all
+    assert result["inliers"] == 0
+    assert result["rejected"] == {"low_visibility": 0, "outlier": 0}
+    assert "not enough usable frames" in result["message"]
+
+
+@pytest.mark.parametrize("batch", [np.empty((0, 33, 5)), np.zeros((3, 33, 5))])
+def test_empty_and_invisible_windows_fail_cleanly(batch):
+    # Nothing collected, or every landmark hidden (visibility 0)
+    result = robust_baseline(batch, min_frames=1)
+    assert result["success"] is False
+    assert result["inliers"] == 0
+    assert result["rejected"]["low_visibility"] == len(batch)
+
+
+def test_frames_without_visibility_are_all_usable():
+    result = robust_baseline(frames(6)[:, :, :3])
+    assert result["success"] is True and result["inliers"] == 6
+
+
+def test_degenerate_frames_are_unusable():
+    batch = frames(6)
+    batch[:, RIGHT_SHOULDER, :2] = batch[:, LEFT_SHOULDER, :2]
+    result = robust_baseline(batch, min_frames=1)
+    assert result["success"] is False
+    assert result["rejected"]["low_visibility"] == 6
+
+
+@pytest.mark.parametrize("kwargs", [{"min_frames": 0}, {"min_frames": -2}, {"outlier_z": 0.0},
+                                    {"outlier_z": -1.0}, {"outlier_z": float("nan")}])
+def test_rejects_invalid_options(kwargs):
+    with pytest.raises(ValueError):
+        robust_baseline(np.zeros((3, 33, 5)), **kwargs)
+    with pytest.raises(ValueError):
+        CalibrationWindow(1000, **kwargs)
+
+
+@pytest.mark.parametrize("duration_ms, max_frames", [(0, 10), (float("nan"), 10), (1000, 0)])
+def test_window_rejects_invalid_limits(duration_ms, max_frames):
+    with pytest.raises(ValueError):
+        CalibrationWindow(duration_ms, max_frames=max_frames)
+
+
+def test_window_collects_until_full():
+    window = CalibrationWindow(60_000, max_frames=8)
+    batch = frames(10)
+    window.add(None, 0)
+    for timestamp, landmarks in enumerate(batch, start=1):
+        window.add(landmarks, timestamp)
+        # A repeated result (same timestamp) is only counted once
+        window.add(landmarks, timestamp)
+    assert window.done
+    result = window.finish()
+    assert result["frames"] == 8
+    assert result["rejected"]["no_pose"] == 1
+    assert result["success"] is True
+
+
+def test_empty_window_fails_cleanly():
+    result = CalibrationWindow(1).finish()
+    assert result["success"] is False
+    assert result["frames"] == 0
+    assert result["rejected"] == {"low_visibility": 0, "outlier": 0, "no_pose": 0}
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the frame decoding helpers (pose_image.py)
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from pose_image import FrameDecoder, jpeg_size, reduction_factor
+
+
+def encode(width, height, ext=".jpg"):
+    """An encoded image whose pixels are pure red (RGB 255, 0, 0)."""
+    bgr = np.zeros((height, width, 3), dtype=np.uint8)
+    bgr[:, :, 2] = 255
+    ok, buf = cv2.imencode(ext, bgr)
+    assert ok
+    return buf.tobytes()
+
+
+@pytest.mark.parametrize("width, height", [(640, 480), (1920, 1080), (17, 3001)])
+def test_jpeg_size_reads_header(width, height):
+    assert jpeg_size(encode(width, height)) == (width, height)
+
+
+def test_jpeg_size_skips_fill_bytes():
+    data = encode(320, 240)
+    # Insert fill bytes before the first marker after SOI
+    padded = data[:2] + b"\xff\xff" + data[2:]
+    assert jpeg_size(padded) == (320, 240)
+
+
+def test_jpeg_size_rejects_other_data():
+    assert jpeg_size(encode(320, 240, ".png")) is None
+    assert jpeg_size(b"") is None
+    assert jpeg_size(b"\xff\xd8\xff") is None
+    # Cut before the start-of-frame segment
+    assert jpeg_size(encode(320, 240)[:20]) is None
+
+
+@pytest.mark.parametrize("width, height, target, factor", [
+    (640, 480, 640, 1),
+    (1280, 720, 640, 2),
+    (1279, 720, 640, 1),
+    (2560, 1440, 640, 4),
+    (5120, 2880, 640, 8),
+    (20000, 100, 640, 8),
+    (720, 1280, 640, 2),   # portrait: the longest side counts
+    (4000, 3000, 0, 1),    # no target: always full size
+])
+def test_reduction_factor(width, height, target, factor):
+    assert reduction_factor(width, height, target) == factor
+
+
+def test_decoder_reduces_large_jpeg_in_rgb():
+    decoder = FrameDecoder(640)
+    frame = decoder.decode(encode(2560, 1440))
+    assert decoder.factor == 4
+    assert frame.shape == (360, 640, 3)
+    assert tuple(frame[10, 10]) == pytest.approx((255, 0, 0), abs=2)
+
+
+def test_decoder_keeps_small_jpeg():
+    decoder = FrameDecoder(640)
+    frame = decoder.decode(memoryview(encode(320, 240)))
+    assert decoder.factor == 1
+    assert frame.shape == (240, 320, 3)
+
+
+def test_decoder_shrinks_large_png_into_reused_buffer():
+    decoder = FrameDecoder(640)
+    first = decoder.decode(encode(1280, 960, ".png"))
+    assert decoder.factor == 2
+    assert first.shape == (480, 640, 3)
+    assert tuple(first[0, 0]) == (255, 0, 0)
+    second = decoder.decode(encode(1280, 960, ".png"))
+    assert second is first
+
+
+def test_decoder_rejects_garbage():
+    assert FrameDecoder().decode(b"not an image") is None
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for the landmark response formats (pose_landmarks.py)
+"""
+
+import numpy as np
+import pytest
+
+from pose_landmarks import (FIELDS, INT16_SCALE_INV, NUM_LANDMARKS, decode_landmarks, encode_landmarks,
+                            resolve_subset)
+
+
+def landmarks(seed=0):
+    rng = np.random.default_rng(seed)
+    arr = rng.uniform(0.0, 1.0, (NUM_LANDMARKS, len(FIELDS))).astype(np.float32)
+    arr[:, 2] -= 0.5  # z is signed
+    return arr
+
+
+def test_json_round_trip():
+    arr = landmarks()
+    response = encode_landmarks(arr, "json")
+    assert len(response["landmarks"]) == NUM_LANDMARKS
+    assert set(response["landmarks"][0]) == set(FIELDS)
+    np.testing.assert_array_equal(decode_landmarks(response), arr)
+
+
+def test_float32_round_trip_is_exact():
+    arr = landmarks()
+    response = encode_landmarks(arr, "float32")
+    assert response["landmark_format"] == "float32"
+    assert response["landmark_shape"] == [NUM_LANDMARKS, len(FIELDS)]
+    np.testing.assert_array_equal(decode_landmarks(response), arr)
+
+
+def test_int16_round_trip_within_quantization():
+    arr = landmarks()
+    decoded = decode_landmarks(encode_landmarks(arr, "int16"))
+    assert decoded.shape == arr.shape
+    assert np.abs(decoded - arr).max() <= 0.5 / INT16_SCALE_INV + 1e-6
+
+
+def test_int16_clips_out_of_range_values():
+    arr = landmarks()
+    arr[0, 0] = 10.0
+    decoded = decode_landmarks(encode_landmarks(arr, "int16"))
+    assert decoded[0, 0] == pytest.approx(32767 / INT16_SCALE_INV)
+
+
+def test_subset_keeps_requested_rows():
+    arr = landmarks()
+    indices = resolve_subset(["nose", "left_shoulder", 12])
+    response = encode_landmarks(arr, "float32", indices)
+    assert response["landmark_indices"] == [0, 11, 12]
+    np.testing.assert_array_equal(decode_landmarks(response), arr[[0, 11, 12]])
+
+
+def test_none_format_is_empty():
+    assert encode_landmarks(landmarks(), "none") == {}
+
+
+@pytest.mark.parametrize("spec", [["elbow"], [NUM_LANDMARKS], [True], []])
+def test_resolve_subset_rejects_invalid(spec):
+    with pytest.raises(ValueError):
+        resolve_subset(spec)
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        encode_landmarks(landmarks(), "float16")
+    with pytest.raises(ValueError):
+        decode_landmarks({"landmark_format": "float16", "landmarks_packed": ""})
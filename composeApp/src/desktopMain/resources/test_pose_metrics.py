@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the server-side posture metrics (pose_metrics.py) against the Kotlin client math
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from pose_metrics import (LEFT_EYE, LEFT_HIP, LEFT_SHOULDER, NOSE, RIGHT_EYE, RIGHT_HIP, RIGHT_SHOULDER,
+                          compute_metrics, compute_metrics_batch, metrics_batch_to_json, ratio_score)
+
+
+def calculate_ratio_score(current_ratio, calibrated_ratio):
+    """DesktopLiveTrackingScreen.kt calculateRatioScore, line for line."""
+    if calibrated_ratio <= 0 or current_ratio <= 0 or math.isnan(calibrated_ratio) or math.isnan(current_ratio):
+        return 50
+    drop = calibrated_ratio - current_ratio
+    if drop <= 0:
+        return 100
+    score = 100.0 - drop * 200.0
+    return min(max(int(score), 0), 100)
+
+
+def upright_frame(ratio=1.0):
+    """Landmarks of a user sitting straight whose face-to-shoulder ratio is `ratio`."""
+    frame = np.zeros((33, 5))
+    frame[:, 3:] = 1.0
+    frame[LEFT_SHOULDER, :2] = (0.4, 0.6)
+    frame[RIGHT_SHOULDER, :2] = (0.6, 0.6)
+    frame[LEFT_HIP, :2] = (0.42, 0.9)
+    frame[RIGHT_HIP, :2] = (0.58, 0.9)
+    face_y = 0.6 - 0.2 * ratio
+    frame[NOSE, :2] = (0.5, face_y)
+    frame[LEFT_EYE, :2] = (0.47, face_y)
+    frame[RIGHT_EYE, :2] = (0.53, face_y)
+    return frame
+
+
+def test_ratio_matches_client_formula():
+    metrics = compute_metrics(upright_frame(0.8))
+    assert metrics["ratio"] == pytest.approx(0.8)
+    assert metrics["shoulder_width"] == pytest.approx(0.2)
+    assert metrics["face_to_shoulder_distance"] == pytest.approx(0.16)
+
+
+@pytest.mark.parametrize("calibrated", [0.6, 0.9, 1.0, 1.3])
+def test_ratio_score_parity(calibrated):
+    ratios = np.concatenate([np.linspace(0.0, 1.6, 321), [np.nan, -0.5, calibrated, calibrated - 0.005]])
+    expected = [calculate_ratio_score(r, calibrated) for r in ratios]
+    assert ratio_score(ratios, calibrated).tolist() == expected
+
+
+def test_uncalibrated_ratio_score():
+    assert ratio_score(np.array([0.5, 0.979, 0.98, 1.2]), None).tolist() == [30, 30, 85, 85]
+    batch = compute_metrics_batch(np.stack([upright_frame(0.9), upright_frame(1.0)]))
+    assert batch["ratio_status"].tolist() == ["Bad Posture - Slouching!", "Good Posture"]
+
+
+@pytest.mark.parametrize("ratio, status", [
+    (1.0, "Good Posture"),
+    (0.9, "Good Posture"),    # score 80
+    (0.899, "Fair Posture"),  # score 79
+    (0.8, "Fair Posture"),    # score 60
+    (0.799, "Poor Posture"),  # score 59
+])
+def test_ratio_status_thresholds(ratio, status):
+    assert compute_metrics(upright_frame(ratio), calibrated_ratio=1.0)["ratio_status"] == status
+
+
+def test_metric_score_and_status():
+    upright = upright_frame()
+    # Left shoulder dropped: shoulder_tilt and shoulder_asym_y both over their limits
+    uneven = upright.copy()
+    uneven[LEFT_SHOULDER, 1] += 0.06
+    # Head pushed forward: neck flexed by more than 20 degrees as well
+    forward = uneven.copy()
+    forward[NOSE, 0] += 0.2
+    # Torso leaning over the hips as well
+    leaning = forward.copy()
+    leaning[[LEFT_HIP, RIGHT_HIP], 0] -= 0.2
+    batch = compute_metrics_batch(np.stack([upright, uneven, forward, leaning]))
+    assert batch["metric_score"].tolist() == [100, 75, 50, 30]
+    assert batch["metric_status"].tolist() == ["EXCELLENT", "GOOD", "FAIR", "POOR"]
+    assert batch["neck_flex"][0] == pytest.approx(0.0)
+    assert batch["torso_tilt"][0] == pytest.approx(0.0)
+
+
+def test_degenerate_shoulders_give_null_ratio():
+    frame = upright_frame()
+    frame[RIGHT_SHOULDER, :2] = frame[LEFT_SHOULDER, :2]
+    batch = compute_metrics_batch(frame, calibrated_ratio=1.0)
+    assert np.isnan(batch["ratio"][0])
+    assert batch["ratio_score"][0] == 50
+    assert metrics_batch_to_json(batch)["ratio"] == [None]
+
+
+def test_accepts_landmark_dicts():
+    frame = upright_frame(0.95)
+    dicts = [{"x": x, "y": y} for x, y in frame[:, :2]]
+    assert compute_metrics(dicts)["ratio"] == pytest.approx(0.95)
+
+
+def test_rejects_short_frames():
+    with pytest.raises(ValueError):
+        compute_metrics_batch(np.zeros((2, 17, 2)))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Tests for session recordings (pose_record.py)
+"""
+
+import json
+import os
+
+import pytest
+
+from pose_record import (FRAME_META, KIND_FRAME, KIND_INIT, KIND_RESULT, MAGIC, RECORD, SessionRecorder,
+                         load_sessions, read_records)
+
+
+def record_session(path, init, frames):
+    recorder = SessionRecorder(str(path))
+    recorder.init(init)
+    for timestamp, image, b64 in frames:
+        seq = recorder.frame(image, timestamp, base64=b64)
+        recorder.result(seq, {"type": "detection", "timestamp": timestamp})
+    recorder.close()
+    return recorder
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "session.poserec"
+    recorder = record_session(path, {"type": "init", "binary": True},
+                              [(1000, b"\xff\xd8jpeg-1", False), (1033, memoryview(b"\xff\xd8jpeg-2"), True)])
+    assert recorder.describe() == {"path": str(path), "frames": 2}
+
+    kinds = [record.kind for record in read_records(str(path))]
+    assert kinds == [KIND_INIT, KIND_FRAME, KIND_RESULT, KIND_FRAME, KIND_RESULT]
+
+    [session] = load_sessions(str(path))
+    assert session.init == {"type": "init", "binary": True}
+    assert [(f.seq, f.timestamp, f.base64, f.image) for f in session.frames] == [
+        (1, 1000, False, b"\xff\xd8jpeg-1"),
+        (2, 1033, True, b"\xff\xd8jpeg-2"),
+    ]
+    assert session.results == {1: {"type": "detection", "timestamp": 1000},
+                               2: {"type": "detection", "timestamp": 1033}}
+    assert session.frames[0].t <= session.frames[1].t
+
+
+def test_appending_adds_a_session(tmp_path):
+    path = tmp_path / "session.poserec"
+    record_session(path, {"type": "init", "n": 1}, [(1, b"a", False)])
+    record_session(path, {"type": "init", "n": 2}, [(2, b"b", False), (3, b"c", False)])
+    with open(path, "rb") as f:
+        assert f.read().count(MAGIC) == 1
+    sessions = load_sessions(str(path))
+    assert [s.init["n"] for s in sessions] == [1, 2]
+    assert [len(s.frames) for s in sessions] == [1, 2]
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = tmp_path / "session.poserec"
+    record_session(path, {"type": "init"}, [(1000, b"frame-1", False), (1033, b"frame-2", False)])
+    full = os.path.getsize(path)
+    last_result = RECORD.size + len(json.dumps({"type": "detection", "timestamp": 1033}))
+    # Cut into the last result's payload: the second frame survives without its result
+    with open(path, "r+b") as f:
+        f.truncate(full - 3)
+    [session] = load_sessions(str(path))
+    assert len(session.frames) == 2
+    assert list(session.results) == [1]
+    # Cut into the second frame's header: only the first frame and result are left
+    with open(path, "r+b") as f:
+        f.truncate(full - last_result - FRAME_META.size - len(b"frame-2") - 3)
+    [session] = load_sessions(str(path))
+    assert len(session.frames) == 1
+    assert list(session.results) == [1]
+
+
+def test_frames_before_init_get_an_empty_session(tmp_path):
+    path = tmp_path / "session.poserec"
+    recorder = SessionRecorder(str(path))
+    recorder.frame(b"frame", 5)
+    recorder.close()
+    [session] = load_sessions(str(path))
+    assert session.init == {}
+    assert session.frames[0].image == b"frame"
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"NOTAREC!")
+    with pytest.raises(ValueError):
+        list(read_records(str(path)))
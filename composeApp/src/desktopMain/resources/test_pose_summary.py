@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-session posture aggregates (pose_summary.py)
+"""
+
+import pytest
+
+from pose_summary import SessionSummary
+
+# A wall-clock time at the start of a minute (minute 28333333)
+T0 = 1_699_999_980.0
+
+
+def test_percentiles_and_mean():
+    summary = SessionSummary(threshold=60)
+    for i, score in enumerate(range(1, 101)):
+        summary.add(score, T0 + i * 0.1)
+    snapshot = summary.snapshot(now=T0 + 10)
+    assert snapshot["samples"] == 100
+    assert snapshot["mean_score"] == 50.5
+    assert (snapshot["min_score"], snapshot["max_score"]) == (1, 100)
+    assert snapshot["percentiles"] == {"p10": 10, "p25": 25, "p50": 50, "p75": 75, "p90": 90}
+    assert snapshot["below_threshold_ratio"] == 0.59
+
+
+def test_scores_are_clamped():
+    summary = SessionSummary()
+    summary.add(-20, T0)
+    summary.add(250, T0 + 1)
+    snapshot = summary.snapshot(now=T0 + 1)
+    assert (snapshot["min_score"], snapshot["max_score"]) == (0, 100)
+
+
+def test_empty_summary():
+    snapshot = SessionSummary().snapshot(now=T0)
+    assert snapshot["samples"] == 0 and snapshot["started_at"] is None
+    assert "mean_score" not in snapshot
+    assert snapshot["minutes"] == []
+
+
+def test_slouch_events_need_slouch_min_s_below_threshold():
+    summary = SessionSummary(threshold=60, slouch_min_s=3.0)
+    # Below for 0..5 s: one event, counted once 3 s have passed
+    for t in range(6):
+        summary.add(40, T0 + t)
+        assert summary.slouch_events == (1 if t >= 3 else 0)
+    summary.add(80, T0 + 6)
+    # A short dip does not count
+    summary.add(40, T0 + 7)
+    summary.add(40, T0 + 8)
+    summary.add(80, T0 + 9)
+    assert summary.slouch_events == 1
+    # A missing pose interrupts a slouch
+    summary.add(40, T0 + 10)
+    summary.add(40, T0 + 12)
+    summary.add(None, T0 + 12.5)
+    summary.add(40, T0 + 13)
+    summary.add(40, T0 + 15)
+    assert summary.slouch_events == 1
+    snapshot = summary.snapshot(now=T0 + 15)
+    assert snapshot["below_threshold_s"] == pytest.approx(6 + 2 + 2.5 + 2)
+    assert snapshot["no_pose"] == 1
+    assert snapshot["no_pose_s"] == pytest.approx(0.5)
+
+
+def test_time_is_capped_at_max_gap():
+    summary = SessionSummary(threshold=60, max_gap_s=2.0)
+    summary.add(40, T0)
+    summary.add(40, T0 + 30)
+    snapshot = summary.snapshot(now=T0 + 30)
+    assert snapshot["tracked_s"] == 2.0
+    assert snapshot["below_threshold_s"] == 2.0
+
+
+def test_minute_buckets():
+    summary = SessionSummary(threshold=60)
+    summary.add(50, T0 + 10)
+    summary.add(71, T0 + 20)
+    summary.add(None, T0 + 30)
+    summary.add(81, T0 + 70)
+    summary.add(90, T0 + 80)
+    minutes = summary.snapshot(now=T0 + 90)["minutes"]
+    first, second = int(T0 // 60) * 60000, int(T0 // 60 + 1) * 60000
+    assert [m["minute"] for m in minutes] == [first, second]
+    assert [m["samples"] for m in minutes] == [2, 2]
+    # Truncated like the app's average().toInt()
+    assert [m["average_score"] for m in minutes] == [60, 85]
+    assert [m["no_pose"] for m in minutes] == [1, 0]
+    assert [m["partial"] for m in minutes] == [False, True]
+    # Below threshold from T0 + 10 to T0 + 12 (max_gap_s)
+    assert minutes[0]["below_threshold_s"] == 2.0
+
+    since = summary.snapshot(since_ms=second, now=T0 + 90)["minutes"]
+    assert [m["minute"] for m in since] == [second]
+
+
+def test_minute_ring_keeps_latest_minutes():
+    summary = SessionSummary(minutes=2)
+    for minute in range(3):
+        summary.add(70 + minute, T0 + 60 * minute)
+    minutes = summary.snapshot(now=T0 + 180)["minutes"]
+    assert [m["average_score"] for m in minutes] == [71, 72]
+    # The session totals still cover every sample
+    assert summary.samples == 3
+
+
+def test_reset():
+    summary = SessionSummary()
+    summary.add(40, T0)
+    summary.add(None, T0 + 1)
+    summary.reset()
+    assert summary.samples == 0
+    snapshot = summary.snapshot(now=T0 + 2)
+    assert snapshot["no_pose"] == 0 and snapshot["minutes"] == []
+
+
+@pytest.mark.parametrize("kwargs", [{"kind": "score"}, {"minutes": 0}, {"threshold": -1}, {"threshold": 101}])
+def test_rejects_invalid_options(kwargs):
+    with pytest.raises(ValueError):
+        SessionSummary(**kwargs)
+
+
+@pytest.mark.parametrize("threshold, ratio", [(0, 0.0), (100, 0.5)])
+def test_threshold_bounds(threshold, ratio):
+    summary = SessionSummary(threshold=threshold)
+    summary.add(0, T0)
+    summary.add(100, T0 + 1)
+    assert summary.snapshot(now=T0 + 1)["below_threshold_ratio"] == ratio
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the frame-to-frame helpers (pose_temporal.py)
+"""
+
+import numpy as np
+import pytest
+
+import pose_temporal
+from pose_temporal import LandmarkFilter, MotionGate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(pose_temporal.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def gray_frame(level):
+    return np.full((48, 64, 3), level, dtype=np.uint8)
+
+
+def test_motion_gate_reuses_result_of_still_frame(clock):
+    gate = MotionGate(threshold=2.0)
+    assert gate.lookup(gray_frame(100), 1) is None
+    gate.store({"success": True, "timestamp": 1})
+    clock.now += 0.1
+    reused = gate.lookup(gray_frame(101), 2)
+    assert reused["reused"] is True
+    assert reused["timestamp"] == 2
+    assert reused["reuse_age_ms"] == 100
+    assert reused["motion"] == pytest.approx(1.0)
+    assert (gate.inferred, gate.reused) == (1, 1)
+
+
+def test_motion_gate_compares_with_last_inferred_frame(clock):
+    gate = MotionGate(threshold=2.0)
+    gate.lookup(gray_frame(100), 1)
+    gate.store({"success": True})
+    # Slow drift: each frame is 1 level off the previous one, but the third is 2 off the stored one
+    assert gate.lookup(gray_frame(101), 2) is not None
+    assert gate.lookup(gray_frame(102), 3) is None
+    gate.store({"success": True})
+    assert gate.lookup(gray_frame(103), 4) is not None
+
+
+def test_motion_gate_expires_after_max_reuse(clock):
+    gate = MotionGate(threshold=2.0, max_reuse_ms=500)
+    gate.lookup(gray_frame(100), 1)
+    gate.store({"success": True})
+    clock.now += 0.4
+    assert gate.lookup(gray_frame(100), 2) is not None
+    clock.now += 0.2
+    assert gate.lookup(gray_frame(100), 3) is None
+
+
+def test_motion_gate_reset_forgets_result(clock):
+    gate = MotionGate()
+    gate.lookup(gray_frame(100), 1)
+    gate.store({"success": True})
+    gate.reset()
+    assert gate.lookup(gray_frame(100), 2) is None
+
+
+def test_motion_gate_result_is_a_copy(clock):
+    gate = MotionGate()
+    gate.lookup(gray_frame(100), 1)
+    stored = {"success": True, "timestamp": 1}
+    gate.store(stored)
+    gate.lookup(gray_frame(100), 2)["success"] = False
+    assert gate.lookup(gray_frame(100), 3)["success"] is True
+    assert stored == {"success": True, "timestamp": 1}
+
+
+def landmark_array(x, y=0.5, z=0.0, visibility=0.9):
+    arr = np.zeros((33, 5), dtype=np.float32)
+    arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4] = x, y, z, visibility, 1.0
+    return arr
+
+
+def test_filter_passes_first_frame_through():
+    smoother = LandmarkFilter()
+    out = smoother.update(landmark_array(0.3, visibility=0.7), 1000)
+    assert out.dtype == np.float32 and out.shape == (33, 5)
+    np.testing.assert_allclose(out, landmark_array(0.3, visibility=0.7))
+    assert smoother.last_timestamp == 1000
+
+
+def test_filter_smooths_a_step_with_one_euro_alpha():
+    smoother = LandmarkFilter(min_cutoff=1.0, beta=0.0)
+    smoother.update(landmark_array(0.0), 1000)
+    out = smoother.update(landmark_array(1.0), 1100)
+    tau = 1.0 / (2.0 * np.pi)
+    alpha = 1.0 / (1.0 + tau / 0.1)
+    assert out[0, 0] == pytest.approx(alpha, rel=1e-6)
+    # Unfiltered columns follow the latest frame
+    assert out[0, 1] == pytest.approx(0.5) and out[0, 3] == pytest.approx(0.9)
+
+
+def test_filter_beta_reduces_lag_when_moving():
+    slow, fast = LandmarkFilter(beta=0.0), LandmarkFilter(beta=5.0)
+    for smoother in (slow, fast):
+        smoother.update(landmark_array(0.0), 1000)
+    slow_out = slow.update(landmark_array(1.0), 1033)
+    fast_out = fast.update(landmark_array(1.0), 1033)
+    assert 0.0 < slow_out[0, 0] < fast_out[0, 0] <= 1.0
+
+
+def test_filter_holds_still_landmarks():
+    smoother = LandmarkFilter()
+    for i in range(10):
+        out = smoother.update(landmark_array(0.4), 1000 + 33 * i)
+    np.testing.assert_allclose(out[:, 0], 0.4, atol=1e-6)
+    landmarks, ahead = smoother.predict(1000 + 33 * 9 + 100)
+    assert ahead == 100
+    np.testing.assert_allclose(landmarks[:, 0], 0.4, atol=1e-6)
+
+
+def test_predict_extrapolates_constant_velocity():
+    smoother = LandmarkFilter(min_cutoff=1.0, beta=1.0, max_predict_ms=250)
+    # x moves at 0.5 units per second
+    for i in range(60):
+        out = smoother.update(landmark_array(0.5 * i / 30.0), 1000 + i * 1000.0 / 30.0)
+    last = smoother.last_timestamp
+    landmarks, ahead = smoother.predict(last + 100)
+    assert ahead == pytest.approx(100)
+    assert landmarks[0, 0] - out[0, 0] == pytest.approx(0.05, rel=0.05)
+    # Capped at max_predict_ms, and never backwards in time
+    capped, ahead = smoother.predict(last + 1000)
+    assert ahead == 250
+    assert capped[0, 0] == pytest.approx(smoother.predict(last + 250)[0][0, 0])
+    past, ahead = smoother.predict(last - 50)
+    assert ahead == 0
+    np.testing.assert_array_equal(past, out)
+
+
+def test_predict_without_timestamp_uses_clock_offset(clock):
+    smoother = LandmarkFilter(max_predict_ms=250)
+    assert smoother.predict() == (None, 0.0)
+    smoother.update(landmark_array(0.2), 5000)
+    clock.now += 0.08
+    assert smoother.predict()[1] == pytest.approx(80)
+
+
+def test_filter_reset():
+    smoother = LandmarkFilter()
+    smoother.update(landmark_array(0.2), 1000)
+    smoother.reset()
+    assert smoother.predict(1000) == (None, 0.0)
+    np.testing.assert_allclose(smoother.update(landmark_array(0.8), 2000)[:, 0], 0.8)
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Tests for the WebSocket pose server (ws_pose_server.py)
+
+None of them needs MediaPipe: where a pose graph is needed, FakeGraph stands in.
+"""
+
+import asyncio
+import json
+import os
+import signal
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import websockets
+
+import ws_pose_server
+from ws_pose_server import (CODEC_JPEG, CODEC_PNG, FRAME_HEADER, MSG_DETECT, GraphPool, LatestFrameSlot,
+                            PendingFrame, PoseSession, RateController, handle_binary, parse_calibration_options, parse_frame_header,
+                            parse_init_options)
+
+
+class FakeGraph:
+    """Stands in for mp_solutions.pose.Pose: finds no pose, counts resets and closes."""
+
+    def __init__(self, **config):
+        self.resets = 0
+        self.closed = False
+
+    def process(self, frame):
+        return SimpleNamespace(pose_landmarks=None)
+
+    def reset(self):
+        self.resets += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_mediapipe(monkeypatch):
+    monkeypatch.setattr(ws_pose_server, "MEDIAPIPE_AVAILABLE", True)
+    monkeypatch.setattr(ws_pose_server, "mp_solutions", SimpleNamespace(pose=SimpleNamespace(Pose=FakeGraph)),
+                        raising=False)
+
+
+class FakeSocket:
+    """Collects the JSON replies a handler sends."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, text):
+        self.sent.append(json.loads(text))
+
+
+def binary_frame(payload=b"\xff\xd8jpeg", msg_type=MSG_DETECT, codec=CODEC_JPEG, seq=7, ts=123456789012):
+    return FRAME_HEADER.pack(msg_type, codec, seq, ts) + payload
+
+
+class RecordingSlot:
+    def __init__(self):
+        self.frames = []
+
+    def put(self, frame):
+        self.frames.append(frame)
+
+
+def send_binary(message, binary=True):
+    ws, slot = FakeSocket(), RecordingSlot()
+    session = SimpleNamespace(binary=binary, recorder=None)
+    asyncio.run(handle_binary(ws, session, slot, message))
+    return ws.sent, slot.frames
+
+
+def test_frame_header_layout():
+    assert FRAME_HEADER.size == 14
+    message = binary_frame(b"image-bytes", codec=CODEC_PNG, seq=2**32 - 1, ts=-5)
+    msg_type, codec, seq, ts, payload = parse_frame_header(message)
+    assert (msg_type, codec, seq, ts) == (MSG_DETECT, CODEC_PNG, 2**32 - 1, -5)
+    # The payload is a view into the message, not a copy
+    assert isinstance(payload, memoryview) and bytes(payload) == b"image-bytes"
+
+
+def test_frame_header_with_empty_payload():
+    assert bytes(parse_frame_header(binary_frame(b""))[4]) == b""
+
+
+@pytest.mark.parametrize("length", [0, 1, FRAME_HEADER.size - 1])
+def test_short_frame_header(length):
+    assert parse_frame_header(binary_frame()[:length]) is None
+    sent, frames = send_binary(binary_frame()[:length])
+    assert sent == [{"type": "error", "message": "short_frame"}] and frames == []
+
+
+def test_binary_frame_is_queued():
+    sent, [frame] = send_binary(binary_frame(b"jpeg-bytes", seq=9, ts=1000))
+    assert sent == []
+    assert (frame.seq, frame.timestamp, frame.b64, bytes(frame.image)) == (9, 1000, False, b"jpeg-bytes")
+
+
+def test_binary_frame_needs_negotiation():
+    sent, frames = send_binary(binary_frame(), binary=False)
+    assert sent == [{"type": "error", "message": "binary_not_negotiated"}] and frames == []
+
+
+def test_garbled_message_type():
+    sent, frames = send_binary(binary_frame(msg_type=0xAB))
+    assert sent == [{"type": "error", "message": "unknown_binary_type:171"}] and frames == []
+
+
+@pytest.mark.parametrize("codec", [0, 3, 255])
+def test_unsupported_codec(codec):
+    sent, frames = send_binary(binary_frame(codec=codec, seq=4, ts=50))
+    assert sent == [{"type": "detection", "success": False, "timestamp": 50, "seq": 4,
+                     "message": f"unsupported_codec:{codec}"}]
+    assert frames == []
+
+
+def pending(seq):
+    return PendingFrame(b"", False, seq * 33, seq)
+
+
+def test_slot_keeps_only_the_latest_frame():
+    async def run():
+        slot = LatestFrameSlot()
+        for seq in range(1, 5):
+            slot.put(pending(seq))
+        return slot, await slot.get()
+
+    slot, frame = asyncio.run(run())
+    assert frame.seq == 4
+    assert (slot.received, slot.dropped) == (4, 3)
+
+
+def test_slot_counts_no_drop_when_frames_are_taken_in_time():
+    async def run():
+        slot = LatestFrameSlot()
+        seqs = []
+        for seq in range(1, 4):
+            slot.put(pending(seq))
+            seqs.append((await slot.get()).seq)
+        return slot, seqs
+
+    slot, seqs = asyncio.run(run())
+    assert seqs == [1, 2, 3]
+    assert (slot.received, slot.dropped) == (3, 0)
+
+
+def test_slot_get_waits_for_a_frame():
+    async def run():
+        slot = LatestFrameSlot()
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        slot.put(pending(1))
+        return await asyncio.wait_for(waiter, 1.0)
+
+    assert asyncio.run(run()).seq == 1
+
+
+def test_slot_close_wakes_the_reader():
+    async def run():
+        slot = LatestFrameSlot()
+        waiter = asyncio.ensure_future(slot.get())
+        await asyncio.sleep(0)
+        slot.close()
+        return await asyncio.wait_for(waiter, 1.0)
+
+    assert asyncio.run(run()) is None
+
+
+def test_slot_hands_out_a_waiting_frame_before_closing():
+    async def run():
+        slot = LatestFrameSlot()
+        slot.put(pending(1))
+        slot.close()
+        return await slot.get(), await slot.get()
+
+    first, second = asyncio.run(run())
+    assert first.seq == 1 and second is None
+
+
+def controller(max_fps=30.0, max_side=1280, jpeg_quality=80):
+    rate = RateController(max_fps, max_side, jpeg_quality)
+    rate.PERIOD_S = 0.0
+    return rate
+
+
+def period(rate, service_ms, queue_ms=0.0, dropped=0):
+    """Feed one control period's worth of frames; returns the hint it produced, if any."""
+    hint = None
+    for _ in range(rate.MIN_SAMPLES):
+        hint = rate.observe(service_ms, queue_ms, dropped) or hint
+    return hint
+
+
+def test_waits_for_enough_samples():
+    rate = controller()
+    assert rate.observe(500.0, 0.0, 1) is None
+    assert rate.observe(500.0, 0.0, 1) is None
+    assert rate.observe(500.0, 0.0, 1)["reason"] == "congested"
+
+
+def test_congestion_decreases_fps_multiplicatively():
+    rate = controller()
+    hint = period(rate, service_ms=40.0)
+    assert hint["type"] == "rate_hint"
+    assert hint["fps"] == pytest.approx(21.0)
+    assert hint["interval_ms"] == 48
+    assert (hint["max_side"], hint["jpeg_quality"]) == (1280, 80)
+
+
+def test_drops_and_queueing_count_as_congestion():
+    assert period(controller(), service_ms=5.0, dropped=1)["reason"] == "congested"
+    assert period(controller(), service_ms=5.0, queue_ms=20.0)["reason"] == "congested"
+
+
+def test_decrease_goes_fps_then_quality_then_side_down_to_floors():
+    rate = controller()
+    hints = []
+    while True:
+        hint = period(rate, service_ms=1000.0, dropped=1)
+        if hint is None:
+            break
+        hints.append(hint)
+    fps = [h["fps"] for h in hints]
+    assert fps == sorted(fps, reverse=True) and fps[-1] == RateController.MIN_FPS
+    qualities = [h["jpeg_quality"] for h in hints if h["fps"] == RateController.MIN_FPS]
+    assert qualities[:4] == [80, 70, 60, 50]
+    sides = [h["max_side"] for h in hints if h["jpeg_quality"] == RateController.MIN_QUALITY]
+    assert sides == [1280, 960, 720, 540, 405, 320]
+    # At every floor a congested period changes nothing, so no hint is sent
+    assert (rate.fps, rate.jpeg_quality, rate.max_side) == (2.0, 50, 320)
+
+
+def test_headroom_restores_side_then_quality_then_fps():
+    rate = controller(max_fps=4.0)
+    rate.fps, rate.jpeg_quality, rate.max_side = 2.0, 60, 720
+    hints = []
+    while True:
+        hint = period(rate, service_ms=1.0)
+        if hint is None:
+            break
+        assert hint["reason"] == "headroom"
+        hints.append((hint["fps"], hint["max_side"], hint["jpeg_quality"]))
+    assert hints == [(2.0, 960, 60), (2.0, 1280, 60), (2.0, 1280, 70), (2.0, 1280, 80),
+                     (3.0, 1280, 80), (4.0, 1280, 80)]
+
+
+def test_steady_load_sends_nothing():
+    rate = controller()
+    # Service between 60% and 90% of the 33 ms interval: neither congested nor idle
+    assert period(rate, service_ms=25.0) is None
+    assert rate.fps == 30.0
+
+
+def test_limits_have_floors():
+    rate = RateController(0.5, 100, 10)
+    assert (rate.max_fps, rate.side_limit, rate.quality_limit) == (RateController.MIN_FPS, RateController.MIN_SIDE,
+                                                                   RateController.MIN_QUALITY)
+
+
+def test_init_hint():
+    hint = controller().hint("init")
+    assert hint == {"type": "rate_hint", "interval_ms": 33, "fps": 30.0, "max_side": 1280, "jpeg_quality": 80,
+                    "reason": "init", "service_ms": 0.0, "queue_ms": 0.0, "dropped": 0}
+
+
+@pytest.mark.parametrize("name", ["max_fps", "max_side", "jpeg_quality"])
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), 0, -5, "fast"])
+def test_init_rejects_unusable_rate_limits(name, value):
+    with pytest.raises((ValueError, TypeError)):
+        parse_init_options({name: value})
+
+
+@pytest.mark.parametrize("value", [float("nan"), 0, -480, "wide"])
+def test_init_rejects_unusable_roi_max_side(value):
+    with pytest.raises((ValueError, TypeError)):
+        parse_init_options({"roi": True, "roi_max_side": value})
+
+
+@pytest.mark.parametrize("name", ["motion_threshold", "max_reuse_ms"])
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), 0, -2, "still"])
+def test_init_rejects_unusable_motion_gate_options(name, value):
+    with pytest.raises((ValueError, TypeError)):
+        parse_init_options({"motion_gate": True, name: value})
+
+
+@pytest.mark.parametrize("options", [{"min_cutoff": 0}, {"min_cutoff": -1}, {"min_cutoff": "inf"},
+                                     {"beta": -0.5}, {"beta": float("nan")}, {"beta": "fast"}])
+def test_init_rejects_unusable_filter_options(options):
+    with pytest.raises((ValueError, TypeError)):
+        parse_init_options({"filter": True, **options})
+
+
+def test_init_allows_a_filter_without_speed_adaptation():
+    assert parse_init_options({"filter": True, "beta": 0})["beta"] == 0.0
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), -640, "small"])
+def test_init_rejects_unusable_decode_side(value):
+    with pytest.raises((ValueError, TypeError)):
+        parse_init_options({"decode_side": value})
+
+
+def test_init_decode_side_zero_is_full_size():
+    assert parse_init_options({"decode_side": 0})["decode_side"] == 0
+
+
+def test_init_rate_limit_defaults():
+    options = parse_init_options({"jpeg_quality": 120})
+    assert (options["max_fps"], options["max_side"], options["jpeg_quality"]) == (30.0, 1280, 100)
+
+
+@pytest.mark.parametrize("data", [{"min_frames": 0}, {"outlier_z": 0}, {"outlier_z": "nan"}, {"images": []},
+                                  {"images": ["ok", 5]}])
+def test_calibrate_rejects_invalid_options(data):
+    with pytest.raises((ValueError, TypeError)):
+        parse_calibration_options(data)
+
+
+def test_calibrate_defaults():
+    options = parse_calibration_options({})
+    assert options["images"] is None
+    assert (options["duration_ms"], options["outlier_z"], options["min_frames"], options["max_frames"]) == (
+        3000.0, 3.5, 5, 300)
+
+
+POSE_FRAME = [[[0.5, 0.5, 0.0, 1.0, 1.0]] * 33]
+
+
+def test_dead_worker_is_replaced_and_session_inits_again(fake_mediapipe, monkeypatch):
+    # Workers are forked, so they inherit the fake graph
+    pool = ws_pose_server.PosePool(1)
+    monkeypatch.setattr(ws_pose_server, "POOL", pool)
+
+    async def run():
+        replies = []
+        async with websockets.serve(ws_pose_server.handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+                async def request(message):
+                    await ws.send(json.dumps(message))
+                    replies.append(json.loads(await asyncio.wait_for(ws.recv(), 10)))
+
+                await request({"type": "init"})
+                pid = pool.executor(0).submit(os.getpid).result()
+                os.kill(pid, signal.SIGKILL)
+                await request({"type": "score_batch", "frames": POSE_FRAME})
+                await request({"type": "ping"})
+                await request({"type": "init"})
+                await request({"type": "score_batch", "frames": POSE_FRAME})
+        return replies, pid
+
+    try:
+        replies, pid = asyncio.run(run())
+        assert pool.executor(0).submit(os.getpid).result() != pid
+    finally:
+        pool.shutdown()
+    init, restarted, pong, reinit, scored = replies
+    assert init["type"] == "init_response" and init["success"] is True
+    assert restarted == {"type": "error", "message": "worker_restarted"}
+    assert pong["initialized"] is False
+    assert reinit["type"] == "init_response" and reinit["success"] is True
+    assert scored["type"] == "score_batch_response" and scored["success"] is True
+    assert pool.restarts == 1
+
+
+def exchange(*messages):
+    """Replies of a fresh in-process connection to each message, one reply per message."""
+    async def run():
+        async with websockets.serve(ws_pose_server.handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            async with websockets.connect(f"ws://127.0.0.1:{port}") as ws:
+                replies = []
+                for message in messages:
+                    await ws.send(json.dumps(message))
+                    replies.append(json.loads(await asyncio.wait_for(ws.recv(), 10)))
+                return replies
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("ratio", ["abc", "nan", 0, -1.5, [1]])
+def test_score_batch_rejects_invalid_calibrated_ratio(ratio):
+    invalid, scored = exchange({"type": "score_batch", "frames": POSE_FRAME, "calibrated_ratio": ratio},
+                               {"type": "score_batch", "frames": POSE_FRAME, "calibrated_ratio": 0.8})
+    assert invalid == {"type": "score_batch_response", "success": False, "message": "invalid_calibrated_ratio"}
+    # The connection stays open
+    assert scored["type"] == "score_batch_response" and scored["success"] is True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ws_pose_server.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def test_graph_pool_reuses_a_returned_graph_after_reset(fake_mediapipe, clock):
+    pool = GraphPool(max_idle=2)
+    graph = pool.checkout()
+    assert isinstance(graph, FakeGraph) and graph.resets == 0
+    pool.checkin(graph)
+    assert pool.checkout() is graph
+    assert graph.resets == 1 and not graph.closed
+    assert pool.snapshot() == {"idle": 0, "max_idle": 2, "idle_timeout_s": 300.0, "created": 1, "reused": 1,
+                               "evicted": 0}
+
+
+def test_graph_pool_hands_out_the_most_recent_graph(fake_mediapipe, clock):
+    pool = GraphPool(max_idle=2)
+    first, second = pool.checkout(), pool.checkout()
+    pool.checkin(first)
+    clock.now += 1
+    pool.checkin(second)
+    assert pool.checkout() is second
+    assert pool.checkout() is first
+    assert pool.checkout() not in (first, second)
+    assert pool.created == 3
+
+
+def test_graph_pool_closes_graphs_beyond_max_idle(fake_mediapipe, clock):
+    pool = GraphPool(max_idle=1)
+    first, second = pool.checkout(), pool.checkout()
+    pool.checkin(first)
+    pool.checkin(second)
+    assert not first.closed and second.closed
+    assert pool.snapshot()["idle"] == 1 and pool.evicted == 1
+
+
+def test_graph_pool_expires_idle_graphs(fake_mediapipe, clock):
+    pool = GraphPool(max_idle=2, idle_timeout_s=10.0)
+    old, recent = pool.checkout(), pool.checkout()
+    pool.checkin(old)
+    clock.now += 6
+    pool.checkin(recent)
+    clock.now += 6
+    pool.evict_idle()
+    assert old.closed and not recent.closed
+    clock.now += 6
+    # Expired graphs are not handed out: checkout builds a new one
+    graph = pool.checkout()
+    assert recent.closed and graph not in (old, recent)
+    assert (pool.created, pool.reused, pool.evicted) == (3, 0, 2)
+
+
+def test_graph_pool_discards_a_graph_that_cannot_reset(fake_mediapipe, clock):
+    pool = GraphPool(max_idle=2)
+    good, broken = pool.checkout(), pool.checkout()
+    broken.reset = lambda: 1 / 0
+    pool.checkin(good)
+    pool.checkin(broken)
+    assert pool.checkout() is good
+    assert broken.closed and pool.evicted == 1
+
+
+def test_graph_pool_prefill_and_close(fake_mediapipe, clock):
+    pool = GraphPool(max_idle=2)
+    pool.prefill(5)
+    assert pool.snapshot()["idle"] == 2 and pool.created == 2
+    graphs = [graph for _, graph in pool._idle]
+    pool.close()
+    assert all(graph.closed for graph in graphs) and pool.snapshot()["idle"] == 0
+
+
+def test_reconnecting_session_gets_the_warm_graph(fake_mediapipe, clock, monkeypatch):
+    monkeypatch.setattr(ws_pose_server, "GRAPHS", GraphPool(max_idle=2))
+    first = PoseSession()
+    assert first.init_pose(parse_init_options({}))
+    graph = first.pose
+    first.close()
+    second = PoseSession()
+    assert second.init_pose(parse_init_options({}))
+    assert second.pose is graph and graph.resets == 1
+    # A re-init on the same connection also starts from a reset graph
+    assert second.init_pose(parse_init_options({}))
+    assert second.pose is graph and graph.resets == 2
+    assert ws_pose_server.GRAPHS.snapshot()["created"] == 1
+
+
+@pytest.mark.parametrize("path", ["/etc/cron.d/job", "../escape.poserec", "{dir}/../escape.poserec",
+                                  "{dir}/sub/session.poserec", "{dir}/..", ["session.poserec"]])
+def test_record_path_must_be_in_the_record_dir(tmp_path, monkeypatch, path):
+    record_dir = tmp_path / "recordings"
+    record_dir.mkdir()
+    monkeypatch.setattr(ws_pose_server, "RECORD_DIR", str(record_dir))
+    path = path.format(dir=record_dir) if isinstance(path, str) else path
+    refused, started, stopped = exchange({"type": "record", "path": path},
+                                         {"type": "record", "path": "session.poserec"},
+                                         {"type": "record", "enabled": False})
+    assert refused["type"] == "record_response" and refused["success"] is False
+    assert not (tmp_path / "escape.poserec").exists()
+    assert started["success"] is True and started["path"] == str(record_dir.resolve() / "session.poserec")
+    assert stopped["recording"] is False
+
+
+class PosedGraph(FakeGraph):
+    """A FakeGraph that finds the same pose in every frame."""
+
+    def __init__(self, **config):
+        super().__init__(**config)
+        self.calls = 0
+
+    def process(self, frame):
+        self.calls += 1
+        landmark = SimpleNamespace(x=0.5, y=0.5, z=0.0, visibility=1.0, presence=1.0)
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=[landmark] * 33))
+
+
+def test_motion_gate_is_bypassed_while_calibrating(fake_mediapipe, monkeypatch):
+    monkeypatch.setattr(ws_pose_server, "GRAPHS", GraphPool(max_idle=0))
+    monkeypatch.setattr(ws_pose_server.mp_solutions.pose, "Pose", PosedGraph)
+    session = PoseSession()
+    assert session.init_pose(parse_init_options({"motion_gate": True}))
+    still = np.full((48, 64, 3), 128, dtype=np.uint8)
+    session.detect_rgb(still, 1)
+    assert session.detect_rgb(still, 2).get("reused") is True
+
+    session.set_collect_landmarks(True)
+    results = [session.detect_rgb(still, ts) for ts in (3, 4, 5)]
+    assert all("_landmarks" in result and "reused" not in result for result in results)
+    assert session.pose.calls == 4
+
+    session.set_collect_landmarks(False)
+    assert session.detect_rgb(still, 6).get("reused") is True
@@ -4,29 +4,115 @@ Local WebSocket Pose Server (MediaPipe) for Desktop KMP
 
 Protocol (JSON over WebSocket):
 - Client -> Server:
-  {"type":"init"}
+  {"type":"init","binary":<bool, optional>,
+   "landmark_format":"json"|"float32"|"int16"|"none" (optional, default json),
+   "landmarks":["nose","left_ear",...] or [0,7,...] (optional subset),
+   "metrics":<bool, optional>,"calibrated_ratio":<float, optional>,
+   "roi":<bool, optional>,"roi_max_side":<px, optional, default 480>,
+   "motion_gate":<bool, optional>,"motion_threshold":<gray levels, default 2.0>,
+   "max_reuse_ms":<ms, default 1000>,
+   "filter":<bool, optional>,"min_cutoff":<Hz, default 1.0>,"beta":<default 0.5>,
+   "timing":<bool, optional>,"decode_side":<px, default 640, 0 = full size>,
+   "rate_hints":<bool, optional>,"max_fps":<default 30>,"max_side":<px, default 1280>,
+   "jpeg_quality":<default 80>,
+   "summary":<bool, optional>,"summary_score":"ratio_score"|"metric_score" (default ratio_score),
+   "summary_threshold":<default 60>,"slouch_min_s":<s, default 3>}
   {"type":"detect","image":"<base64 image>","ts":<ms>}
+  {"type":"predict","ts":<ms, optional>}
+  {"type":"score_batch","frames":[[{x,y,...} x33], ...],"calibrated_ratio":<float, optional>}
   {"type":"ping"}
+  {"type":"stats","reset":<bool, optional>}
+  {"type":"profile","frames":<n, default 30>}
+  {"type":"record","enabled":<bool, default true>,"path":"<file, optional>"}
+  {"type":"capture_start","source":<device index | "video file">,"max_fps":<optional>,
+   "width":<px, optional>,"height":<px, optional>,"repeat":<bool, files>,"realtime":<bool, files, default true>}
+  {"type":"capture_stop"}
+  {"type":"session_summary","since":<ms, optional>,"reset":<bool, optional>}
+  {"type":"calibrate","images":["<base64 image>", ...] (optional),"duration_ms":<default 3000>,
+   "outlier_z":<default 3.5>,"min_frames":<default 5>,"max_frames":<default 300>,"apply":<bool, optional>}
   {"type":"close"}
 
 - Server -> Client:
-  {"type":"init_response","success":true}
-  {"type":"detection","success":true,"landmarks":[{x,y,z,visibility,presence}],"timestamp":<ms>}
-  {"type":"pong","alive":true,"mediapipe_available":true,"initialized":<bool>}
+  {"type":"init_response","success":true,"binary":<bool>}
+  {"type":"detection","success":true,"landmarks":[{x,y,z,visibility,presence}],"timestamp":<ms>,
+   "queue_ms":<float>,"dropped":<n>}
+  {"type":"prediction","success":true,"timestamp":<ms>,"predicted_ms":<float>,"landmarks":[...]}
+  {"type":"score_batch_response","success":true,"count":<n>,"metrics":{<name>:[...]}}
+  {"type":"pong","alive":true,"mediapipe_available":true,"initialized":<bool>,
+   "frames_received":<n>,"frames_dropped":<n>}
+  {"type":"stats_response","session":{...},"server":{...},"graph_pool":{...}}
+  {"type":"profile_response","success":true,"frames":<n>,"path":"<.prof file>"}
+  {"type":"record_response","success":true,"recording":<bool>,"path":"<file>","frames":<n>}
+  {"type":"capture_response","success":true,"capturing":<bool>,"source":...,"width":<px>,"height":<px>,"fps":<float>}
+  {"type":"capture_ended","source":...,"frames_read":<n>,"frames_delivered":<n>}
+  {"type":"session_summary_response","success":true,"summary":{"samples":<n>,"mean_score":<float>,
+   "percentiles":{"p10":...,"p90":...},"below_threshold_s":<s>,"slouch_events":<n>,
+   "minutes":[{"minute":<epoch ms>,"samples":<n>,"average_score":<n>,...,"partial":<bool>}],...}}
+  {"type":"calibrate_response","success":true,"calibrated_ratio":<float>,"stable":<bool>,"spread":<float>,
+   "frames":<n>,"inliers":<n>,"rejected":{"low_visibility":<n>,"outlier":<n>,"no_pose":<n>,...},
+   "baseline":{"ratio":...,"torso_tilt":...,"neck_flex":...,...},"applied":<bool>}
+  {"type":"rate_hint","interval_ms":<ms>,"fps":<float>,"max_side":<px>,"jpeg_quality":<n>,
+   "reason":"init"|"congested"|"headroom","service_ms":<float>,"queue_ms":<float>,"dropped":<n>}
   {"type":"error","message":"..."}
+
+Binary frames (only after init with "binary":true):
+- Client -> Server: a binary WebSocket message made of a 14 byte little-endian
+  header followed by the raw encoded image bytes (no base64, no JSON):
+    uint8  message type  (1 = detect)
+    uint8  codec         (1 = jpeg, 2 = png)
+    uint32 sequence number
+    int64  timestamp in ms
+- Server -> Client: the usual JSON "detection" reply, with "seq" echoed back.
+
+Each option and command is described where it is implemented:
+- latest-frame-wins ingestion ("dropped"): LatestFrameSlot
+- per-session inference thread: PoseSession
+- worker processes (POSE_WS_WORKERS): PosePool
+- landmark formats: pose_landmarks.py
+- metrics: pose_metrics.py
+- ROI crops: RoiTracker
+- motion gate: pose_temporal.py
+- filter and predict: StreamFilter, pose_temporal.py
+- timing, stats and profile: pose_stats.py
+- frame decoding (decode_side): pose_image.py
+- graph pooling (POSE_WS_GRAPH_*): GraphPool
+- record (POSE_WS_RECORD_DIR): open_recorder, pose_record.py
+- rate hints: RateController
+- capture_start: pose_capture.py
+- session_summary: pose_summary.py
+- calibrate: pose_calibration.py
 """
 
 import asyncio
 import base64
+import itertools
 import json
 import os
+import struct
 import sys
+import tempfile
+import threading
+import time
 import traceback
-from typing import Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
 
 import numpy as np
 import cv2
 
+from pose_calibration import (DEFAULT_MAX_FRAMES, DEFAULT_MIN_FRAMES, DEFAULT_OUTLIER_Z, CalibrationWindow,
+                              check_calibration_options, robust_baseline)
+from pose_capture import FrameCapture
+from pose_image import DEFAULT_DECODE_SIDE, FrameDecoder
+from pose_landmarks import LANDMARK_FORMATS, NUM_LANDMARKS, encode_landmarks, landmarks_to_array, resolve_subset
+from pose_metrics import compute_metrics, compute_metrics_batch, metrics_batch_to_json
+from pose_record import SessionRecorder
+from pose_stats import PipelineStats, ProfileCapture, StageTimer, timing_block
+from pose_summary import DEFAULT_SLOUCH_MIN_S, DEFAULT_THRESHOLD, SCORE_KINDS, SessionSummary, posture_score
+from pose_temporal import LandmarkFilter, MotionGate
+
 try:
     import mediapipe as mp
     from mediapipe import solutions as mp_solutions
@@ -43,24 +129,264 @@ except Exception as e:
     raise
 
 
+# Binary frame header: message type, codec, sequence number, timestamp (ms)
+FRAME_HEADER = struct.Struct("<BBIq")
+MSG_DETECT = 1
+CODEC_JPEG = 1
+CODEC_PNG = 2
+SUPPORTED_CODECS = (CODEC_JPEG, CODEC_PNG)
+
+
+def parse_frame_header(message):
+    """Split a binary message into (msg_type, codec, seq, ts, payload) without copying the image bytes."""
+    if len(message) < FRAME_HEADER.size:
+        return None
+    view = memoryview(message)
+    msg_type, codec, seq, ts = FRAME_HEADER.unpack_from(view)
+    return msg_type, codec, seq, ts, view[FRAME_HEADER.size:]
+
+
+class RoiTracker:
+    """Crops a padded box around the last pose and downscales it before inference.
+
+    The box only moves when the pose gets close to its edges, so the pose graph sees a
+    stable image between frames. Landmarks found in the crop are mapped back to
+    full-frame normalized coordinates with to_frame(); replies that came from a crop carry
+    "roi":true, and a lost pose falls back to the full frame.
+    """
+
+    def __init__(self, max_side: int = 480, padding: float = 0.25, min_visibility: float = 0.3):
+        self.max_side = max_side
+        self.padding = padding
+        self.min_visibility = min_visibility
+        # Normalized (x0, y0, x1, y1) in full-frame coordinates, None = use the full frame
+        self.box: Optional[tuple] = None
+
+    def reset(self):
+        self.box = None
+
+    def prepare(self, frame: np.ndarray):
+        """Return (image to run inference on, pixel box (x0, y0, x1, y1) it was cut from)."""
+        h, w = frame.shape[:2]
+        if self.box is None:
+            x0, y0, x1, y1 = 0, 0, w, h
+        else:
+            bx0, by0, bx1, by1 = self.box
+            x0, y0 = int(bx0 * w), int(by0 * h)
+            x1, y1 = max(x0 + 1, int(np.ceil(bx1 * w))), max(y0 + 1, int(np.ceil(by1 * h)))
+        image = frame[y0:y1, x0:x1]
+        scale = self.max_side / max(x1 - x0, y1 - y0)
+        if scale < 1.0:
+            size = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        return image, (x0, y0, x1, y1)
+
+    @staticmethod
+    def to_frame(landmarks: np.ndarray, pixel_box: tuple, frame_shape) -> np.ndarray:
+        """Map crop-normalized landmarks to full-frame normalized coordinates (in place)."""
+        h, w = frame_shape[:2]
+        x0, y0, x1, y1 = pixel_box
+        crop_w, crop_h = x1 - x0, y1 - y0
+        landmarks[:, 0] = (landmarks[:, 0] * crop_w + x0) / w
+        landmarks[:, 1] = (landmarks[:, 1] * crop_h + y0) / h
+        # z shares the scale of x
+        landmarks[:, 2] *= crop_w / w
+        return landmarks
+
+    def update(self, landmarks: np.ndarray):
+        """Track the pose in full-frame normalized landmarks."""
+        visible = landmarks[landmarks[:, 3] >= self.min_visibility, :2]
+        if len(visible) < 4:
+            self.box = None
+            return
+        lx0, ly0 = visible.min(axis=0)
+        lx1, ly1 = visible.max(axis=0)
+        pad_x = (lx1 - lx0) * self.padding
+        pad_y = (ly1 - ly0) * self.padding
+        if self.box is not None:
+            bx0, by0, bx1, by1 = self.box
+            # Keep the current box while the pose stays clear of its edges
+            if (lx0 - pad_x / 2 >= bx0 and ly0 - pad_y / 2 >= by0
+                    and lx1 + pad_x / 2 <= bx1 and ly1 + pad_y / 2 <= by1):
+                return
+        box = (max(0.0, float(lx0 - pad_x)), max(0.0, float(ly0 - pad_y)),
+               min(1.0, float(lx1 + pad_x)), min(1.0, float(ly1 + pad_y)))
+        # Not worth cropping when the pose fills most of the frame
+        if (box[2] - box[0]) * (box[3] - box[1]) > 0.8:
+            self.box = None
+        else:
+            self.box = box
+
+
+# Construction settings shared by every pose graph, so any pooled graph fits any session
+POSE_GRAPH_CONFIG = {
+    "min_detection_confidence": 0.5,
+    "min_tracking_confidence": 0.5,
+    "model_complexity": 1,
+    "smooth_landmarks": True,
+    "enable_segmentation": False,
+}
+
+
+def _close_graph(graph):
+    try:
+        graph.close()
+    except Exception:
+        pass
+
+
+class GraphPool:
+    """Warm pose graphs shared by the sessions of this process.
+
+    Closed sessions check their graph back in instead of closing it; checkout hands out the most
+    recently returned one after resetting its tracking state, or builds a new graph, so a
+    reconnecting client skips graph construction. At most max_idle graphs are kept, each for
+    at most idle_timeout_s. "stats" reports the pool under "graph_pool".
+    """
+
+    def __init__(self, max_idle: int = 2, idle_timeout_s: float = 300.0):
+        self.max_idle = max_idle
+        self.idle_timeout_s = idle_timeout_s
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self._idle = deque()  # (returned_at, graph), most recent last
+        self._lock = threading.Lock()
+
+    def checkout(self):
+        """A graph with fresh tracking state; raises if a new one cannot be built."""
+        while True:
+            with self._lock:
+                expired = self._expire(time.monotonic())
+                graph = self._idle.pop()[1] if self._idle else None
+            self._close_all(expired)
+            if graph is None:
+                break
+            try:
+                # Restarts the graph run: drops the tracked ROI and landmark smoothing state
+                graph.reset()
+                self.reused += 1
+                return graph
+            except Exception as e:
+                print(f"Discarding pooled pose graph: {e}", file=sys.stderr)
+                self._close_all([graph])
+        graph = mp_solutions.pose.Pose(**POSE_GRAPH_CONFIG)
+        self.created += 1
+        return graph
+
+    def checkin(self, graph):
+        """Return a graph to the pool, closing it when the pool is full."""
+        with self._lock:
+            expired = self._expire(time.monotonic())
+            if len(self._idle) < self.max_idle:
+                self._idle.append((time.monotonic(), graph))
+                graph = None
+        if graph is not None:
+            expired.append(graph)
+        self._close_all(expired)
+
+    def prefill(self, count: int):
+        """Build graphs ahead of the first client (up to max_idle)."""
+        graphs = []
+        for _ in range(min(count, self.max_idle)):
+            graphs.append(mp_solutions.pose.Pose(**POSE_GRAPH_CONFIG))
+            self.created += 1
+        for graph in graphs:
+            self.checkin(graph)
+
+    def evict_idle(self):
+        """Close graphs idle for longer than idle_timeout_s."""
+        with self._lock:
+            expired = self._expire(time.monotonic())
+        self._close_all(expired)
+
+    def snapshot(self) -> dict:
+        return {"idle": len(self._idle), "max_idle": self.max_idle, "idle_timeout_s": self.idle_timeout_s,
+                "created": self.created, "reused": self.reused, "evicted": self.evicted}
+
+    def close(self):
+        with self._lock:
+            graphs = [graph for _, graph in self._idle]
+            self._idle.clear()
+        for graph in graphs:
+            _close_graph(graph)
+
+    def _expire(self, now: float) -> list:
+        expired = []
+        while self._idle and now - self._idle[0][0] > self.idle_timeout_s:
+            expired.append(self._idle.popleft()[1])
+        return expired
+
+    def _close_all(self, graphs: list):
+        self.evicted += len(graphs)
+        for graph in graphs:
+            _close_graph(graph)
+
+
+# Per process: worker processes each get their own pool. POSE_WS_GRAPH_POOL=0 disables
+# pooling; POSE_WS_GRAPH_PREWARM graphs (default 1) are built at startup
+GRAPHS = GraphPool(int(os.environ.get("POSE_WS_GRAPH_POOL", "2")),
+                   float(os.environ.get("POSE_WS_GRAPH_IDLE_S", "300")))
+
+
 class PoseSession:
+    """One stream's pose graph and per-frame options.
+
+    Runs on the connection's worker thread, so pings and other connections are served
+    while a frame is being processed, or inside a PosePool worker process.
+    """
+
     def __init__(self):
         self.pose: Optional[object] = None
         self.initialized: bool = False
+        self.binary: bool = False
+        self.landmark_format: str = "json"
+        self.landmark_indices: Optional[np.ndarray] = None
+        self.metrics: bool = False
+        self.calibrated_ratio: Optional[float] = None
+        # Score fed to the connection's SessionSummary, None when the summary is off
+        self.summary_score: Optional[str] = None
+        # Set while a calibration window is open: detections carry their raw landmarks as "_landmarks"
+        self.collect_landmarks: bool = False
+        self.roi_tracker: Optional[RoiTracker] = None
+        # ROI box (normalized, None = full frame) the graph's tracking state belongs to
+        self._graph_box: Optional[tuple] = None
+        self.motion_gate: Optional[MotionGate] = None
+        self.raw_landmarks: bool = False
+        self.decoder = FrameDecoder()
+        self.timing: bool = False
+        self._timer = StageTimer()
+        self._profile: Optional[ProfileCapture] = None
+        # One worker thread per session: keeps the graph thread-affine and the event loop free
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pose-session")
 
-    def init_pose(self) -> bool:
+    async def call(self, method: str, *args):
+        """Run a blocking session method on the session's worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, getattr(self, method), *args)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def init_pose(self, options: Optional[dict] = None) -> bool:
         if not MEDIAPIPE_AVAILABLE:
             return False
+        options = options or {}
+        self.landmark_format = options.get("landmark_format", "json")
+        self.landmark_indices = resolve_subset(options.get("landmarks"))
+        self.metrics = options.get("metrics", False)
+        self.calibrated_ratio = options.get("calibrated_ratio")
+        self.summary_score = options["summary_score"] if options.get("summary") else None
+        self.roi_tracker = RoiTracker(options["roi_max_side"]) if options.get("roi") else None
+        self.motion_gate = (MotionGate(options["motion_threshold"], options["max_reuse_ms"])
+                            if options.get("motion_gate") else None)
+        self.raw_landmarks = options.get("filter", False)
+        self.decoder = FrameDecoder(options.get("decode_side", DEFAULT_DECODE_SIDE))
         try:
-            mp_pose = mp_solutions.pose
-            # Tune for real-time similar to your working script
-            self.pose = mp_pose.Pose(
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5,
-                model_complexity=1,
-                smooth_landmarks=True,
-                enable_segmentation=False,
-            )
+            # A re-init starts over like a new connection: its graph goes back and comes out reset
+            self._release_graph()
+            self.pose = GRAPHS.checkout()
+            self._graph_box = None
             self.initialized = True
             return True
         except Exception as e:
@@ -69,95 +395,986 @@ class PoseSession:
             self.initialized = False
             return False
 
-    def close(self):
+    def _detect_frame(self, frame: np.ndarray, timestamp: int) -> dict:
+        """Run inference on a decoded RGB frame and build the detection reply."""
+        cropped = self.roi_tracker is not None and self.roi_tracker.box is not None
+        arr = self._infer(frame)
+        if arr is None and cropped:
+            # Lost the pose inside the ROI: retry on the full frame
+            self.roi_tracker.reset()
+            cropped = False
+            arr = self._infer(frame)
+
+        if arr is not None:
+            result = {"success": True, "timestamp": timestamp}
+            if self.raw_landmarks:
+                # Encoded by the connection's StreamFilter after temporal filtering
+                result["_array"] = arr
+            else:
+                result.update(encode_landmarks(arr, self.landmark_format, self.landmark_indices))
+                if self.metrics:
+                    result["metrics"] = compute_metrics(arr, self.calibrated_ratio)
+            if self.collect_landmarks:
+                result["_landmarks"] = arr
+            if self.summary_score is not None:
+                metrics = result.get("metrics")
+                result["score"] = (metrics[self.summary_score] if metrics is not None
+                                   else posture_score(arr, self.calibrated_ratio, self.summary_score))
+            self._timer.lap("encode")
+            if cropped:
+                result["roi"] = True
+            return result
+        else:
+            return {"success": False, "timestamp": timestamp, "message": "no_pose"}
+
+    def _infer(self, frame: np.ndarray) -> Optional[np.ndarray]:
+        """Run the pose graph on an RGB frame (or its ROI); returns full-frame landmarks or None."""
+        pixel_box = None
+        if self.roi_tracker is not None:
+            if self.roi_tracker.box != self._graph_box:
+                # The graph tracks and smooths landmarks in its input's coordinates: a new crop
+                # (or the full frame after one) would mix them up
+                self.pose.reset()
+                self._graph_box = self.roi_tracker.box
+            frame_shape = frame.shape
+            frame, pixel_box = self.roi_tracker.prepare(frame)
+            # An unscaled crop is a strided view of the frame
+            frame = np.ascontiguousarray(frame)
+            self._timer.lap("convert")
+
+        frame.flags.writeable = False
         try:
-            if self.pose is not None:
-                self.pose.close()
+            results = self.pose.process(frame)
+        finally:
+            # The frame may be the decoder's reusable buffer
+            frame.flags.writeable = True
+        self._timer.lap("inference")
+
+        if not (results.pose_landmarks and hasattr(results.pose_landmarks, 'landmark')):
+            if self.roi_tracker is not None:
+                self.roi_tracker.reset()
+            return None
+        arr = landmarks_to_array(results.pose_landmarks.landmark)
+        if self.roi_tracker is not None:
+            RoiTracker.to_frame(arr, pixel_box, frame_shape)
+            self.roi_tracker.update(arr)
+        return arr
+
+    def score_batch(self, frames, calibrated_ratio: Optional[float] = None) -> dict:
+        """Posture metrics for many landmark frames at once."""
+        try:
+            batch = compute_metrics_batch(frames, calibrated_ratio)
+        except (ValueError, TypeError, IndexError) as e:
+            return {"success": False, "message": f"invalid_frames:{e}"}
+        return {"success": True, "count": len(batch["ratio"]), "metrics": metrics_batch_to_json(batch)}
+
+    def calibrate_images(self, images: list, outlier_z: float, min_frames: int) -> dict:
+        """Calibration baseline from a burst of base64 images, run through the graph back to back."""
+        if not self.initialized or self.pose is None:
+            return {"success": False, "message": "not_initialized"}
+        # imdecode releases the GIL, so the burst is decoded in parallel
+        with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1, 4)) as pool:
+            frames = list(pool.map(self._decode_image, images))
+        landmarks = []
+        no_pose = 0
+        try:
+            for frame in frames:
+                if frame is None:
+                    continue
+                results = self.pose.process(frame)
+                if results.pose_landmarks and hasattr(results.pose_landmarks, 'landmark'):
+                    landmarks.append(landmarks_to_array(results.pose_landmarks.landmark))
+                else:
+                    no_pose += 1
+        finally:
+            # The burst is not part of the stream: drop the tracking state it left behind
+            self.pose.reset()
+            self._graph_box = None
+            if self.roi_tracker is not None:
+                self.roi_tracker.reset()
+            if self.motion_gate is not None:
+                self.motion_gate.reset()
+        stacked = np.stack(landmarks) if landmarks else np.empty((0, NUM_LANDMARKS, 5), dtype=np.float32)
+        result = robust_baseline(stacked, outlier_z, min_frames)
+        result["rejected"].update({"no_pose": no_pose, "undecodable": sum(frame is None for frame in frames)})
+        result["images"] = len(images)
+        return result
+
+    def _decode_image(self, b64_image: str) -> Optional[np.ndarray]:
+        """Decode into a fresh array (the session decoder reuses its buffer)."""
+        try:
+            return FrameDecoder(self.decoder.target_side).decode(base64.b64decode(b64_image))
         except Exception:
-            pass
+            return None
+
+    def set_collect_landmarks(self, enabled: bool):
+        self.collect_landmarks = enabled
+
+    def set_calibrated_ratio(self, calibrated_ratio: Optional[float]):
+        self.calibrated_ratio = calibrated_ratio
+
+    def _release_graph(self):
+        if self.pose is not None:
+            GRAPHS.checkin(self.pose)
         self.pose = None
+
+    def close(self):
+        self._release_graph()
         self.initialized = False
 
+    def graph_pool_stats(self) -> dict:
+        return GRAPHS.snapshot()
+
+    def start_profile(self, frames: int) -> dict:
+        """Profile the next `frames` detections; the last one's reply carries the summary."""
+        try:
+            self._profile = ProfileCapture(int(frames))
+        except (ValueError, TypeError) as e:
+            return {"success": False, "message": str(e)}
+        return {"success": True, "frames": self._profile.frames, "path": self._profile.path}
+
     def detect(self, b64_image: str, timestamp: int):
+        timer = StageTimer()
+        try:
+            img_bytes = base64.b64decode(b64_image)
+        except Exception as e:
+            return {"success": False, "timestamp": timestamp, "message": str(e)}
+        timer.lap("decode")
+        return self.detect_bytes(img_bytes, timestamp, timer)
+
+    def detect_bytes(self, img_bytes, timestamp: int, timer: Optional[StageTimer] = None):
+        """Run detection on an encoded image given as any bytes-like object (bytes, memoryview).
+
+        The reply carries the frame's stage timings under "_timing" for the connection to record.
+        """
+        return self._timed(self._detect_bytes, timer, img_bytes, timestamp)
+
+    def detect_rgb(self, frame: np.ndarray, timestamp: int):
+        """Run detection on an already decoded RGB frame (in-process capture)."""
+        return self._timed(self._detect_rgb, None, frame, timestamp)
+
+    def _timed(self, detect, timer: Optional[StageTimer], *args):
+        self._timer = timer or StageTimer()
+        if self._profile is None:
+            result = detect(*args)
+        else:
+            result = self._profile.run(detect, *args)
+            if self._profile.done:
+                result["profile"] = self._profile.finish()
+                self._profile = None
+        result["_timing"] = self._timer.timings
+        return result
+
+    def _detect_bytes(self, img_bytes, timestamp: int):
         if not self.initialized or self.pose is None:
             return {"success": False, "timestamp": timestamp, "message": "not_initialized"}
         try:
-            img_bytes = base64.b64decode(b64_image)
-            arr = np.frombuffer(img_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-            if frame is None:
-                return {"success": False, "timestamp": timestamp, "message": "decode_failed"}
-
-            # BGR -> RGB
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            rgb.flags.writeable = False
-            results = self.pose.process(rgb)
-            rgb.flags.writeable = True
-
-            if results.pose_landmarks and hasattr(results.pose_landmarks, 'landmark'):
-                landmarks = []
-                for lm in results.pose_landmarks.landmark:
-                    landmarks.append({
-                        "x": float(lm.x),
-                        "y": float(lm.y),
-                        "z": float(lm.z),
-                        "visibility": float(getattr(lm, 'visibility', 0.0)),
-                        "presence": float(getattr(lm, 'presence', 0.0)),
-                    })
-                return {"success": True, "timestamp": timestamp, "landmarks": landmarks}
-            else:
-                return {"success": False, "timestamp": timestamp, "message": "no_pose"}
+            frame = self.decoder.decode(img_bytes)
+        except Exception as e:
+            print(f"Decode error: {e}", file=sys.stderr)
+            return {"success": False, "timestamp": timestamp, "message": str(e)}
+        self._timer.lap("decode")
+        if frame is None:
+            return {"success": False, "timestamp": timestamp, "message": "decode_failed"}
+        return self._detect_rgb(frame, timestamp)
+
+    def _detect_rgb(self, frame: np.ndarray, timestamp: int):
+        if not self.initialized or self.pose is None:
+            return {"success": False, "timestamp": timestamp, "message": "not_initialized"}
+        try:
+            # A calibration window needs every frame's own landmarks, not a reused result
+            if self.motion_gate is not None and not self.collect_landmarks:
+                cached = self.motion_gate.lookup(frame, timestamp)
+                self._timer.lap("motion_gate")
+                if cached is not None:
+                    return cached
+
+            result = self._detect_frame(frame, timestamp)
+            if self.motion_gate is not None:
+                self.motion_gate.store(result)
+            return result
         except Exception as e:
             print(f"Detect error: {e}", file=sys.stderr)
             traceback.print_exc(file=sys.stderr)
             return {"success": False, "timestamp": timestamp, "message": str(e)}
 
 
+# Sessions living inside a pool worker process, keyed by session id
+_worker_sessions = {}
+
+
+def _worker_graphs(method: str, *args):
+    """Run a GraphPool method inside a pool worker."""
+    return getattr(GRAPHS, method)(*args)
+
+
+def _worker_call(session_id: int, method: str, *args):
+    """Entry point executed inside a pool worker: dispatch to the stream's own PoseSession."""
+    session = _worker_sessions.get(session_id)
+    if session is None:
+        session = _worker_sessions[session_id] = PoseSession()
+    result = getattr(session, method)(*args)
+    if method == "close":
+        _worker_sessions.pop(session_id, None)
+        session.shutdown()
+    return result
+
+
+class WorkerRestarted(RuntimeError):
+    """The pool worker a session was pinned to died and was replaced; the session must init again."""
+
+
+class PosePool:
+    """Fixed set of single-process workers; each stream is pinned to one worker for its lifetime.
+
+    A stream goes to the least-loaded worker at connect time, so throughput scales with cores
+    while the asyncio process only routes frames and results. A worker that dies is replaced;
+    each of its streams gets one "worker_restarted" error and must init again.
+    """
+
+    def __init__(self, workers: int):
+        self._executors = [ProcessPoolExecutor(max_workers=1) for _ in range(workers)]
+        # Bumped each time a worker is replaced, so its sessions notice their state is gone
+        self._generations = [0] * workers
+        self._load = [0] * workers
+        self._ids = itertools.count(1)
+        self.restarts = 0
+
+    def warm_up(self, graphs: int = 0):
+        # Spawn the worker processes (and pay the MediaPipe import and graph builds) before the first client arrives
+        for executor in self._executors:
+            executor.submit(_worker_graphs, "prefill", graphs).result()
+
+    def evict_idle(self):
+        for executor in self._executors:
+            executor.submit(_worker_graphs, "evict_idle")
+
+    def open_session(self) -> "PooledPoseSession":
+        worker = min(range(len(self._load)), key=self._load.__getitem__)
+        self._load[worker] += 1
+        return PooledPoseSession(self, worker, next(self._ids))
+
+    def release(self, worker: int):
+        self._load[worker] -= 1
+
+    def executor(self, worker: int) -> ProcessPoolExecutor:
+        return self._executors[worker]
+
+    def generation(self, worker: int) -> int:
+        return self._generations[worker]
+
+    def respawn(self, worker: int, broken: ProcessPoolExecutor):
+        """Replace a worker whose process died (once, however many of its sessions notice)."""
+        if self._executors[worker] is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executors[worker] = ProcessPoolExecutor(max_workers=1)
+        self._generations[worker] += 1
+        self.restarts += 1
+        print(f"Pose worker {worker} died, started a new one", file=sys.stderr)
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PooledPoseSession:
+    """Front-end handle for a PoseSession that lives in a PosePool worker process."""
+
+    def __init__(self, pool: PosePool, worker: int, session_id: int):
+        self._pool = pool
+        self.worker = worker
+        self.session_id = session_id
+        self.generation = pool.generation(worker)
+        self.initialized: bool = False
+        self.binary: bool = False
+        self.timing: bool = False
+
+    async def call(self, method: str, *args):
+        # memoryviews are not picklable; this is the one copy needed to cross the process boundary
+        args = tuple(bytes(a) if isinstance(a, memoryview) else a for a in args)
+        loop = asyncio.get_running_loop()
+        executor = self._pool.executor(self.worker)
+        restarted = self._pool.generation(self.worker) != self.generation
+        if not restarted:
+            try:
+                result = await loop.run_in_executor(executor, _worker_call, self.session_id, method, *args)
+            except BrokenProcessPool:
+                self._pool.respawn(self.worker, executor)
+                restarted = True
+        if restarted:
+            # The session's graph and options died with the worker: only a new init makes sense
+            self.generation = self._pool.generation(self.worker)
+            self.initialized = False
+            if method == "close":
+                return None
+            if method != "init_pose":
+                raise WorkerRestarted(f"pose worker {self.worker} restarted")
+            result = await loop.run_in_executor(self._pool.executor(self.worker), _worker_call, self.session_id, method, *args)
+        if method == "init_pose":
+            self.initialized = bool(result)
+        elif method == "close":
+            self.initialized = False
+        return result
+
+    def shutdown(self):
+        self._pool.release(self.worker)
+
+
+POOL: Optional[PosePool] = None
+# Record every connection into this directory (see pose_record.py)
+RECORD_DIR = os.environ.get("POSE_WS_RECORD_DIR")
+_connection_ids = itertools.count(1)
+# Timings of every connection since startup (each connection also keeps its own)
+SERVER_STATS = PipelineStats()
+
+
+class StreamFilter:
+    """Connection-side temporal model: smooths each detection and answers predict requests.
+
+    predict extrapolates the filtered landmarks to "ts", or to now when ts is omitted, so a
+    client can run inference at a few Hz and still render at display rate. It lives in the
+    asyncio process (not the session's worker), so a predict never waits behind an inference
+    that is still running.
+    """
+
+    def __init__(self, options: dict):
+        self.landmark_format = options["landmark_format"]
+        self.landmark_indices = resolve_subset(options["landmarks"])
+        self.metrics = options["metrics"]
+        self.calibrated_ratio = options["calibrated_ratio"]
+        self.filter = LandmarkFilter(options["min_cutoff"], options["beta"])
+
+    def encode(self, arr: np.ndarray) -> dict:
+        out = encode_landmarks(arr, self.landmark_format, self.landmark_indices)
+        if self.metrics:
+            out["metrics"] = compute_metrics(arr, self.calibrated_ratio)
+        return out
+
+    def finish(self, result: dict) -> dict:
+        """Replace the raw landmark array of a detection with filtered, encoded landmarks."""
+        arr = result.pop("_array", None)
+        if arr is not None:
+            result.update(self.encode(self.filter.update(arr, result["timestamp"])))
+            result["filtered"] = True
+        return result
+
+    def predict(self, timestamp: Optional[int]) -> dict:
+        arr, ahead_ms = self.filter.predict(timestamp)
+        if arr is None:
+            return {"success": False, "timestamp": timestamp, "message": "no_landmarks"}
+        if timestamp is None:
+            timestamp = int(round(self.filter.last_timestamp + ahead_ms))
+        result = {"success": True, "timestamp": timestamp, "predicted_ms": round(ahead_ms, 2)}
+        result.update(self.encode(arr))
+        return result
+
+
+class RateController:
+    """Per-connection AIMD loop behind "rate_hint": multiplicative decrease, additive increase.
+
+    Every PERIOD_S it compares the median service time (inference round trip) and queue time
+    of the frames processed since the last period, and the frames the slot dropped, with the
+    recommended frame interval. Drops, queueing for more than half an interval or inference
+    close to the interval cut the rate by 30% (then JPEG quality, then resolution once the
+    rate is at its floor); headroom restores resolution and quality, then adds 1 fps per
+    period, up to the client's max_fps / max_side / jpeg_quality. A hint goes out after init
+    and whenever the recommendation changes.
+    """
+
+    PERIOD_S = 1.0
+    MIN_SAMPLES = 3
+    DECREASE = 0.7
+    INCREASE_FPS = 1.0
+    MIN_FPS = 2.0
+    MIN_SIDE = 320
+    SIDE_STEP = 0.75
+    MIN_QUALITY = 50
+    QUALITY_STEP = 10
+
+    def __init__(self, max_fps: float, max_side: int, jpeg_quality: int):
+        self.max_fps = max(max_fps, self.MIN_FPS)
+        self.side_limit = max(max_side, self.MIN_SIDE)
+        self.quality_limit = max(jpeg_quality, self.MIN_QUALITY)
+        self.fps = self.max_fps
+        self.max_side = self.side_limit
+        self.jpeg_quality = self.quality_limit
+        self._service = []
+        self._queue = []
+        self._dropped = 0
+        self._period_start = time.monotonic()
+
+    def observe(self, service_ms: float, queue_ms: float, dropped: int) -> Optional[dict]:
+        """Account one processed frame; returns a rate_hint when the recommendation changed."""
+        self._service.append(service_ms)
+        self._queue.append(queue_ms)
+        self._dropped += dropped
+        now = time.monotonic()
+        if now - self._period_start < self.PERIOD_S or len(self._service) < self.MIN_SAMPLES:
+            return None
+        service, queue = float(np.median(self._service)), float(np.median(self._queue))
+        dropped = self._dropped
+        self._service.clear()
+        self._queue.clear()
+        self._dropped = 0
+        self._period_start = now
+
+        interval = 1000.0 / self.fps
+        before = (self.fps, self.max_side, self.jpeg_quality)
+        if dropped or queue > 0.5 * interval or service > 0.9 * interval:
+            reason = "congested"
+            self._decrease()
+        elif queue < 0.2 * interval and service < 0.6 * interval:
+            reason = "headroom"
+            self._increase()
+        else:
+            return None
+        if (self.fps, self.max_side, self.jpeg_quality) == before:
+            return None
+        return self.hint(reason, service, queue, dropped)
+
+    def hint(self, reason: str, service_ms: float = 0.0, queue_ms: float = 0.0, dropped: int = 0) -> dict:
+        return {"type": "rate_hint", "interval_ms": int(round(1000.0 / self.fps)), "fps": round(self.fps, 2),
+                "max_side": self.max_side, "jpeg_quality": self.jpeg_quality, "reason": reason,
+                "service_ms": round(service_ms, 2), "queue_ms": round(queue_ms, 2), "dropped": dropped}
+
+    def _decrease(self):
+        if self.fps > self.MIN_FPS:
+            self.fps = max(self.MIN_FPS, self.fps * self.DECREASE)
+        elif self.jpeg_quality > self.MIN_QUALITY:
+            self.jpeg_quality = max(self.MIN_QUALITY, self.jpeg_quality - self.QUALITY_STEP)
+        else:
+            self.max_side = max(self.MIN_SIDE, int(self.max_side * self.SIDE_STEP))
+
+    def _increase(self):
+        if self.max_side < self.side_limit:
+            self.max_side = min(self.side_limit, int(self.max_side / self.SIDE_STEP))
+        elif self.jpeg_quality < self.quality_limit:
+            self.jpeg_quality = min(self.quality_limit, self.jpeg_quality + self.QUALITY_STEP)
+        else:
+            self.fps = min(self.max_fps, self.fps + self.INCREASE_FPS)
+
+
+class PendingFrame:
+    __slots__ = ("image", "b64", "timestamp", "seq", "record_seq", "received_at")
+
+    def __init__(self, image, b64: bool, timestamp: int, seq: Optional[int], record_seq: Optional[int] = None):
+        self.image = image
+        self.b64 = b64
+        self.timestamp = timestamp
+        self.seq = seq
+        self.record_seq = record_seq
+        self.received_at = time.monotonic()
+
+
+class LatestFrameSlot:
+    """Single-slot mailbox: a newer frame replaces the one still waiting, so inference never lags behind.
+
+    Replaced frames are counted in the next detection's "dropped".
+    """
+
+    def __init__(self):
+        self._frame: Optional[PendingFrame] = None
+        self._event = asyncio.Event()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame: PendingFrame):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self.received += 1
+        self._event.set()
+
+    def close(self):
+        self._closed = True
+        self._event.set()
+
+    async def get(self) -> Optional[PendingFrame]:
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+def optional_float(value) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def positive_number(value, name: str, cast=float):
+    """value as a finite number above zero (cast to int for sizes); raises ValueError/TypeError."""
+    number = float(value)
+    if not np.isfinite(number) or cast(number) <= 0:
+        raise ValueError(f"{name} must be a positive number")
+    return cast(number)
+
+
+def non_negative_number(value, name: str, cast=float):
+    """value as a finite number of zero or more (cast to int for sizes); raises ValueError/TypeError."""
+    number = float(value)
+    if not np.isfinite(number) or cast(number) < 0:
+        raise ValueError(f"{name} must be zero or a positive number")
+    return cast(number)
+
+
+def parse_init_options(data: dict) -> dict:
+    """Validate the per-session options of an init message; raises ValueError/TypeError."""
+    landmark_format = data.get("landmark_format", "json")
+    if landmark_format not in LANDMARK_FORMATS:
+        raise ValueError(f"unknown landmark format: {landmark_format}")
+    resolve_subset(data.get("landmarks"))
+    summary_score = data.get("summary_score", "ratio_score")
+    if summary_score not in SCORE_KINDS:
+        raise ValueError(f"unknown summary score: {summary_score}")
+    summary_threshold = int(data.get("summary_threshold", DEFAULT_THRESHOLD))
+    if not 0 <= summary_threshold <= 100:
+        raise ValueError("summary_threshold must be between 0 and 100")
+    return {
+        "landmark_format": landmark_format,
+        "landmarks": data.get("landmarks"),
+        "metrics": bool(data.get("metrics", False)),
+        "calibrated_ratio": optional_float(data.get("calibrated_ratio")),
+        "roi": bool(data.get("roi", False)),
+        "roi_max_side": positive_number(data.get("roi_max_side", 480), "roi_max_side", int),
+        "motion_gate": bool(data.get("motion_gate", False)),
+        "motion_threshold": positive_number(data.get("motion_threshold", 2.0), "motion_threshold"),
+        "max_reuse_ms": positive_number(data.get("max_reuse_ms", 1000), "max_reuse_ms"),
+        "filter": bool(data.get("filter", False)),
+        "min_cutoff": positive_number(data.get("min_cutoff", 1.0), "min_cutoff"),
+        # beta 0 is a plain low-pass filter
+        "beta": non_negative_number(data.get("beta", 0.5), "beta"),
+        "timing": bool(data.get("timing", False)),
+        # 0 decodes at full size
+        "decode_side": non_negative_number(data.get("decode_side", DEFAULT_DECODE_SIDE), "decode_side", int),
+        "rate_hints": bool(data.get("rate_hints", False)),
+        "max_fps": positive_number(data.get("max_fps", 30.0), "max_fps"),
+        "max_side": positive_number(data.get("max_side", 1280), "max_side", int),
+        "jpeg_quality": min(positive_number(data.get("jpeg_quality", 80), "jpeg_quality", int), 100),
+        "summary": bool(data.get("summary", False)),
+        "summary_score": summary_score,
+        "summary_threshold": summary_threshold,
+        "slouch_min_s": float(data.get("slouch_min_s", DEFAULT_SLOUCH_MIN_S)),
+    }
+
+
+def open_recorder(path: Optional[str] = None) -> SessionRecorder:
+    """Recorder for one connection; the default file name is unique per connection.
+
+    A client-supplied path must name a file directly in the recording directory (ValueError otherwise).
+    """
+    directory = RECORD_DIR or tempfile.gettempdir()
+    if not path:
+        path = os.path.join(directory, f"pose_ws_{int(time.time())}_{os.getpid()}_{next(_connection_ids)}.poserec")
+    elif not isinstance(path, str):
+        raise ValueError("record path must be a string")
+    else:
+        path = os.path.join(os.path.realpath(os.path.dirname(path) or directory), os.path.basename(path))
+        if os.path.dirname(path) != os.path.realpath(directory) or os.path.basename(path) in ("", ".", ".."):
+            raise ValueError(f"record path must be a file in {directory}")
+    return SessionRecorder(path)
+
+
+async def send_text(ws: WebSocketServerProtocol, text: str):
+    try:
+        await ws.send(text)
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def send_json(ws: WebSocketServerProtocol, payload: dict):
+    await send_text(ws, json.dumps(payload))
+
+
+async def handle_binary(ws: WebSocketServerProtocol, session: PoseSession, slot: LatestFrameSlot, message: bytes):
+    if not session.binary:
+        await send_json(ws, {"type": "error", "message": "binary_not_negotiated"})
+        return
+    header = parse_frame_header(message)
+    if header is None:
+        await send_json(ws, {"type": "error", "message": "short_frame"})
+        return
+    msg_type, codec, seq, ts, payload = header
+    if msg_type != MSG_DETECT:
+        await send_json(ws, {"type": "error", "message": f"unknown_binary_type:{msg_type}"})
+        return
+    if codec not in SUPPORTED_CODECS:
+        await send_json(ws, {"type": "detection", "success": False, "timestamp": ts, "seq": seq, "message": f"unsupported_codec:{codec}"})
+        return
+    recorder = getattr(session, "recorder", None)
+    record_seq = recorder.frame(payload, ts) if recorder is not None else None
+    slot.put(PendingFrame(payload, False, ts, seq, record_seq))
+
+
+async def inference_loop(ws: WebSocketServerProtocol, session: PoseSession, slot: LatestFrameSlot, stats: PipelineStats):
+    """Always run detection on the freshest pending frame; older ones were already dropped by the slot."""
+    reported_drops = 0
+    while True:
+        frame = await slot.get()
+        if frame is None:
+            return
+        started = time.monotonic()
+        queue_ms = (started - frame.received_at) * 1000.0
+        captured = isinstance(frame.image, np.ndarray)
+        try:
+            if frame.b64:
+                result = await session.call("detect", frame.image, frame.timestamp)
+            elif captured:
+                result = await session.call("detect_rgb", frame.image, frame.timestamp)
+            else:
+                result = await session.call("detect_bytes", frame.image, frame.timestamp)
+        except WorkerRestarted:
+            await send_json(ws, {"type": "detection", "success": False, "timestamp": frame.timestamp,
+                                 "message": "worker_restarted"})
+            continue
+        service_ms = (time.monotonic() - started) * 1000.0
+        timing = result.pop("_timing", {})
+        timing["queue"] = queue_ms
+        landmarks = result.pop("_landmarks", None)
+        calibration = getattr(session, "calibration", None)
+        if calibration is not None:
+            if landmarks is not None:
+                calibration.add(landmarks)
+            elif result.get("message") == "no_pose":
+                calibration.add(None)
+        stream_filter = getattr(session, "stream_filter", None)
+        if stream_filter is not None:
+            timer = StageTimer()
+            stream_filter.finish(result)
+            timer.lap("encode")
+            timing["encode"] = timing.get("encode", 0.0) + timer.timings["encode"]
+        summary = getattr(session, "summary", None)
+        if summary is not None:
+            if result.get("success"):
+                summary.add(result.get("score"))
+            elif result.get("message") == "no_pose":
+                summary.add(None)
+        result["type"] = "detection"
+        if frame.seq is not None:
+            result["seq"] = frame.seq
+        if captured:
+            result["capture"] = True
+        result["queue_ms"] = round(queue_ms, 2)
+        result["dropped"] = slot.dropped
+        if session.timing:
+            result["timing"] = timing_block(timing)
+        timer = StageTimer()
+        text = json.dumps(result)
+        timer.lap("serialize")
+        timing.update(timer.timings)
+        recorder = getattr(session, "recorder", None)
+        if recorder is not None and frame.record_seq is not None:
+            recorder.result(frame.record_seq, text)
+
+        new_drops, reported_drops = slot.dropped - reported_drops, slot.dropped
+        for target in (stats, SERVER_STATS):
+            target.count_dropped(new_drops)
+            target.record(timing)
+        await send_text(ws, text)
+        rate_controller = getattr(session, "rate_controller", None)
+        if rate_controller is not None:
+            hint = rate_controller.observe(service_ms, queue_ms, new_drops)
+            if hint is not None:
+                await send_json(ws, hint)
+
+
+async def start_capture(ws: WebSocketServerProtocol, slot: LatestFrameSlot, data: dict) -> Tuple[FrameCapture, dict]:
+    """Open a capture source for the connection; its frames go through the connection's slot."""
+    loop = asyncio.get_running_loop()
+
+    def on_frame(frame: np.ndarray, timestamp: int):
+        loop.call_soon_threadsafe(slot.put, PendingFrame(frame, False, timestamp, None))
+
+    def on_end():
+        asyncio.run_coroutine_threadsafe(send_json(ws, dict(capture.describe(), type="capture_ended")), loop)
+
+    # Checked here: cv2 raises its own error for a property value that is not a number
+    limits = {name: None if data.get(name) is None else positive_number(data.get(name), name, cast)
+              for name, cast in (("max_fps", float), ("width", int), ("height", int))}
+    capture = FrameCapture(data.get("source", 0), on_frame, on_end, **limits,
+                           repeat=bool(data.get("repeat", False)), realtime=bool(data.get("realtime", True)))
+    # Opening a camera blocks for a while; keep the event loop serving other connections
+    info = await loop.run_in_executor(None, capture.open)
+    capture.start()
+    return capture, info
+
+
+async def stop_capture(capture: Optional[FrameCapture]):
+    if capture is not None:
+        await asyncio.get_running_loop().run_in_executor(None, capture.stop)
+
+
+def parse_calibration_options(data: dict) -> dict:
+    """Validate the options of a calibrate message; raises ValueError/TypeError."""
+    images = data.get("images")
+    if images is not None and (not isinstance(images, list) or not images
+                               or not all(isinstance(image, str) for image in images)):
+        raise ValueError("images must be a non-empty list of base64 images")
+    options = {
+        "images": images,
+        "duration_ms": float(data.get("duration_ms", 3000)),
+        "outlier_z": float(data.get("outlier_z", DEFAULT_OUTLIER_Z)),
+        "min_frames": int(data.get("min_frames", DEFAULT_MIN_FRAMES)),
+        "max_frames": int(data.get("max_frames", DEFAULT_MAX_FRAMES)),
+        "apply": bool(data.get("apply", False)),
+    }
+    check_calibration_options(options["outlier_z"], options["min_frames"])
+    return options
+
+
+async def send_calibration(ws: WebSocketServerProtocol, session: PoseSession, result: dict, apply: bool):
+    """Reply with a calibration result, first making it the session's calibrated ratio if asked to."""
+    if apply and result.get("success"):
+        ratio = result["calibrated_ratio"]
+        await session.call("set_calibrated_ratio", ratio)
+        stream_filter = getattr(session, "stream_filter", None)
+        if stream_filter is not None:
+            stream_filter.calibrated_ratio = ratio
+        result["applied"] = True
+    result["type"] = "calibrate_response"
+    await send_json(ws, result)
+
+
+async def calibrate_window(ws: WebSocketServerProtocol, session: PoseSession, window: CalibrationWindow, apply: bool):
+    """Collect the stream's landmarks while the window is open, then reply with the baseline."""
+    await asyncio.sleep(window.duration_ms / 1000.0)
+    session.calibration = None
+    try:
+        await session.call("set_collect_landmarks", False)
+        await send_calibration(ws, session, window.finish(), apply)
+    except WorkerRestarted:
+        await send_json(ws, {"type": "calibrate_response", "success": False, "message": "worker_restarted"})
+
+
 async def handler(ws: WebSocketServerProtocol):
-    session = PoseSession()
+    session = POOL.open_session() if POOL is not None else PoseSession()
+    slot = LatestFrameSlot()
+    stats = PipelineStats()
+    session.recorder = open_recorder() if RECORD_DIR else None
+    capture: Optional[FrameCapture] = None
+    session.calibration = None
+    calibration_task: Optional[asyncio.Task] = None
+    inference = asyncio.create_task(inference_loop(ws, session, slot, stats))
     try:
         async for message in ws:
             try:
-                data = json.loads(message)
-            except Exception:
-                await ws.send(json.dumps({"type": "error", "message": "invalid_json"}))
-                continue
-
-            mtype = data.get("type")
-            if mtype == "init":
-                ok = session.init_pose()
-                await ws.send(json.dumps({"type": "init_response", "success": bool(ok)}))
-            elif mtype == "detect":
-                b64img = data.get("image")
-                ts = int(data.get("ts") or 0)
-                if not isinstance(b64img, str):
-                    await ws.send(json.dumps({"type": "detection", "success": False, "timestamp": ts, "message": "no_image"}))
+                if isinstance(message, (bytes, bytearray)):
+                    await handle_binary(ws, session, slot, message)
                     continue
-                result = session.detect(b64img, ts)
-                result["type"] = "detection"
-                await ws.send(json.dumps(result))
-            elif mtype == "ping":
-                await ws.send(json.dumps({
-                    "type": "pong",
-                    "alive": True,
-                    "mediapipe_available": MEDIAPIPE_AVAILABLE,
-                    "initialized": session.initialized,
-                }))
-            elif mtype == "close":
-                await ws.send(json.dumps({"type": "close_response", "success": True}))
-                break
-            else:
-                await ws.send(json.dumps({"type": "error", "message": f"unknown_type:{mtype}"}))
+                try:
+                    data = json.loads(message)
+                except Exception:
+                    await send_json(ws, {"type": "error", "message": "invalid_json"})
+                    continue
+
+                mtype = data.get("type")
+                if mtype == "init":
+                    try:
+                        options = parse_init_options(data)
+                    except (ValueError, TypeError) as e:
+                        await send_json(ws, {"type": "init_response", "success": False, "binary": False, "message": str(e)})
+                        continue
+                    if session.recorder is not None:
+                        session.recorder.init(data)
+                    ok = await session.call("init_pose", options)
+                    session.binary = bool(ok) and bool(data.get("binary"))
+                    session.stream_filter = StreamFilter(options) if ok and options["filter"] else None
+                    session.timing = options["timing"]
+                    session.rate_controller = (RateController(options["max_fps"], options["max_side"], options["jpeg_quality"])
+                                               if ok and options["rate_hints"] else None)
+                    session.summary = (SessionSummary(options["summary_score"], options["summary_threshold"],
+                                                      options["slouch_min_s"])
+                                       if ok and options["summary"] else None)
+                    await send_json(ws, {"type": "init_response", "success": bool(ok), "binary": session.binary})
+                    if session.rate_controller is not None:
+                        await send_json(ws, session.rate_controller.hint("init"))
+                elif mtype == "detect":
+                    b64img = data.get("image")
+                    ts = int(data.get("ts") or 0)
+                    if not isinstance(b64img, str):
+                        await send_json(ws, {"type": "detection", "success": False, "timestamp": ts, "message": "no_image"})
+                        continue
+                    record_seq = None
+                    if session.recorder is not None:
+                        try:
+                            record_seq = session.recorder.frame(base64.b64decode(b64img), ts, base64=True)
+                        except ValueError:
+                            pass  # the detect itself reports the bad image
+                    slot.put(PendingFrame(b64img, True, ts, None, record_seq))
+                elif mtype == "predict":
+                    stream_filter = getattr(session, "stream_filter", None)
+                    ts = data.get("ts")
+                    if stream_filter is None:
+                        await send_json(ws, {"type": "prediction", "success": False, "timestamp": ts, "message": "filter_not_enabled"})
+                        continue
+                    try:
+                        ts = None if ts is None else int(ts)
+                    except (ValueError, TypeError):
+                        await send_json(ws, {"type": "prediction", "success": False, "message": "invalid_ts"})
+                        continue
+                    result = stream_filter.predict(ts)
+                    result["type"] = "prediction"
+                    await send_json(ws, result)
+                elif mtype == "score_batch":
+                    frames = data.get("frames")
+                    if not isinstance(frames, list) or not frames:
+                        await send_json(ws, {"type": "score_batch_response", "success": False, "message": "no_frames"})
+                        continue
+                    try:
+                        raw_ratio = data.get("calibrated_ratio")
+                        calibrated_ratio = None if raw_ratio is None else positive_number(raw_ratio, "calibrated_ratio")
+                    except (ValueError, TypeError):
+                        await send_json(ws, {"type": "score_batch_response", "success": False, "message": "invalid_calibrated_ratio"})
+                        continue
+                    result = await session.call("score_batch", frames, calibrated_ratio)
+                    result["type"] = "score_batch_response"
+                    await send_json(ws, result)
+                elif mtype == "session_summary":
+                    summary = getattr(session, "summary", None)
+                    if summary is None:
+                        await send_json(ws, {"type": "session_summary_response", "success": False, "message": "summary_not_enabled"})
+                        continue
+                    try:
+                        since = optional_float(data.get("since"))
+                    except (ValueError, TypeError):
+                        await send_json(ws, {"type": "session_summary_response", "success": False, "message": "invalid_since"})
+                        continue
+                    await send_json(ws, {"type": "session_summary_response", "success": True,
+                                         "summary": summary.snapshot(None if since is None else int(since))})
+                    if data.get("reset"):
+                        summary.reset()
+                elif mtype == "calibrate":
+                    if not session.initialized:
+                        await send_json(ws, {"type": "calibrate_response", "success": False, "message": "not_initialized"})
+                        continue
+                    try:
+                        options = parse_calibration_options(data)
+                        window = None if options["images"] is not None else CalibrationWindow(
+                            options["duration_ms"], options["outlier_z"], options["min_frames"], options["max_frames"])
+                    except (ValueError, TypeError) as e:
+                        await send_json(ws, {"type": "calibrate_response", "success": False, "message": str(e)})
+                        continue
+                    if window is None:
+                        result = await session.call("calibrate_images", options["images"], options["outlier_z"], options["min_frames"])
+                        await send_calibration(ws, session, result, options["apply"])
+                        continue
+                    if session.calibration is not None:
+                        await send_json(ws, {"type": "calibrate_response", "success": False, "message": "calibration_in_progress"})
+                        continue
+                    await session.call("set_collect_landmarks", True)
+                    session.calibration = window
+                    calibration_task = asyncio.create_task(calibrate_window(ws, session, window, options["apply"]))
+                elif mtype == "ping":
+                    await send_json(ws, {
+                        "type": "pong",
+                        "alive": True,
+                        "mediapipe_available": MEDIAPIPE_AVAILABLE,
+                        "initialized": session.initialized,
+                        "frames_received": slot.received,
+                        "frames_dropped": slot.dropped,
+                    })
+                elif mtype == "stats":
+                    await send_json(ws, {"type": "stats_response", "session": stats.snapshot(), "server": SERVER_STATS.snapshot(),
+                                         "graph_pool": await session.call("graph_pool_stats")})
+                    if data.get("reset"):
+                        stats.reset()
+                elif mtype == "profile":
+                    result = await session.call("start_profile", data.get("frames", 30))
+                    result["type"] = "profile_response"
+                    await send_json(ws, result)
+                elif mtype == "record":
+                    result = {}
+                    if session.recorder is not None:
+                        session.recorder.close()
+                        result = session.recorder.describe()
+                        session.recorder = None
+                    if data.get("enabled", True):
+                        try:
+                            session.recorder = open_recorder(data.get("path"))
+                        except (OSError, ValueError) as e:
+                            await send_json(ws, {"type": "record_response", "success": False, "message": str(e)})
+                            continue
+                        result = session.recorder.describe()
+                    result.update({"type": "record_response", "success": True, "recording": session.recorder is not None})
+                    await send_json(ws, result)
+                elif mtype == "capture_start":
+                    if not session.initialized:
+                        await send_json(ws, {"type": "capture_response", "success": False, "message": "not_initialized"})
+                        continue
+                    await stop_capture(capture)
+                    capture = None
+                    try:
+                        capture, info = await start_capture(ws, slot, data)
+                    except (ValueError, TypeError) as e:
+                        await send_json(ws, {"type": "capture_response", "success": False, "message": str(e)})
+                        continue
+                    await send_json(ws, dict(info, type="capture_response", success=True, capturing=True))
+                elif mtype == "capture_stop":
+                    await stop_capture(capture)
+                    result = capture.describe() if capture is not None else {}
+                    capture = None
+                    await send_json(ws, dict(result, type="capture_response", success=True, capturing=False))
+                elif mtype == "close":
+                    await send_json(ws, {"type": "close_response", "success": True})
+                    break
+                else:
+                    await send_json(ws, {"type": "error", "message": f"unknown_type:{mtype}"})
+            except WorkerRestarted:
+                # Whatever the message needed from the session is gone; the client has to init again
+                await send_json(ws, {"type": "error", "message": "worker_restarted"})
     finally:
-        session.close()
+        await stop_capture(capture)
+        if calibration_task is not None:
+            calibration_task.cancel()
+        slot.close()
+        try:
+            await inference
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+        await session.call("close")
+        session.shutdown()
+        if session.recorder is not None:
+            session.recorder.close()
+
+
+async def evict_idle_graphs(interval_s: float):
+    """Periodically close pooled graphs that outlived the idle timeout."""
+    while True:
+        await asyncio.sleep(interval_s)
+        if POOL is not None:
+            POOL.evict_idle()
+        else:
+            GRAPHS.evict_idle()
 
 
 async def main():
+    global POOL
     host = "127.0.0.1"
     port = int(os.environ.get("POSE_WS_PORT", "8765"))
+    # POSE_WS_WORKERS > 0 pins each stream to one of N worker processes (one core each);
+    # 0 keeps every session in this process on its own thread
+    workers = int(os.environ.get("POSE_WS_WORKERS", "0"))
+    prewarm = int(os.environ.get("POSE_WS_GRAPH_PREWARM", "1")) if MEDIAPIPE_AVAILABLE else 0
+    loop = asyncio.get_running_loop()
+    if workers > 0:
+        POOL = PosePool(workers)
+        await loop.run_in_executor(None, POOL.warm_up, prewarm)
+        print(f"Pose worker pool started with {workers} processes", file=sys.stderr)
+    elif prewarm > 0:
+        await loop.run_in_executor(None, GRAPHS.prefill, prewarm)
+    evictor = asyncio.create_task(evict_idle_graphs(min(60.0, max(GRAPHS.idle_timeout_s, 1.0))))
     print(f"Starting WS Pose server at ws://{host}:{port}", file=sys.stderr)
-    async with websockets.serve(handler, host, port, max_size=8 * 1024 * 1024):
-        await asyncio.Future()  # run forever
+    try:
+        async with websockets.serve(handler, host, port, max_size=8 * 1024 * 1024):
+            await asyncio.Future()  # run forever
+    finally:
+        evictor.cancel()
+        if POOL is not None:
+            POOL.shutdown()
+        GRAPHS.close()
 
 
 if __name__ == "__main__":